@@ -0,0 +1,107 @@
+# analytics-service/app/batcher.py
+"""
+Micro-batching for live inference.
+
+Concurrent prediction requests are queued for up to MICRO_BATCH_WAIT_MS (or until
+MICRO_BATCH_MAX_SIZE items are waiting), run through the model as one
+predict_batch call on a dedicated thread, and the scores are handed back to each
+caller's future. Queue depth and batch sizes are exported on /metrics next to
+the model's inference latency (see ml.py).
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+from prometheus_client import Gauge, Histogram
+
+from .ml import predict, predict_batch
+
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "1") == "1"
+MICRO_BATCH_WAIT_MS = float(os.getenv("MICRO_BATCH_WAIT_MS", "3"))
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, float("inf"))
+
+QUEUE_DEPTH = Gauge("inference_batch_queue_depth", "Predictions waiting for the micro-batcher",
+                    multiprocess_mode="livesum")
+BATCH_SIZE = Histogram("inference_batch_size", "Predictions per micro-batch", buckets=BATCH_SIZE_BUCKETS)
+
+class MicroBatcher:
+    def __init__(self, model, max_batch: int = MICRO_BATCH_MAX_SIZE, max_wait_ms: float = MICRO_BATCH_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        # one inference thread: batches never contend with each other for the model
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._executor.shutdown(wait=False)
+
+    async def predict(self, features: Dict[str, Any]) -> float:
+        future = self._loop.create_future()
+        self._queue.put_nowait((features, future))
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return await future
+
+    def predict_threadsafe(self, features: Dict[str, Any]) -> float:
+        """For sync handlers running in FastAPI's threadpool."""
+        if not self.running:
+            return predict(self.model, features)
+        return asyncio.run_coroutine_threadsafe(self.predict(features), self._loop).result()
+
+    async def _collect(self) -> List[Tuple[Dict[str, Any], asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        QUEUE_DEPTH.set(self._queue.qsize())
+        BATCH_SIZE.observe(len(batch))
+        return batch
+
+    def _infer(self, rows: List[Dict[str, Any]]):
+        return predict_batch(self.model, pd.DataFrame.from_records(rows))
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            rows = [features for features, _ in batch]
+            try:
+                scores = await self._loop.run_in_executor(self._executor, self._infer, rows)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), score in zip(batch, scores):
+                if not future.done():
+                    future.set_result(float(score))
@@ -0,0 +1,197 @@
+# analytics-service/app/cache.py
+import os
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+import redis
+from redis.client import Pipeline
+from prometheus_client import Counter, Histogram
+
+from common.metrics import LATENCY_BUCKETS
+
+logger = logging.getLogger("analytics-service")
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+PREDICTION_TTL = 60 * 5  # 5 min cache
+
+# In-process tier in front of Redis for the hottest keys
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", "10000"))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "60"))
+# Writers publish changed keys here (a trailing "*" means prefix); every replica evicts them
+INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache-invalidate")
+
+_MISSING = object()
+
+REDIS_LATENCY = Histogram("redis_command_duration_seconds", "Redis round trip by command",
+                          ["command"], buckets=LATENCY_BUCKETS)
+CACHE_LOOKUPS = Counter("prediction_cache_lookups_total", "Prediction cache lookups by tier and outcome",
+                        ["tier", "result"])
+
+class _TimedPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            REDIS_LATENCY.labels("PIPELINE").observe(time.perf_counter() - start)
+
+class TimedRedis(redis.Redis):
+    """redis.Redis that records the round-trip time of every command and pipeline."""
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_LATENCY.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return _TimedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+class LocalCache:
+    """
+    Size- and TTL-bounded LRU of decoded values, shared by the request threads.
+    Only enabled while this replica is subscribed to the invalidation channel,
+    so it never serves a value another replica has already replaced.
+    """
+
+    def __init__(self, maxsize: int = LOCAL_CACHE_SIZE, ttl: float = LOCAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = False
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < time.monotonic():
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any):
+        if not self.enabled or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                if key.endswith("*"):
+                    prefix = key[:-1]
+                    doomed = [k for k in self._data if k.startswith(prefix)]
+                else:
+                    doomed = [key] if key in self._data else []
+                for k in doomed:
+                    del self._data[k]
+                self.stats["invalidations"] += len(doomed)
+
+    def disable(self):
+        # invalidations may be missed from here on: forget everything
+        self.enabled = False
+        with self._lock:
+            self._data.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "enabled": self.enabled, "size": len(self._data),
+                    "maxsize": self.maxsize, "ttl": self.ttl}
+
+def connect_redis():
+    # Redis is optional: callers check for None and fall back to the database
+    try:
+        client = TimedRedis.from_url(REDIS_URL, decode_responses=True)
+        client.ping()
+        logger.info("Connected to Redis")
+        return client
+    except Exception as e:
+        logger.warning(f"Redis not available: {e}")
+        return None
+
+redis_client = connect_redis()
+local_cache = LocalCache()
+_listener = None
+
+def prediction_cache_key(player_id: int, next_match_id: Optional[int]) -> str:
+    return f"pred:player:{player_id}:match:{next_match_id or 'next'}"
+
+def prediction_index_key(player_id: int) -> str:
+    """Set of a player's cached prediction keys: the ETL change dispatcher deletes them without a SCAN."""
+    return f"pred:player:{player_id}:keys"
+
+def cache_prediction(pipe, player_id: int, next_match_id: Optional[int], value: str):
+    """Queue a prediction write (and its index entry) on a pipeline."""
+    key, index = prediction_cache_key(player_id, next_match_id), prediction_index_key(player_id)
+    pipe.setex(key, PREDICTION_TTL, value)
+    pipe.sadd(index, key)
+    # outlives every key it lists, so none is left without an index entry
+    pipe.expire(index, PREDICTION_TTL)
+
+def publish_invalidation(keys: Iterable[str]):
+    """Evict keys from the local tier of every replica (including this one)."""
+    keys = list(keys)
+    local_cache.invalidate(keys)
+    if redis_client and keys:
+        try:
+            redis_client.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+        except Exception as e:
+            logger.warning(f"Failed to publish cache invalidation: {e}")
+
+def _listen(stop: threading.Event):
+    while not stop.is_set():
+        pubsub = None
+        try:
+            pubsub = redis_client.pubsub()
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            while not stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if not message:
+                    continue
+                if message["type"] == "subscribe":
+                    local_cache.enabled = True
+                elif message["type"] == "message":
+                    try:
+                        local_cache.invalidate(json.loads(message["data"]))
+                    except (TypeError, ValueError) as e:
+                        logger.warning(f"Ignoring malformed invalidation message: {e}")
+        except Exception as e:
+            logger.warning(f"Invalidation listener error, local cache disabled: {e}")
+            local_cache.disable()
+            stop.wait(1.0)
+        finally:
+            if pubsub is not None:
+                pubsub.close()
+    local_cache.disable()
+
+def start_invalidation_listener():
+    global _listener
+    if not redis_client or _listener is not None:
+        return
+    stop = threading.Event()
+    thread = threading.Thread(target=_listen, args=(stop,), name="cache-invalidation", daemon=True)
+    thread.start()
+    _listener = (thread, stop)
+
+def stop_invalidation_listener():
+    global _listener
+    if _listener is not None:
+        thread, stop = _listener
+        stop.set()
+        thread.join(timeout=2.0)
+        _listener = None
@@ -4,8 +4,13 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from typing import Generator
 
+from common.db import engine_options
+
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/analytics_db")
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, future=True)
+
+# Feature assembly is pandas/NumPy-bound, so this service keeps a synchronous engine;
+# its feature and scoring queries get a longer statement timeout than the lookups
+engine = create_engine(DATABASE_URL, future=True, **engine_options(DATABASE_URL, statement_timeout_ms=15000))
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
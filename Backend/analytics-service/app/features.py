@@ -0,0 +1,190 @@
+# analytics-service/app/features.py
+"""
+Feature assembly for readiness predictions.
+
+All aggregation is set-based: the database collapses sessions to one row per
+player per day, and the rolling windows are computed on a (players x days)
+NumPy matrix, so the cost does not depend on how much history a player has.
+"""
+import os
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .models import DimMatch, FactPlayerGps, FactPlayerWyscout
+
+FEATURE_WINDOW_DAYS = int(os.getenv("FEATURE_WINDOW_DAYS", "28"))
+ROSTER_WINDOW_DAYS = int(os.getenv("ROSTER_WINDOW_DAYS", "90"))
+ACUTE_WINDOW_DAYS = 7
+JDAY_CYCLE = 4  # J-4 .. J-1
+
+FEATURE_COLUMNS = [
+    "recent_goals",
+    "recent_xg",
+    "recent_minutes",
+    "avg_distance_km",
+    "sprint_count_avg",
+    "sprint_distance_avg",
+    "acute_load",
+    "chronic_load",
+    "acwr",
+    "days_since_last_match",
+] + [f"jday_{j}" for j in range(JDAY_CYCLE, 0, -1)]
+
+# Per-day sequence inputs (oldest day first, metrics interleaved), shaped
+# (SEQUENCE_DAYS, len(SEQUENCE_METRICS)) per player for sequence models (ONNX LSTM)
+SEQUENCE_DAYS = 5
+SEQUENCE_METRICS = ["distance_km", "load", "sprint_distance"]
+SEQUENCE_COLUMNS = [f"seq_{m}_{d}" for d in range(SEQUENCE_DAYS, 0, -1) for m in SEQUENCE_METRICS]
+
+def resolve_reference_date(db: Session, next_match_id: Optional[int] = None) -> date:
+    """Features are computed over the days strictly before this date."""
+    if next_match_id is not None:
+        match_date = db.execute(
+            select(DimMatch.match_date).where(DimMatch.match_id == next_match_id)
+        ).scalar()
+        if match_date is not None:
+            return match_date
+    return date.today()
+
+def team_roster(db: Session, team_id: int, ref_date: date,
+                window_days: int = ROSTER_WINDOW_DAYS) -> List[int]:
+    """Players with a GPS session for the team in the window before ref_date."""
+    start = (pd.Timestamp(ref_date) - pd.Timedelta(days=window_days)).date()
+    stmt = (
+        select(FactPlayerGps.player_id)
+        .where(
+            FactPlayerGps.team_id == team_id,
+            FactPlayerGps.session_date >= start,
+            FactPlayerGps.session_date < ref_date,
+        )
+        .distinct()
+        .order_by(FactPlayerGps.player_id)
+    )
+    return list(db.execute(stmt).scalars())
+
+def _gps_daily(db: Session, player_ids: Sequence[int], start: date, end: date) -> pd.DataFrame:
+    stmt = (
+        select(
+            FactPlayerGps.player_id,
+            FactPlayerGps.session_date,
+            func.count().label("sessions"),
+            func.coalesce(func.sum(FactPlayerGps.total_distance), 0.0).label("distance"),
+            func.coalesce(func.sum(FactPlayerGps.total_player_load), 0.0).label("load"),
+            func.coalesce(func.sum(FactPlayerGps.sprint_distance), 0.0).label("sprint_distance"),
+            func.coalesce(func.sum(FactPlayerGps.explosive_efforts), 0.0).label("explosive_efforts"),
+            func.max(case((FactPlayerGps.session_type == "match", 1), else_=0)).label("is_match"),
+        )
+        .where(
+            FactPlayerGps.player_id.in_(player_ids),
+            FactPlayerGps.session_date >= start,
+            FactPlayerGps.session_date < end,
+        )
+        .group_by(FactPlayerGps.player_id, FactPlayerGps.session_date)
+    )
+    return pd.DataFrame.from_records(
+        db.execute(stmt).all(),
+        columns=["player_id", "session_date", "sessions", "distance", "load",
+                 "sprint_distance", "explosive_efforts", "is_match"],
+    )
+
+def _wyscout_totals(db: Session, player_ids: Sequence[int], start: date, end: date) -> pd.DataFrame:
+    stmt = (
+        select(
+            FactPlayerWyscout.player_id,
+            func.coalesce(func.sum(FactPlayerWyscout.goals), 0).label("recent_goals"),
+            func.coalesce(func.sum(FactPlayerWyscout.xg), 0.0).label("recent_xg"),
+            func.coalesce(func.sum(FactPlayerWyscout.minutes_played), 0).label("recent_minutes"),
+        )
+        .join(DimMatch, DimMatch.match_id == FactPlayerWyscout.match_id)
+        .where(
+            FactPlayerWyscout.player_id.in_(player_ids),
+            DimMatch.match_date >= start,
+            DimMatch.match_date < end,
+        )
+        .group_by(FactPlayerWyscout.player_id)
+    )
+    frame = pd.DataFrame.from_records(
+        db.execute(stmt).all(),
+        columns=["player_id", "recent_goals", "recent_xg", "recent_minutes"],
+    )
+    return frame.set_index("player_id")
+
+def _safe_ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    return np.divide(num, den, out=np.zeros_like(num, dtype=float), where=den > 0)
+
+def build_feature_frame(db: Session, player_ids: Sequence[int], ref_date: date,
+                        window_days: int = FEATURE_WINDOW_DAYS) -> pd.DataFrame:
+    """
+    Build the feature matrix for several players at once.
+    Returns a DataFrame indexed by player_id (in request order) with FEATURE_COLUMNS
+    followed by SEQUENCE_COLUMNS. Players without any data get zeros.
+    """
+    ids = pd.Index(list(dict.fromkeys(int(p) for p in player_ids)), name="player_id")
+    window_days = max(window_days, ACUTE_WINDOW_DAYS, JDAY_CYCLE, SEQUENCE_DAYS)
+    start = (pd.Timestamp(ref_date) - pd.Timedelta(days=window_days)).date()
+
+    n = len(ids)
+    shape = (n, window_days)
+    load = np.zeros(shape)
+    distance = np.zeros(shape)
+    sprint = np.zeros(shape)
+    explosive = np.zeros(shape)
+    sessions = np.zeros(shape)
+    is_match = np.zeros(shape, dtype=bool)
+
+    gps = _gps_daily(db, list(ids), start, ref_date) if n else pd.DataFrame()
+    if not gps.empty:
+        # column 0 is the day before ref_date (J-1), column k is J-(k+1)
+        ref = np.datetime64(ref_date, "D")
+        day_idx = (ref - pd.to_datetime(gps["session_date"]).values.astype("datetime64[D]")).astype(int) - 1
+        row_idx = ids.get_indexer(gps["player_id"])
+        cell = (row_idx, day_idx)
+        load[cell] = gps["load"].to_numpy(float)
+        distance[cell] = gps["distance"].to_numpy(float)
+        sprint[cell] = gps["sprint_distance"].to_numpy(float)
+        explosive[cell] = gps["explosive_efforts"].to_numpy(float)
+        sessions[cell] = gps["sessions"].to_numpy(float)
+        is_match[cell] = gps["is_match"].to_numpy(bool)
+
+    total_sessions = sessions.sum(axis=1)
+    acute = load[:, :ACUTE_WINDOW_DAYS].sum(axis=1)
+    chronic = load.sum(axis=1) * ACUTE_WINDOW_DAYS / window_days  # weekly average
+
+    frame = pd.DataFrame(index=ids)
+    frame["avg_distance_km"] = _safe_ratio(distance.sum(axis=1), total_sessions) / 1000.0
+    frame["sprint_count_avg"] = _safe_ratio(explosive.sum(axis=1), total_sessions)
+    frame["sprint_distance_avg"] = _safe_ratio(sprint.sum(axis=1), total_sessions)
+    frame["acute_load"] = acute
+    frame["chronic_load"] = chronic
+    frame["acwr"] = _safe_ratio(acute, chronic)
+    frame["days_since_last_match"] = np.where(
+        is_match.any(axis=1), is_match.argmax(axis=1) + 1, window_days + 1
+    )
+    for j in range(JDAY_CYCLE, 0, -1):
+        frame[f"jday_{j}"] = load[:, j - 1]
+
+    daily = {"distance_km": distance / 1000.0, "load": load, "sprint_distance": sprint}
+    seq = np.stack([daily[m][:, SEQUENCE_DAYS - 1::-1] for m in SEQUENCE_METRICS], axis=2)
+    seq_frame = pd.DataFrame(seq.reshape(n, -1), index=ids, columns=SEQUENCE_COLUMNS)
+
+    wyscout = _wyscout_totals(db, list(ids), start, ref_date) if n else pd.DataFrame()
+    for col in ("recent_goals", "recent_xg", "recent_minutes"):
+        frame[col] = wyscout[col].reindex(ids).fillna(0).to_numpy(float) if not wyscout.empty else 0.0
+
+    return pd.concat([frame[FEATURE_COLUMNS], seq_frame], axis=1)
+
+def frame_row_to_features(row: pd.Series) -> Dict[str, Any]:
+    """Convert one feature-frame row to the dict shape used by the single-player API."""
+    features: Dict[str, Any] = {col: float(row[col]) for col in FEATURE_COLUMNS + SEQUENCE_COLUMNS}
+    features["jday_pattern"] = [features[f"jday_{j}"] for j in range(JDAY_CYCLE, 0, -1)]
+    return features
+
+def assemble_player_features(db: Session, player_id: int, next_match_id: Optional[int] = None) -> Dict[str, Any]:
+    ref_date = resolve_reference_date(db, next_match_id)
+    frame = build_feature_frame(db, [player_id], ref_date)
+    return frame_row_to_features(frame.iloc[0])
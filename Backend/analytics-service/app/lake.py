@@ -0,0 +1,173 @@
+# analytics-service/app/lake.py
+"""
+DuckDB query path over the Parquet export written by etl/app/export.py.
+
+Heavy reads (season reports, model-training frames) scan the partitioned
+Parquet files in-process instead of competing with the OLTP lookups on
+analytics_db. Fact views expose the Hive partition columns season, team_id and
+month; DuckDB reads them back as text, so filters compare strings and whole
+directories are pruned.
+
+The path is off (available() is False) unless LAKE_DIR points at an export.
+
+    python -m app.lake training --season 2024 --out training.parquet
+"""
+import argparse
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+logger = logging.getLogger("analytics-service")
+
+LAKE_DIR = os.getenv("LAKE_DIR", "")
+LAKE_THREADS = int(os.getenv("LAKE_THREADS", "4"))
+LAKE_MEMORY_LIMIT = os.getenv("LAKE_MEMORY_LIMIT", "1GB")
+
+FACTS = ("fact_player_gps", "fact_player_wyscout", "fact_wyscout_match")
+DIMENSIONS = ("dim_date", "dim_player", "dim_team", "dim_competition", "dim_match")
+
+_lock = threading.Lock()
+_database = None
+_local = threading.local()
+
+def available() -> bool:
+    if not LAKE_DIR or not os.path.isdir(LAKE_DIR):
+        return False
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _create_views(con):
+    for name in FACTS:
+        path = os.path.join(LAKE_DIR, name, "*", "*", "*", "*.parquet")
+        if os.path.isdir(os.path.join(LAKE_DIR, name)):
+            con.execute(f"CREATE OR REPLACE VIEW {name} AS "
+                        f"SELECT * FROM read_parquet('{path}', hive_partitioning = true)")
+    for name in DIMENSIONS:
+        path = os.path.join(LAKE_DIR, name, f"{name}.parquet")
+        if os.path.exists(path):
+            con.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet('{path}')")
+
+def connection():
+    """
+    Cursor for the calling thread. One in-memory DuckDB database per process holds
+    the views; every thread gets its own cursor on it (cursors are not thread-safe).
+    """
+    global _database
+    cursor = getattr(_local, "cursor", None)
+    if cursor is None:
+        import duckdb
+        with _lock:
+            if _database is None:
+                _database = duckdb.connect(":memory:", config={"threads": LAKE_THREADS,
+                                                              "memory_limit": LAKE_MEMORY_LIMIT})
+                _create_views(_database)
+            cursor = _local.cursor = _database.cursor()
+    return cursor
+
+def _execute(sql: str, params: Sequence[Any]):
+    import duckdb
+    cursor = connection()
+    try:
+        return cursor.execute(sql, list(params))
+    except duckdb.CatalogException:
+        # a table exported after the views were created: pick it up and retry once
+        with _lock:
+            _create_views(_database)
+        return cursor.execute(sql, list(params))
+
+def query(sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    cursor = _execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def query_frame(sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+    return _execute(sql, params).df()
+
+def _partition_filter(season: int, team_id: Optional[int]):
+    # partition values are text in the Parquet paths
+    where, params = "season = ?", [str(season)]
+    if team_id is not None:
+        where += " AND team_id = ?"
+        params.append(str(team_id))
+    return where, params
+
+_SEASON_REPORT = """
+WITH gps AS (
+    SELECT player_id,
+           COUNT(*) AS sessions,
+           COUNT(*) FILTER (WHERE session_type = 'match') AS match_sessions,
+           SUM(total_distance) AS total_distance,
+           SUM(total_duration) AS total_duration,
+           SUM(total_player_load) AS total_player_load,
+           SUM(sprint_distance) AS sprint_distance,
+           SUM(explosive_efforts) AS explosive_efforts,
+           AVG(avg_heart_rate) AS avg_heart_rate,
+           MAX(max_heart_rate) AS max_heart_rate
+    FROM fact_player_gps WHERE {where}
+    GROUP BY player_id
+), wyscout AS (
+    SELECT player_id,
+           COUNT(*) AS matches,
+           SUM(minutes_played) AS minutes_played,
+           SUM(goals) AS goals,
+           SUM(assists) AS assists,
+           SUM(xg) AS xg
+    FROM fact_player_wyscout WHERE {where}
+    GROUP BY player_id
+)
+SELECT player_id, p.player_name_std, p.position, gps.* EXCLUDE (player_id), wyscout.* EXCLUDE (player_id)
+FROM gps FULL OUTER JOIN wyscout USING (player_id)
+LEFT JOIN dim_player p USING (player_id)
+ORDER BY total_player_load DESC NULLS LAST, player_id
+"""
+
+def season_report(season: int, team_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Per-player GPS and Wyscout season totals (season = start year)."""
+    where, params = _partition_filter(season, team_id)
+    return query(_SEASON_REPORT.format(where=where), params + params)
+
+_TRAINING_FRAME = """
+WITH days AS (
+    SELECT player_id, session_date,
+           SUM(total_distance) AS distance,
+           SUM(total_player_load) AS load,
+           SUM(sprint_distance) AS sprint_distance,
+           SUM(explosive_efforts) AS explosive_efforts,
+           MAX(CASE WHEN session_type = 'match' THEN 1 ELSE 0 END) AS is_match
+    FROM fact_player_gps WHERE {where}
+    GROUP BY player_id, session_date
+)
+SELECT days.*, w.minutes_played, w.goals, w.assists, w.xg
+FROM days
+LEFT JOIN (SELECT * FROM fact_player_wyscout WHERE {where}) w
+       ON w.player_id = days.player_id AND w.match_date = days.session_date
+ORDER BY days.player_id, days.session_date
+"""
+
+def training_frame(season: int, team_id: Optional[int] = None) -> pd.DataFrame:
+    """One row per player per GPS day with that day's match output, for model training."""
+    where, params = _partition_filter(season, team_id)
+    return query_frame(_TRAINING_FRAME.format(where=where), params + params)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Read model-training data from the Parquet export")
+    parser.add_argument("command", choices=["training"])
+    parser.add_argument("--season", type=int, required=True)
+    parser.add_argument("--team-id", type=int, default=None)
+    parser.add_argument("--out", required=True, help="Parquet or CSV file to write")
+    args = parser.parse_args()
+    if not available():
+        parser.error("LAKE_DIR is not set to an export directory, or duckdb is not installed")
+    frame = training_frame(args.season, args.team_id)
+    if args.out.endswith(".csv"):
+        frame.to_csv(args.out, index=False)
+    else:
+        connection().from_df(frame).write_parquet(args.out)
+    logger.info(f"Wrote {len(frame)} rows to {args.out}")
@@ -1,10 +1,19 @@
 # analytics-service/app/main.py
-from fastapi import FastAPI, Depends, HTTPException, Query
-from .db import get_db
-from .ml import load_model, predict
-from typing import Optional
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import redis
+from fastapi import FastAPI, Depends, HTTPException, Query, BackgroundTasks
+from .db import engine, get_db
+from .cache import (CACHE_LOOKUPS, cache_prediction, local_cache, prediction_cache_key, redis_client,
+                    start_invalidation_listener, stop_invalidation_listener)
+from .ml import build_prediction, load_model, predict, predict_batch, warmup
+from .features import assemble_player_features, build_feature_frame, resolve_reference_date, team_roster
+from .batcher import MICRO_BATCH_ENABLED, MicroBatcher
+from .scoring import SCORING_INTERVAL_SECONDS, lookup_precomputed, run_scoring_job, scoring_scheduler
+from . import lake
+from common import auth, metrics
+from .workload import SERIES_METRICS, latest_workload_date, run_workload_job, squad_series
+from typing import List, Optional
+from datetime import date, timedelta
+from sqlalchemy.exc import SQLAlchemyError
+import asyncio
 import json
 import os
 import logging
@@ -15,79 +24,237 @@ logger = logging.getLogger("analytics-service")
 
 # App
 app = FastAPI(title="Analytics Service")
-
-# Auth dependency (demo)
-security = HTTPBearer()
-def verify_token(creds: HTTPAuthorizationCredentials = Depends(security)):
-    token = creds.credentials
-    # Demo decode; in production verify signature and SN/roles
-    import jwt
-    try:
-        payload = jwt.decode(token, options={"verify_signature": False, "verify_exp": False})
-        return payload
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-# Redis client (optional)
-REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
-redis_client = None
-try:
-    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
-    redis_client.ping()
-    logger.info("Connected to Redis")
-except Exception as e:
-    redis_client = None
-    logger.warning(f"Redis not available: {e}")
+metrics.instrument_app(app)
+metrics.instrument_engine(engine)
 
 # Load ML model at startup
 MODEL = load_model()
+# Live single-player inference goes through the micro-batcher when enabled
+BATCHER = MicroBatcher(MODEL) if MICRO_BATCH_ENABLED else None
+
+MAX_BATCH_PLAYERS = int(os.getenv("MAX_BATCH_PLAYERS", "200"))
+
+@app.on_event("startup")
+async def startup_event():
+    # Create tables in demo if needed (in actual deployments migrations are used)
+    from .db import Base, engine
+    from . import models  # noqa: F401 - registers the tables
+    Base.metadata.create_all(bind=engine)
+    warmup(MODEL)
+    start_invalidation_listener()
+    auth.start_jwks_refresh()
+    if BATCHER:
+        await BATCHER.start()
+    if SCORING_INTERVAL_SECONDS > 0:
+        asyncio.get_running_loop().create_task(scoring_scheduler(SCORING_INTERVAL_SECONDS))
+        logger.info(f"Scoring job polling every {SCORING_INTERVAL_SECONDS}s")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_invalidation_listener()
+    await auth.stop_jwks_refresh()
+    if BATCHER:
+        await BATCHER.stop()
 
 @app.get("/healthz")
 def health():
     return {"status": "ok", "service": "analytics-service"}
 
+@app.get("/metrics/local-cache")
+def local_cache_metrics():
+    """Hit/miss/eviction counters of the in-process cache tier."""
+    return local_cache.snapshot()
+
 @app.get("/predict/player/{player_id}")
-def predict_player(player_id: int, next_match_id: Optional[int] = None, token=Depends(verify_token)):
+def predict_player(player_id: int, next_match_id: Optional[int] = None, token=Depends(auth.verify_token),
+                   db_session=Depends(get_db)):
     """
     Predict the Match Readiness Score for a player for the next match.
     Steps:
-     - Check Redis cache (keyed by player+match)
-     - If missing: query data warehouse for features (stub here)
+     - Check the in-process cache, then Redis (keyed by player+match)
+     - Then the precomputed fact_readiness_score row written by the scoring job
+     - If missing: assemble rolling GPS/Wyscout features from the data warehouse
      - Call model to predict
      - Cache prediction and return
     """
-    cache_key = f"pred:player:{player_id}:match:{next_match_id or 'next'}"
+    cache_key = prediction_cache_key(player_id, next_match_id)
+    cached = local_cache.get(cache_key)
+    CACHE_LOOKUPS.labels("local", "miss" if cached is None else "hit").inc()
+    if cached is not None:
+        return cached
     if redis_client:
         cached = redis_client.get(cache_key)
+        CACHE_LOOKUPS.labels("redis", "hit" if cached else "miss").inc()
         if cached:
             logger.info("Returning cached prediction")
-            return json.loads(cached)
-
-    # === Feature assembly (demo stub) ===
-    # In real app: query the DB for last N days, compute J-day cycle and engineered features
-    features = {
-        "recent_goals": 1,
-        "recent_xg": 0.8,
-        "avg_distance_km": 9.2,
-        "sprint_count_avg": 6,
-        "jday_pattern": [5, 3, 2, 1],  # simplified
-    }
+            response = json.loads(cached)
+            local_cache.set(cache_key, response)
+            return response
 
-    # Perform prediction
-    score = predict(MODEL, features)
+    try:
+        precomputed = lookup_precomputed(db_session, [player_id], next_match_id)
+        if player_id in precomputed:
+            score = precomputed[player_id]
+        else:
+            # Feature assembly: last N days of workload, xG, sprints and the J-day cycle
+            features = assemble_player_features(db_session, player_id, next_match_id)
+            # Perform prediction (coalesced with concurrent requests when batching is on)
+            score = BATCHER.predict_threadsafe(features) if BATCHER else predict(MODEL, features)
+    except SQLAlchemyError:
+        logger.exception("DB error assembling features")
+        raise HTTPException(status_code=500, detail="Database error")
 
-    response = {
-        "player_id": player_id,
-        "match_id": next_match_id,
-        "predicted_readiness": round(score, 2),
-        "model": os.getenv("MLFLOW_MODEL_URI", "demo-fallback")
-    }
+    response = build_prediction(player_id, next_match_id, score)
+    local_cache.set(cache_key, response)
 
     # Cache for short TTL in seconds
     if redis_client:
         try:
-            redis_client.setex(cache_key, 60 * 5, json.dumps(response))  # 5 min cache
+            pipe = redis_client.pipeline(transaction=False)
+            cache_prediction(pipe, player_id, next_match_id, json.dumps(response))
+            pipe.execute()
         except Exception as e:
             logger.warning(f"Failed to cache prediction: {e}")
 
     return response
+
+@app.get("/predict/players")
+def predict_players(player_ids: Optional[List[int]] = Query(None), team_id: Optional[int] = None,
+                    next_match_id: Optional[int] = None, token=Depends(auth.verify_token),
+                    db_session=Depends(get_db)):
+    """
+    Readiness scores for a whole squad (team_id) or an explicit list of players
+    (?player_ids=1&player_ids=2), in one round trip.
+     - In-process cache first, then one Redis MGET for the remaining keys
+     - One lookup of precomputed scores for the cache misses
+     - Features for the remaining misses fetched with one set-based query
+     - One vectorized model.predict over the feature frame
+     - Misses written back with a single pipelined SETEX
+    """
+    if not player_ids and team_id is None:
+        raise HTTPException(status_code=400, detail="Provide player_ids or team_id")
+
+    try:
+        ref_date = resolve_reference_date(db_session, next_match_id)
+        ids = list(dict.fromkeys(player_ids)) if player_ids else team_roster(db_session, team_id, ref_date)
+    except SQLAlchemyError:
+        logger.exception("DB error resolving roster")
+        raise HTTPException(status_code=500, detail="Database error")
+    if len(ids) > MAX_BATCH_PLAYERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PLAYERS} players per request")
+
+    results = {}
+    for pid in ids:
+        cached = local_cache.get(prediction_cache_key(pid, next_match_id))
+        if cached is not None:
+            results[pid] = cached
+    remote = [pid for pid in ids if pid not in results]
+    CACHE_LOOKUPS.labels("local", "hit").inc(len(results))
+    CACHE_LOOKUPS.labels("local", "miss").inc(len(remote))
+    if redis_client and remote:
+        try:
+            keys = [prediction_cache_key(pid, next_match_id) for pid in remote]
+            for pid, key, cached in zip(remote, keys, redis_client.mget(keys)):
+                CACHE_LOOKUPS.labels("redis", "hit" if cached else "miss").inc()
+                if cached:
+                    results[pid] = json.loads(cached)
+                    local_cache.set(key, results[pid])
+        except Exception as e:
+            logger.warning(f"Failed to read cached predictions: {e}")
+
+    misses = [pid for pid in ids if pid not in results]
+    if misses:
+        try:
+            fresh = {pid: build_prediction(pid, next_match_id, score)
+                     for pid, score in lookup_precomputed(db_session, misses, next_match_id).items()}
+            live = [pid for pid in misses if pid not in fresh]
+            if live:
+                frame = build_feature_frame(db_session, live, ref_date)
+                scores = predict_batch(MODEL, frame)
+                fresh.update({pid: build_prediction(pid, next_match_id, score)
+                              for pid, score in zip(frame.index, scores)})
+        except SQLAlchemyError:
+            logger.exception("DB error assembling features")
+            raise HTTPException(status_code=500, detail="Database error")
+        results.update(fresh)
+        for pid, response in fresh.items():
+            local_cache.set(prediction_cache_key(pid, next_match_id), response)
+
+        if redis_client:
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                for pid, response in fresh.items():
+                    cache_prediction(pipe, pid, next_match_id, json.dumps(response))
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to cache predictions: {e}")
+
+    return {
+        "team_id": team_id,
+        "match_id": next_match_id,
+        "predictions": [results[pid] for pid in ids],
+    }
+
+@app.post("/jobs/score", status_code=202)
+def trigger_scoring(background_tasks: BackgroundTasks, next_match_id: Optional[int] = None,
+                    token=Depends(auth.verify_token)):
+    """Recompute and warm readiness scores for every active player (call after a GPS/Wyscout load)."""
+    roles = token.get("realm_access", {}).get("roles", [])
+    if "analyst" not in roles and "coach" not in roles:
+        raise HTTPException(status_code=403, detail="Insufficient permissions to run scoring")
+    background_tasks.add_task(run_scoring_job, next_match_id)
+    return {"status": "scheduled", "match_id": next_match_id}
+
+@app.post("/jobs/workload", status_code=202)
+def trigger_workload(background_tasks: BackgroundTasks, token=Depends(auth.verify_token)):
+    """Advance the per-player ACWR/EWMA/monotony state to the latest GPS day (call after a GPS load)."""
+    roles = token.get("realm_access", {}).get("roles", [])
+    if "analyst" not in roles and "coach" not in roles:
+        raise HTTPException(status_code=403, detail="Insufficient permissions to run the workload job")
+    background_tasks.add_task(run_workload_job)
+    return {"status": "scheduled"}
+
+@app.get("/workload/squad")
+def squad_workload(team_id: Optional[int] = None, player_ids: Optional[List[int]] = Query(None),
+                   start: Optional[date] = None, end: Optional[date] = None, days: int = Query(28, ge=1, le=366),
+                   metrics: Optional[List[str]] = Query(None), token=Depends(auth.verify_token),
+                   db_session=Depends(get_db)):
+    """
+    Daily ACWR, EWMA load, monotony, strain and J-day position for a squad
+    (team_id) or a list of players, as columnar arrays: `dates`, `player_ids`
+    and per metric one array per player aligned with `dates`.
+    Defaults to the `days` days up to the latest processed day.
+    """
+    if not player_ids and team_id is None:
+        raise HTTPException(status_code=400, detail="Provide player_ids or team_id")
+    unknown = set(metrics or ()) - set(SERIES_METRICS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {sorted(unknown)}")
+    try:
+        end = end or latest_workload_date(db_session) or date.today()
+        start = start or end - timedelta(days=days - 1)
+        if start > end or (end - start).days >= 366:
+            raise HTTPException(status_code=400, detail="Date range must be between 1 and 366 days")
+        ids = list(dict.fromkeys(player_ids)) if player_ids else team_roster(db_session, team_id, end + timedelta(days=1))
+        if len(ids) > MAX_BATCH_PLAYERS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PLAYERS} players per request")
+        series = squad_series(db_session, ids, start, end, metrics or SERIES_METRICS)
+    except SQLAlchemyError:
+        logger.exception("DB error reading workload series")
+        raise HTTPException(status_code=500, detail="Database error")
+    return {"team_id": team_id, **series}
+
+@app.get("/reports/season")
+def season_report(season: int, team_id: Optional[int] = None, token=Depends(auth.verify_token)):
+    """
+    Per-player GPS and Wyscout totals for a season (start year), optionally for
+    one team. Read from the Parquet export through DuckDB, not from analytics_db.
+    """
+    if not lake.available():
+        raise HTTPException(status_code=503, detail="Parquet export not configured")
+    try:
+        players = lake.season_report(season, team_id)
+    except Exception:
+        logger.exception("Parquet query failed")
+        raise HTTPException(status_code=500, detail="Report query failed")
+    return {"season": season, "team_id": team_id, "players": players}
@@ -1,22 +1,118 @@
 # analytics-service/app/ml.py
 import os
-import mlflow.pyfunc
-import json
-from typing import Dict, Any
+import threading
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List, Optional
+from prometheus_client import Histogram
 
+from common.metrics import LATENCY_BUCKETS
+from .features import FEATURE_COLUMNS, SEQUENCE_COLUMNS, SEQUENCE_DAYS, SEQUENCE_METRICS
+
+# Inference backend per deployment: "mlflow" (default) or "onnx"
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "mlflow").lower()
 MLFLOW_MODEL_URI = os.getenv("MLFLOW_MODEL_URI", "models:/player_perf_model/Production")
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "/app/models/player_prep_model.onnx")
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "1"))
+ONNX_MAX_BATCH = int(os.getenv("ONNX_MAX_BATCH", "256"))
+WARMUP_RUNS = int(os.getenv("MODEL_WARMUP_RUNS", "3"))
+
+INFERENCE_LATENCY = Histogram("model_inference_duration_seconds", "model.predict time, fallback excluded",
+                              ["call", "backend"], buckets=LATENCY_BUCKETS)
+INFERENCE_ROWS = Histogram("model_inference_rows", "Rows per model.predict call", ["call"],
+                           buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+
+def _timed_predict(model, frame: pd.DataFrame, call: str):
+    start = time.perf_counter()
+    try:
+        return model.predict(frame)
+    finally:
+        INFERENCE_LATENCY.labels(call, INFERENCE_BACKEND).observe(time.perf_counter() - start)
+        INFERENCE_ROWS.labels(call).observe(len(frame))
+
+if INFERENCE_BACKEND == "onnx":
+    MODEL_NAME = os.path.basename(ONNX_MODEL_PATH)
+else:
+    MODEL_NAME = os.getenv("MLFLOW_MODEL_URI", "demo-fallback")
+
+class OnnxModel:
+    """
+    onnxruntime session exposing the same predict(DataFrame) call as an MLflow pyfunc.
+    The shipped model is an LSTM over (SEQUENCE_DAYS, len(SEQUENCE_METRICS)) per player,
+    so it reads SEQUENCE_COLUMNS. Input tensors are written into preallocated
+    per-thread buffers instead of being allocated for every call.
+    """
+    input_columns = SEQUENCE_COLUMNS
+
+    def __init__(self, path: str, intra_op_threads: int = 1, max_batch: int = 256):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = intra_op_threads
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+        self.sample_shape = tuple(model_input.shape[1:])
+        expected = (SEQUENCE_DAYS, len(SEQUENCE_METRICS))
+        if self.sample_shape != expected:
+            raise ValueError(f"ONNX input {self.input_name} expects {self.sample_shape}, features provide {expected}")
+        self.max_batch = max_batch
+        self._local = threading.local()
+
+    def _buffer(self) -> np.ndarray:
+        buf = getattr(self._local, "buffer", None)
+        if buf is None:
+            buf = np.zeros((self.max_batch,) + self.sample_shape, dtype=np.float32)
+            self._local.buffer = buf
+        return buf
 
-# This loader wraps MLflow model inference; in the hackathon demo this can be a stub
+    def predict(self, frame: pd.DataFrame) -> np.ndarray:
+        values = frame[self.input_columns].to_numpy(dtype=np.float32, copy=False)
+        n = len(values)
+        out = np.empty(n, dtype=np.float32)
+        buf = self._buffer()
+        for start in range(0, n, self.max_batch):
+            stop = min(start + self.max_batch, n)
+            view = buf[:stop - start]
+            view.reshape(stop - start, -1)[:] = values[start:stop]
+            result = self.session.run([self.output_name], {self.input_name: view})[0]
+            out[start:stop] = result.reshape(stop - start, -1)[:, 0]
+        return out
+
+def _load_mlflow_model():
+    # imported lazily: mlflow is slow to import and not needed by the ONNX backend
+    import mlflow.pyfunc
+    return mlflow.pyfunc.load_model(MLFLOW_MODEL_URI)
+
+# This loader wraps model inference; in the hackathon demo this can be a stub
 def load_model():
     # In a real deployment we will load the model once at startup.
     try:
-        model = mlflow.pyfunc.load_model(MLFLOW_MODEL_URI)
-        return model
+        if INFERENCE_BACKEND == "onnx":
+            return OnnxModel(ONNX_MODEL_PATH, ONNX_INTRA_OP_THREADS, ONNX_MAX_BATCH)
+        return _load_mlflow_model()
     except Exception as e:
         # For demo, return None and let code handle prediction fallback
-        print(f"Warning: failed to load MLflow model: {e}")
+        print(f"Warning: failed to load {INFERENCE_BACKEND} model: {e}")
         return None
 
+def _input_columns(model) -> List[str]:
+    return getattr(model, "input_columns", FEATURE_COLUMNS)
+
+def warmup(model, runs: int = WARMUP_RUNS, batch_sizes: Optional[List[int]] = None):
+    """Run a few dummy inferences so the first real request doesn't pay for lazy init."""
+    if model is None:
+        return
+    for size in batch_sizes or [1, min(32, ONNX_MAX_BATCH)]:
+        frame = pd.DataFrame(np.zeros((size, len(_input_columns(model)))), columns=_input_columns(model))
+        for _ in range(runs):
+            predict_batch(model, frame)
+
 def predict(model, features: Dict[str, Any]):
     """
     features: a dict of arrays or single-row feature dict depending on model signature.
@@ -32,13 +128,42 @@ def predict(model, features: Dict[str, Any]):
         return max(1.0, min(10.0, score))
     try:
         # model expects data-frame-like structure; mlflow.pyfunc returns numpy/pandas-friendly predictions
-        result = model.predict(features)
+        row = {col: features.get(col, 0.0) for col in _input_columns(model)}
+        result = _timed_predict(model, pd.DataFrame([row]), "predict")
         # model may return array-like
         if hasattr(result, "__len__"):
-            return float(result[0])
+            return float(np.asarray(result).reshape(-1)[0])
         return float(result)
     except Exception as e:
         print(f"Prediction error: {e}")
         # degrade gracefully
         return 5.0
 
+def predict_batch(model, frame: pd.DataFrame) -> np.ndarray:
+    """
+    Vectorized variant of predict: one model.predict call for a whole feature frame
+    (one row per player). Returns a float array aligned with frame rows.
+    """
+    if frame.empty:
+        return np.zeros(0)
+    if model is None:
+        # same heuristic as predict(), applied column-wise
+        score = 5.0 + frame.get("recent_goals", 0) * 0.7 \
+            + frame.get("recent_xg", 0) * 0.6 \
+            + frame.get("avg_distance_km", 0) * 0.1
+        return np.clip(np.asarray(score, dtype=float).reshape(-1), 1.0, 10.0)
+    try:
+        result = _timed_predict(model, frame[_input_columns(model)].reset_index(drop=True), "predict_batch")
+        return np.asarray(result, dtype=float).reshape(-1)
+    except Exception as e:
+        print(f"Batch prediction error: {e}")
+        return np.full(len(frame), 5.0)
+
+def build_prediction(player_id: int, next_match_id, score: float) -> Dict[str, Any]:
+    """Response/cache payload for one readiness score."""
+    return {
+        "player_id": player_id,
+        "match_id": next_match_id,
+        "predicted_readiness": round(float(score), 2),
+        "model": MODEL_NAME
+    }
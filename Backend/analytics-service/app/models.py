@@ -0,0 +1,118 @@
+# analytics-service/app/models.py
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, ForeignKey, Index, Boolean, Text
+from .db import Base
+
+class DimMatch(Base):
+    __tablename__ = "dim_match"
+    # Wyscout totals join on a match_date window
+    __table_args__ = (Index("ix_dim_match_date", "match_date", "match_id"),)
+
+    match_id = Column(Integer, primary_key=True, index=True)
+    match_date = Column(Date, nullable=False)
+    competition_id = Column(Integer)
+    home_team_id = Column(Integer, index=True)
+    away_team_id = Column(Integer, index=True)
+
+class FactPlayerGps(Base):
+    """One row per player per GPS session (training or match)."""
+    __tablename__ = "fact_player_gps"
+
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, nullable=False)
+    team_id = Column(Integer)
+    session_date = Column(Date, nullable=False)
+    session_type = Column(String(50))  # "match" / "training"
+    session_no = Column(Integer, nullable=False, server_default="1")  # per player, date and type
+    total_distance = Column(Float)  # metres
+    total_duration = Column(Float)  # minutes
+    total_player_load = Column(Float)
+    sprint_distance = Column(Float)
+    explosive_efforts = Column(Float)
+    accel_decel_efforts = Column(Float)
+    avg_heart_rate = Column(Float)
+    max_heart_rate = Column(Float)
+
+    # feature assembly always reads a player's recent window (index-only on Postgres);
+    # rosters read a team's window and the scoring job every player's
+    __table_args__ = (
+        Index("ix_fact_player_gps_player_date_covering", "player_id", "session_date",
+              postgresql_include=["session_type", "total_distance", "total_player_load", "sprint_distance",
+                                  "explosive_efforts"]),
+        Index("ix_fact_player_gps_team_date_player", "team_id", "session_date", "player_id"),
+        Index("ix_fact_player_gps_date_player", "session_date", "player_id"),
+    )
+
+class FactPlayerWyscout(Base):
+    __tablename__ = "fact_player_wyscout"
+    # Wyscout totals per player over a window, without touching the heap on Postgres
+    __table_args__ = (
+        # keep identical to player-service and etl/app/schema.py: create_all skips it once any of them built it
+        Index("ix_fact_player_wyscout_player_history", "player_id", "id",
+              postgresql_include=["match_id", "minutes_played", "goals", "assists", "xg",
+                                  "passes_total", "passes_precise"]),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, nullable=False)
+    match_id = Column(Integer, ForeignKey("dim_match.match_id", name="fk_fact_player_wyscout_match_id"), index=True)
+    minutes_played = Column(Integer)
+    goals = Column(Integer, default=0)
+    assists = Column(Integer, default=0)
+    xg = Column(Float)
+    passes_total = Column(Integer)
+    passes_precise = Column(Integer)
+
+class FactReadinessScore(Base):
+    """
+    Readiness scores precomputed by the scoring job.
+    match_id 0 means "next fixture as of ref_date" (the API's next_match_id=None).
+    """
+    __tablename__ = "fact_readiness_score"
+
+    player_id = Column(Integer, primary_key=True)
+    match_id = Column(Integer, primary_key=True, default=0)
+    ref_date = Column(Date, nullable=False)
+    score = Column(Float, nullable=False)
+    model = Column(String(200))
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+class PlayerWorkloadState(Base):
+    """
+    Rolling workload state per player as of `as_of`, advanced one day at a time by
+    the workload job (see workload.py). `loads` is a JSON ring buffer of the last
+    CHRONIC_WINDOW_DAYS daily loads, slot = day ordinal % CHRONIC_WINDOW_DAYS.
+    """
+    __tablename__ = "player_workload_state"
+
+    player_id = Column(Integer, primary_key=True, autoincrement=False)
+    as_of = Column(Date, nullable=False)
+    loads = Column(Text, nullable=False)
+    acute_sum = Column(Float, nullable=False)
+    acute_sq_sum = Column(Float, nullable=False)
+    chronic_sum = Column(Float, nullable=False)
+    ewma_acute = Column(Float, nullable=False)
+    ewma_chronic = Column(Float, nullable=False)
+    last_match_date = Column(Date)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class FactPlayerWorkload(Base):
+    """Daily workload statistics per player, one row for every day since the player's first session."""
+    __tablename__ = "fact_player_workload"
+
+    player_id = Column(Integer, primary_key=True, autoincrement=False)
+    load_date = Column(Date, primary_key=True)
+    load = Column(Float, nullable=False)  # total player load that day, 0 on rest days
+    is_match = Column(Boolean, nullable=False, default=False)
+    acute_load = Column(Float)            # last 7 days
+    chronic_load = Column(Float)          # weekly average over the chronic window
+    acwr = Column(Float)
+    ewma_acute = Column(Float)
+    ewma_chronic = Column(Float)
+    ewma_acwr = Column(Float)
+    monotony = Column(Float)              # 7-day mean / standard deviation
+    strain = Column(Float)                # 7-day load x monotony
+    days_since_match = Column(Integer)    # J+n of the J-day cycle
+
+    # the squad series reads a date range across players
+    __table_args__ = (Index("ix_fact_player_workload_date", "load_date"),)
@@ -0,0 +1,223 @@
+# analytics-service/app/scoring.py
+"""
+Background scoring job.
+
+After each GPS/Wyscout load, readiness is recomputed for every active player in
+chunks on a process pool, stored in fact_readiness_score and pushed to Redis, so
+the API serves precomputed scores and only runs live inference on a miss. A
+stored score older than SCORE_MAX_AGE_SECONDS, or computed for a match date
+that has since moved, counts as a miss.
+
+The scheduler rescores the next-fixture scores and the squads of every match in
+the next UPCOMING_MATCH_DAYS whenever a load lands, the day changes, or the
+scores are half way to SCORE_MAX_AGE_SECONDS.
+
+Run once (e.g. at the end of a load):  python -m app.scoring [--match-id N]
+Or set SCORING_INTERVAL_SECONDS so the service polls for new loads itself.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from .cache import cache_prediction, prediction_cache_key, publish_invalidation, redis_client
+from .db import SessionLocal
+from .features import ROSTER_WINDOW_DAYS, build_feature_frame, resolve_reference_date, team_roster
+from .ml import MODEL_NAME, build_prediction, load_model, predict_batch
+from .models import DimMatch, FactPlayerGps, FactPlayerWyscout, FactReadinessScore
+from .workload import run_workload_job
+
+logger = logging.getLogger("analytics-service")
+
+SCORING_CHUNK_SIZE = int(os.getenv("SCORING_CHUNK_SIZE", "200"))
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(os.cpu_count() or 1)))
+SCORING_INTERVAL_SECONDS = int(os.getenv("SCORING_INTERVAL_SECONDS", "0"))  # 0 = no polling
+SCORE_MAX_AGE_SECONDS = int(os.getenv("SCORE_MAX_AGE_SECONDS", "21600"))
+UPCOMING_MATCH_DAYS = int(os.getenv("UPCOMING_MATCH_DAYS", "14"))
+NEXT_MATCH_KEY = 0
+
+Scored = List[Tuple[int, float]]
+
+def active_players(db: Session, ref_date: date, window_days: int = ROSTER_WINDOW_DAYS) -> List[int]:
+    """Every player with a GPS session in the window before ref_date."""
+    start = date.fromordinal(ref_date.toordinal() - window_days)
+    stmt = (
+        select(FactPlayerGps.player_id)
+        .where(FactPlayerGps.session_date >= start, FactPlayerGps.session_date < ref_date)
+        .distinct()
+        .order_by(FactPlayerGps.player_id)
+    )
+    return list(db.execute(stmt).scalars())
+
+def match_squads(db: Session, match_id: int, ref_date: date) -> List[int]:
+    """Both teams' rosters for a match; every active player if the match has no teams."""
+    teams = db.execute(select(DimMatch.home_team_id, DimMatch.away_team_id)
+                       .where(DimMatch.match_id == match_id)).first()
+    team_ids = [t for t in teams or () if t is not None]
+    if not team_ids:
+        return active_players(db, ref_date)
+    return sorted({pid for team_id in team_ids for pid in team_roster(db, team_id, ref_date)})
+
+def upcoming_matches(db: Session, today: date, days: int = UPCOMING_MATCH_DAYS) -> List[int]:
+    stmt = (
+        select(DimMatch.match_id)
+        .where(DimMatch.match_date >= today, DimMatch.match_date <= today + timedelta(days=days))
+        .order_by(DimMatch.match_date, DimMatch.match_id)
+    )
+    return list(db.execute(stmt).scalars())
+
+def data_watermark(db: Session) -> Tuple[Optional[int], Optional[int]]:
+    """Highest GPS and Wyscout fact ids; a change means a new load has landed."""
+    gps = db.execute(select(func.max(FactPlayerGps.id))).scalar()
+    wyscout = db.execute(select(func.max(FactPlayerWyscout.id))).scalar()
+    return gps, wyscout
+
+def lookup_precomputed(db: Session, player_ids: Sequence[int], next_match_id: Optional[int]) -> Dict[int, float]:
+    """
+    Primary-key lookups into fact_readiness_score, skipping scores older than
+    SCORE_MAX_AGE_SECONDS. "Next fixture" scores must be from today, and match
+    scores for the match's current date.
+    """
+    if not player_ids:
+        return {}
+    stmt = select(FactReadinessScore.player_id, FactReadinessScore.score).where(
+        FactReadinessScore.match_id == (next_match_id or NEXT_MATCH_KEY),
+        FactReadinessScore.player_id.in_(list(player_ids)),
+        FactReadinessScore.computed_at >= datetime.utcnow() - timedelta(seconds=SCORE_MAX_AGE_SECONDS),
+    )
+    if next_match_id:
+        match_date = select(DimMatch.match_date).where(DimMatch.match_id == next_match_id).scalar_subquery()
+        stmt = stmt.where(FactReadinessScore.ref_date == match_date)
+    else:
+        stmt = stmt.where(FactReadinessScore.ref_date == date.today())
+    return {pid: score for pid, score in db.execute(stmt).all()}
+
+# --- worker side -----------------------------------------------------------
+
+_UNSET = object()
+_worker_model = _UNSET
+
+def _init_worker():
+    # each worker process loads the model once and reuses it for every chunk
+    global _worker_model
+    _worker_model = load_model()
+
+def _score_chunk(args: Tuple[List[int], date]) -> Scored:
+    player_ids, ref_date = args
+    db = SessionLocal()
+    try:
+        frame = build_feature_frame(db, player_ids, ref_date)
+    finally:
+        db.close()
+    scores = predict_batch(_worker_model, frame)
+    return list(zip(frame.index.tolist(), scores.tolist()))
+
+# --- parent side -----------------------------------------------------------
+
+def _persist(db: Session, match_key: int, ref_date: date, scored: Scored):
+    ids = [pid for pid, _ in scored]
+    db.execute(delete(FactReadinessScore).where(
+        FactReadinessScore.match_id == match_key,
+        FactReadinessScore.player_id.in_(ids),
+    ))
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(FactReadinessScore, [
+        {"player_id": pid, "match_id": match_key, "ref_date": ref_date,
+         "score": score, "model": MODEL_NAME, "computed_at": now}
+        for pid, score in scored
+    ])
+    db.commit()
+
+def _warm_cache(next_match_id: Optional[int], scored: Scored):
+    keys = [prediction_cache_key(pid, next_match_id) for pid, _ in scored]
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for pid, score in scored:
+                cache_prediction(pipe, pid, next_match_id, json.dumps(build_prediction(pid, next_match_id, score)))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to warm prediction cache: {e}")
+    # scores changed: replicas drop their in-process copies, and only now that Redis
+    # holds the new ones, so a refill cannot pick up the old value
+    publish_invalidation(keys)
+
+def run_scoring_job(next_match_id: Optional[int] = None, chunk_size: int = SCORING_CHUNK_SIZE,
+                    workers: int = SCORING_WORKERS) -> int:
+    """Score every active player (a match's two squads); returns the number of scores written."""
+    db = SessionLocal()
+    try:
+        ref_date = resolve_reference_date(db, next_match_id)
+        ids = match_squads(db, next_match_id, ref_date) if next_match_id else active_players(db, ref_date)
+        chunks = [(ids[i:i + chunk_size], ref_date) for i in range(0, len(ids), chunk_size)]
+        match_key = next_match_id or NEXT_MATCH_KEY
+
+        if workers <= 1 or len(chunks) <= 1:
+            if _worker_model is _UNSET:
+                _init_worker()
+            results: Iterable[Scored] = map(_score_chunk, chunks)
+            pool = None
+        else:
+            # spawn: the job may be started from inside the threaded API process
+            pool = ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                                       mp_context=multiprocessing.get_context("spawn"))
+            results = pool.map(_score_chunk, chunks)
+
+        total = 0
+        try:
+            for scored in results:
+                _persist(db, match_key, ref_date, scored)
+                _warm_cache(next_match_id, scored)
+                total += len(scored)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        logger.info(f"Scoring job wrote {total} readiness scores (match={next_match_id or 'next'})")
+        return total
+    finally:
+        db.close()
+
+def _read(query, *args):
+    db = SessionLocal()
+    try:
+        return query(db, *args)
+    finally:
+        db.close()
+
+async def scoring_scheduler(interval: int = SCORING_INTERVAL_SECONDS):
+    """Poll the fact tables and rescore the next fixture and upcoming matches; see the module docstring."""
+    loop = asyncio.get_running_loop()
+    last = None
+    last_run = 0.0
+    while True:
+        try:
+            current = (await loop.run_in_executor(None, _read, data_watermark), date.today())
+            if current != last or time.monotonic() - last_run >= SCORE_MAX_AGE_SECONDS / 2:
+                # workload statistics first so the squad series never lags the scores
+                await loop.run_in_executor(None, run_workload_job)
+                await loop.run_in_executor(None, run_scoring_job)
+                for match_id in await loop.run_in_executor(None, _read, upcoming_matches, current[1]):
+                    await loop.run_in_executor(None, run_scoring_job, match_id)
+                last = current
+                last_run = time.monotonic()
+        except Exception:
+            logger.exception("Scoring job failed")
+        await asyncio.sleep(interval)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Recompute readiness scores for all active players")
+    parser.add_argument("--match-id", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=SCORING_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=SCORING_WORKERS)
+    args = parser.parse_args()
+    run_scoring_job(args.match_id, args.chunk_size, args.workers)
@@ -0,0 +1,277 @@
+# analytics-service/app/workload.py
+"""
+Incremental workload monitoring: ACWR, EWMA load, monotony and strain.
+
+Each player has a persisted state (player_workload_state): the last
+CHRONIC_WINDOW_DAYS daily loads as a ring buffer, running sums for the acute
+and chronic windows (plus the acute sum of squares) and the two EWMAs.
+Advancing a player by one day is O(1): the day's load replaces the one leaving
+the chronic window, the load leaving the acute window is subtracted and the
+EWMAs take one step. Days without a session are zero-load days, so every
+player gets a row for every day in fact_player_workload.
+
+A run only reads the days after the states' as_of (minus
+WORKLOAD_LOOKBACK_DAYS, which catches sessions the ETL re-staged). A player
+whose already-processed days changed is rewound to the day before the first
+change, restoring the state from the stored daily rows, and replayed from there.
+
+Run once (e.g. at the end of a load):  python -m app.workload
+The scoring scheduler also runs it whenever new facts land.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, delete, exists, func, or_, select
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .features import ACUTE_WINDOW_DAYS
+from .models import FactPlayerGps, FactPlayerWorkload, PlayerWorkloadState
+
+logger = logging.getLogger("analytics-service")
+
+CHRONIC_WINDOW_DAYS = int(os.getenv("CHRONIC_WINDOW_DAYS", "28"))
+WORKLOAD_LOOKBACK_DAYS = int(os.getenv("WORKLOAD_LOOKBACK_DAYS", "3"))
+EWMA_ACUTE_ALPHA = 2.0 / (ACUTE_WINDOW_DAYS + 1)
+EWMA_CHRONIC_ALPHA = 2.0 / (CHRONIC_WINDOW_DAYS + 1)
+if CHRONIC_WINDOW_DAYS <= ACUTE_WINDOW_DAYS:
+    raise ValueError("CHRONIC_WINDOW_DAYS must be longer than the acute window")
+
+SERIES_METRICS = ["load", "acute_load", "chronic_load", "acwr", "ewma_acute", "ewma_chronic",
+                  "ewma_acwr", "monotony", "strain", "days_since_match"]
+
+Day = Tuple[float, bool]  # (load, is_match)
+
+def _ratio(num: float, den: float) -> Optional[float]:
+    return num / den if den > 1e-9 else None
+
+class WorkloadState:
+    """Rolling statistics for one player as of `as_of`."""
+
+    __slots__ = ("player_id", "as_of", "loads", "acute_sum", "acute_sq_sum", "chronic_sum",
+                 "ewma_acute", "ewma_chronic", "last_match_date")
+
+    def __init__(self, player_id: int, as_of: date):
+        self.player_id = player_id
+        self.as_of = as_of
+        self.loads = [0.0] * CHRONIC_WINDOW_DAYS
+        self.acute_sum = self.acute_sq_sum = self.chronic_sum = 0.0
+        self.ewma_acute = self.ewma_chronic = 0.0
+        self.last_match_date: Optional[date] = None
+
+    def step(self, load: float, is_match: bool) -> dict:
+        """Advance to the next day; returns that day's fact_player_workload row."""
+        day = self.as_of + timedelta(days=1)
+        n = day.toordinal()
+        slot = n % CHRONIC_WINDOW_DAYS
+        leaving = self.loads[(n - ACUTE_WINDOW_DAYS) % CHRONIC_WINDOW_DAYS]
+        self.chronic_sum += load - self.loads[slot]
+        self.acute_sum += load - leaving
+        self.acute_sq_sum += load * load - leaving * leaving
+        self.loads[slot] = load
+        self.ewma_acute += EWMA_ACUTE_ALPHA * (load - self.ewma_acute)
+        self.ewma_chronic += EWMA_CHRONIC_ALPHA * (load - self.ewma_chronic)
+        if is_match:
+            self.last_match_date = day
+        self.as_of = day
+
+        # running sums can drift a hair below zero once the window empties
+        acute = max(self.acute_sum, 0.0)
+        chronic = max(self.chronic_sum, 0.0) * ACUTE_WINDOW_DAYS / CHRONIC_WINDOW_DAYS
+        mean = acute / ACUTE_WINDOW_DAYS
+        sd = math.sqrt(max(self.acute_sq_sum / ACUTE_WINDOW_DAYS - mean * mean, 0.0))
+        monotony = _ratio(mean, sd) if acute > 1e-9 else None
+        return {
+            "player_id": self.player_id, "load_date": day, "load": load, "is_match": is_match,
+            "acute_load": acute, "chronic_load": chronic, "acwr": _ratio(acute, chronic),
+            "ewma_acute": self.ewma_acute, "ewma_chronic": self.ewma_chronic,
+            "ewma_acwr": _ratio(self.ewma_acute, self.ewma_chronic),
+            "monotony": monotony, "strain": acute * monotony if monotony is not None else None,
+            "days_since_match": (day - self.last_match_date).days if self.last_match_date else None,
+        }
+
+    @classmethod
+    def from_row(cls, row: PlayerWorkloadState) -> Optional["WorkloadState"]:
+        """None when the saved ring has another length (CHRONIC_WINDOW_DAYS changed)."""
+        loads = json.loads(row.loads)
+        if len(loads) != CHRONIC_WINDOW_DAYS:
+            return None
+        state = cls(row.player_id, row.as_of)
+        state.loads = loads
+        state.acute_sum, state.acute_sq_sum, state.chronic_sum = row.acute_sum, row.acute_sq_sum, row.chronic_sum
+        state.ewma_acute, state.ewma_chronic = row.ewma_acute, row.ewma_chronic
+        state.last_match_date = row.last_match_date
+        return state
+
+    @classmethod
+    def from_daily(cls, player_id: int, as_of: date, rows: Sequence[FactPlayerWorkload]) -> "WorkloadState":
+        """State as of `as_of` from the stored daily rows of the chronic window ending on it."""
+        state = cls(player_id, as_of)
+        for row in rows:
+            state.loads[row.load_date.toordinal() % CHRONIC_WINDOW_DAYS] = row.load
+        end = as_of.toordinal()
+        acute = [state.loads[(end - k) % CHRONIC_WINDOW_DAYS] for k in range(ACUTE_WINDOW_DAYS)]
+        state.acute_sum = sum(acute)
+        state.acute_sq_sum = sum(v * v for v in acute)
+        state.chronic_sum = sum(state.loads)
+        last = next((row for row in rows if row.load_date == as_of), None)
+        if last is not None:
+            state.ewma_acute, state.ewma_chronic = last.ewma_acute, last.ewma_chronic
+            if last.days_since_match is not None:
+                state.last_match_date = as_of - timedelta(days=last.days_since_match)
+        return state
+
+    def to_row(self) -> dict:
+        return {
+            "player_id": self.player_id, "as_of": self.as_of, "loads": json.dumps(self.loads),
+            "acute_sum": self.acute_sum, "acute_sq_sum": self.acute_sq_sum, "chronic_sum": self.chronic_sum,
+            "ewma_acute": self.ewma_acute, "ewma_chronic": self.ewma_chronic,
+            "last_match_date": self.last_match_date, "updated_at": datetime.utcnow(),
+        }
+
+def _restore(db: Session, player_id: int, as_of: date) -> WorkloadState:
+    rows = db.execute(select(FactPlayerWorkload).where(
+        FactPlayerWorkload.player_id == player_id,
+        FactPlayerWorkload.load_date > as_of - timedelta(days=CHRONIC_WINDOW_DAYS),
+        FactPlayerWorkload.load_date <= as_of,
+    )).scalars().all()
+    return WorkloadState.from_daily(player_id, as_of, rows)
+
+def _daily_loads(db: Session, since: Optional[date], through: date) -> Dict[int, Dict[date, Day]]:
+    """Per player and day after `since` (all days for players without a state): (load, is_match)."""
+    stmt = (
+        select(
+            FactPlayerGps.player_id,
+            FactPlayerGps.session_date,
+            func.coalesce(func.sum(FactPlayerGps.total_player_load), 0.0),
+            func.max(case((FactPlayerGps.session_type == "match", 1), else_=0)),
+        )
+        .where(FactPlayerGps.session_date <= through)
+        .group_by(FactPlayerGps.player_id, FactPlayerGps.session_date)
+    )
+    if since is not None:
+        stateless = ~exists().where(PlayerWorkloadState.player_id == FactPlayerGps.player_id)
+        stmt = stmt.where(or_(FactPlayerGps.session_date > since, stateless))
+    days: Dict[int, Dict[date, Day]] = defaultdict(dict)
+    for player_id, day, load, is_match in db.execute(stmt):
+        days[player_id][day] = (float(load), bool(is_match))
+    return days
+
+def _stored_days(db: Session, since: date) -> Dict[int, Dict[date, Day]]:
+    stmt = select(FactPlayerWorkload.player_id, FactPlayerWorkload.load_date, FactPlayerWorkload.load,
+                  FactPlayerWorkload.is_match).where(FactPlayerWorkload.load_date > since)
+    days: Dict[int, Dict[date, Day]] = defaultdict(dict)
+    for player_id, day, load, is_match in db.execute(stmt):
+        days[player_id][day] = (load, bool(is_match))
+    return days
+
+def _first_change(state: WorkloadState, fresh: Dict[date, Day], stored: Dict[date, Day]) -> Optional[date]:
+    """Earliest already-processed day whose load or match flag differs from the facts."""
+    changed = [
+        day for day in set(fresh) | set(stored)
+        if day <= state.as_of and (
+            abs(fresh.get(day, (0.0, False))[0] - stored.get(day, (0.0, False))[0]) > 1e-6
+            or fresh.get(day, (0.0, False))[1] != stored.get(day, (0.0, False))[1])
+    ]
+    return min(changed) if changed else None
+
+def run_workload_job(through: Optional[date] = None, lookback_days: int = WORKLOAD_LOOKBACK_DAYS) -> int:
+    """Advance every player's workload state to `through` (default: latest GPS day); returns days written."""
+    db = SessionLocal()
+    try:
+        through = through or db.execute(select(func.max(FactPlayerGps.session_date))).scalar()
+        if through is None:
+            return 0
+        states = {}
+        for row in db.execute(select(PlayerWorkloadState)).scalars():
+            # a state saved with another window length is rebuilt from the daily rows
+            states[row.player_id] = WorkloadState.from_row(row) or _restore(db, row.player_id, row.as_of)
+        since = min((s.as_of for s in states.values()), default=None)
+        if since is not None:
+            since -= timedelta(days=lookback_days)
+        fresh = _daily_loads(db, since, through)
+        stored = _stored_days(db, since) if since is not None else {}
+
+        written: List[dict] = []
+        replay_from: Dict[date, List[int]] = defaultdict(list)
+        rewound = 0
+        for player_id in sorted(set(states) | set(fresh)):
+            days = fresh.get(player_id, {})
+            state = states.get(player_id)
+            if state is None:
+                state = WorkloadState(player_id, min(days) - timedelta(days=1))
+            else:
+                changed = _first_change(state, days, stored.get(player_id, {}))
+                if changed is not None:
+                    state = _restore(db, player_id, changed - timedelta(days=1))
+                    rewound += 1
+            if state.as_of >= through:
+                continue
+            replay_from[state.as_of + timedelta(days=1)].append(player_id)
+            while state.as_of < through:
+                written.append(state.step(*days.get(state.as_of + timedelta(days=1), (0.0, False))))
+            states[player_id] = state
+
+        for start, player_ids in replay_from.items():
+            db.execute(delete(FactPlayerWorkload).where(FactPlayerWorkload.player_id.in_(player_ids),
+                                                        FactPlayerWorkload.load_date >= start))
+        advanced = [pid for player_ids in replay_from.values() for pid in player_ids]
+        db.execute(delete(PlayerWorkloadState).where(PlayerWorkloadState.player_id.in_(advanced)))
+        db.bulk_insert_mappings(FactPlayerWorkload, written)
+        db.bulk_insert_mappings(PlayerWorkloadState, [states[pid].to_row() for pid in advanced])
+        db.commit()
+        logger.info(f"Workload job advanced {len(advanced)} players to {through} "
+                    f"({len(written)} player-days, {rewound} rewound)")
+        return len(written)
+    finally:
+        db.close()
+
+def squad_series(db: Session, player_ids: Sequence[int], start: date, end: date,
+                 metrics: Sequence[str] = SERIES_METRICS) -> Dict[str, object]:
+    """
+    Daily series for several players as columnar arrays: `dates`, `player_ids`
+    (request order) and, per metric, one list of values per player aligned with
+    `dates` (null where the player has no row or the statistic is undefined).
+    """
+    ids = pd.Index(list(dict.fromkeys(int(p) for p in player_ids)), name="player_id")
+    dates = pd.date_range(start, end, freq="D")
+    columns = [getattr(FactPlayerWorkload, m) for m in metrics]
+    rows = db.execute(
+        select(FactPlayerWorkload.player_id, FactPlayerWorkload.load_date, *columns)
+        .where(FactPlayerWorkload.player_id.in_(list(ids)),
+               FactPlayerWorkload.load_date >= start,
+               FactPlayerWorkload.load_date <= end)
+    ).all() if len(ids) else []
+
+    values = np.full((len(metrics), len(ids), len(dates)), np.nan)
+    if rows:
+        frame = pd.DataFrame.from_records(rows, columns=["player_id", "load_date", *metrics])
+        row_idx = ids.get_indexer(frame["player_id"])
+        day_idx = (pd.to_datetime(frame["load_date"]).values.astype("datetime64[D]")
+                   - np.datetime64(start, "D")).astype(int)
+        values[:, row_idx, day_idx] = frame[list(metrics)].to_numpy(float).T
+
+    series: Dict[str, object] = {"dates": [d.date().isoformat() for d in dates], "player_ids": ids.tolist()}
+    for k, metric in enumerate(metrics):
+        present = values[k] if metric != "days_since_match" else np.nan_to_num(values[k]).astype(int)
+        series[metric] = np.where(np.isnan(values[k]), None, present).tolist()
+    return series
+
+def latest_workload_date(db: Session) -> Optional[date]:
+    return db.execute(select(func.max(PlayerWorkloadState.as_of))).scalar()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Advance the per-player workload statistics")
+    parser.add_argument("--through", type=date.fromisoformat, default=None)
+    parser.add_argument("--lookback-days", type=int, default=WORKLOAD_LOOKBACK_DAYS)
+    args = parser.parse_args()
+    run_workload_job(args.through, args.lookback_days)
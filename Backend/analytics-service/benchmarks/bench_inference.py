@@ -0,0 +1,90 @@
+# analytics-service/benchmarks/bench_inference.py
+"""
+Compare per-row and batch inference latency of the MLflow and ONNX backends.
+
+    cd Backend/analytics-service
+    python -m benchmarks.bench_inference --rows 2000 --batch-sizes 1 32 256
+
+The MLflow row is skipped when MLFLOW_MODEL_URI cannot be loaded. The ONNX model
+defaults to the frontend's copy, the one the image ships.
+"""
+import argparse
+import os
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from app import ml
+from app.features import FEATURE_COLUMNS, SEQUENCE_COLUMNS
+
+REPO_MODEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "frontend", "public",
+                          "models", "player_prep_model.onnx")
+
+def _random_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    columns = FEATURE_COLUMNS + SEQUENCE_COLUMNS
+    return pd.DataFrame(rng.random((rows, len(columns))) * 10, columns=columns)
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    arr = np.asarray(samples) * 1e3
+    return {"p50_ms": float(np.percentile(arr, 50)), "p99_ms": float(np.percentile(arr, 99))}
+
+def _time_calls(fn: Callable[[], object], repeats: int) -> List[float]:
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+def bench_backend(name: str, model, frame: pd.DataFrame, batch_sizes: List[int]) -> List[Dict[str, object]]:
+    ml.warmup(model)
+    rows = []
+
+    records = frame.to_dict("records")
+    samples = []
+    for record in records:
+        t0 = time.perf_counter()
+        ml.predict(model, record)
+        samples.append(time.perf_counter() - t0)
+    rows.append({"backend": name, "mode": "per-row", "batch": 1,
+                 "rows_per_s": len(records) / sum(samples), **_percentiles(samples)})
+
+    for size in batch_sizes:
+        chunk = frame.iloc[:size]
+        repeats = max(5, len(frame) // size)
+        samples = _time_calls(lambda: ml.predict_batch(model, chunk), repeats)
+        rows.append({"backend": name, "mode": "batch", "batch": size,
+                     "rows_per_s": size * repeats / sum(samples), **_percentiles(samples)})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--threads", type=int, default=ml.ONNX_INTRA_OP_THREADS)
+    parser.add_argument("--onnx-path", default=os.getenv("ONNX_MODEL_PATH", REPO_MODEL))
+    args = parser.parse_args()
+
+    frame = _random_frame(max(args.rows, max(args.batch_sizes)))
+    results = []
+
+    try:
+        t0 = time.perf_counter()
+        mlflow_model = ml._load_mlflow_model()
+        print(f"mlflow load: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+        results += bench_backend("mlflow", mlflow_model, frame, args.batch_sizes)
+    except Exception as e:
+        print(f"mlflow backend skipped: {e}")
+
+    t0 = time.perf_counter()
+    onnx_model = ml.OnnxModel(args.onnx_path, args.threads, max(args.batch_sizes))
+    print(f"onnx load: {(time.perf_counter() - t0) * 1e3:.1f} ms")
+    results += bench_backend("onnx", onnx_model, frame, args.batch_sizes)
+
+    print(pd.DataFrame(results).to_string(index=False, float_format=lambda v: f"{v:,.3f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+# common/__init__.py
+"""
+Code shared by the services and the gateway.
+
+The images are built with Backend/ as the context and copy this package next
+to their own code (see each Dockerfile). Run a service locally with Backend/
+on the path, e.g. from player-service/:
+
+    PYTHONPATH=.. uvicorn app.main:app
+"""
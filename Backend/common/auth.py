@@ -0,0 +1,182 @@
+# common/auth.py
+"""
+Bearer-token verification for every service and the gateway.
+
+With KEYCLOAK_JWKS_URL set, tokens are fully verified: RS256 signature against
+the realm's JWKS, exp, and iss/aud when KEYCLOAK_ISSUER/KEYCLOAK_AUDIENCE are
+set. The JWKS is held in memory and refreshed in the background every
+JWKS_REFRESH_SECONDS. A token signed with an unknown kid (a rotated key)
+triggers an immediate refetch, at most once per JWKS_MIN_REFETCH_SECONDS so
+forged kids cannot hammer Keycloak.
+
+Verified claims are memoized in a bounded LRU keyed by the token's hash until
+the token expires, so a token seen before costs one hash and a dict lookup
+instead of an RSA verify.
+
+Without KEYCLOAK_JWKS_URL, tokens are only decoded (development and load tests).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+logger = logging.getLogger(__name__)
+
+KEYCLOAK_JWKS_URL = os.getenv("KEYCLOAK_JWKS_URL", "")
+KEYCLOAK_ISSUER = os.getenv("KEYCLOAK_ISSUER") or None
+KEYCLOAK_AUDIENCE = os.getenv("KEYCLOAK_AUDIENCE") or None
+JWT_ALGORITHMS = os.getenv("JWT_ALGORITHMS", "RS256").split(",")
+JWT_LEEWAY_SECONDS = int(os.getenv("JWT_LEEWAY_SECONDS", "30"))
+JWKS_REFRESH_SECONDS = float(os.getenv("JWKS_REFRESH_SECONDS", "300"))
+JWKS_MIN_REFETCH_SECONDS = float(os.getenv("JWKS_MIN_REFETCH_SECONDS", "30"))
+JWKS_TIMEOUT = float(os.getenv("JWKS_TIMEOUT", "3"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+security = HTTPBearer()
+
+class JWKSCache:
+    """Signing keys by kid, replaced wholesale on every successful fetch."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.keys: Dict[str, jwt.PyJWK] = {}
+        self._lock = threading.Lock()
+        self._last_fetch = 0.0
+
+    def fetch(self):
+        with urllib.request.urlopen(self.url, timeout=JWKS_TIMEOUT) as response:
+            data = json.load(response)
+        keys = {}
+        for key in jwt.PyJWKSet.from_dict(data).keys:
+            if key.key_id and key.public_key_use in (None, "sig"):
+                keys[key.key_id] = key
+        if set(self.keys) - set(keys):
+            # a key was retired: tokens it signed must be verified again
+            token_cache.clear()
+        self.keys = keys
+        self._last_fetch = time.monotonic()
+        logger.info(f"Loaded {len(keys)} signing keys from JWKS")
+
+    def refetch_if_due(self) -> bool:
+        """Refetch now unless another thread just did; False if the rate limit skipped it."""
+        with self._lock:
+            if time.monotonic() - self._last_fetch < JWKS_MIN_REFETCH_SECONDS:
+                return False
+            self._last_fetch = time.monotonic()
+            try:
+                self.fetch()
+            except Exception as e:
+                logger.warning(f"JWKS fetch failed: {e}")
+                return False
+            return True
+
+    def get(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        key = self.keys.get(kid)
+        if key is None and kid is not None and self.refetch_if_due():
+            key = self.keys.get(kid)
+        return key
+
+class TokenCache:
+    """Thread-safe LRU of verified claims, dropped once the token expires."""
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, expires: float, claims: dict):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (expires, claims)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+jwks = JWKSCache(KEYCLOAK_JWKS_URL) if KEYCLOAK_JWKS_URL else None
+token_cache = TokenCache()
+_refresher: Optional[asyncio.Task] = None
+
+def _verify_signed(token: str) -> dict:
+    header = jwt.get_unverified_header(token)
+    key = jwks.get(header.get("kid"))
+    if key is None:
+        raise jwt.InvalidTokenError("unknown signing key")
+    return jwt.decode(token, key.key, algorithms=JWT_ALGORITHMS, audience=KEYCLOAK_AUDIENCE,
+                      issuer=KEYCLOAK_ISSUER, leeway=JWT_LEEWAY_SECONDS,
+                      options={"require": ["exp"], "verify_aud": KEYCLOAK_AUDIENCE is not None})
+
+def verify(token: str) -> dict:
+    """Claims of a valid token; HTTPException(401) otherwise."""
+    if jwks is None:
+        try:
+            # development mode: decode only
+            return jwt.decode(token, options={"verify_signature": False, "verify_exp": False})
+        except jwt.PyJWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+    try:
+        claims = _verify_signed(token)
+    except jwt.PyJWTError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
+    token_cache.set(key, float(claims["exp"]) + JWT_LEEWAY_SECONDS, claims)
+    return claims
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    return verify(credentials.credentials)
+
+async def _refresh_loop():
+    while True:
+        try:
+            await asyncio.to_thread(jwks.fetch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"JWKS refresh failed, keeping {len(jwks.keys)} cached keys: {e}")
+        await asyncio.sleep(JWKS_REFRESH_SECONDS)
+
+def start_jwks_refresh():
+    """Load the JWKS now and keep it fresh; a no-op without KEYCLOAK_JWKS_URL."""
+    global _refresher
+    if jwks is None:
+        logger.warning("KEYCLOAK_JWKS_URL is not set: bearer tokens are decoded without verification")
+    elif _refresher is None:
+        _refresher = asyncio.get_running_loop().create_task(_refresh_loop())
+
+async def stop_jwks_refresh():
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        try:
+            await _refresher
+        except asyncio.CancelledError:
+            pass
+        _refresher = None
@@ -0,0 +1,31 @@
+# common/batch.py
+"""
+Bulk ?ids= lookups for the player, match and team services: the request
+parameter and the id filter. The cached reads themselves are
+common.cache.cached_many.
+"""
+import os
+from typing import List
+
+from fastapi import HTTPException, Query
+from sqlalchemy import any_, literal
+from sqlalchemy.dialects.postgresql import ARRAY
+
+# the gateway's DataLoaders batch up to the same size
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", "500"))
+
+def batch_ids(ids: str = Query(..., description="Comma-separated ids, e.g. 12,7,31")) -> List[int]:
+    try:
+        parsed = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not parsed or len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"Pass between 1 and {MAX_BATCH_IDS} ids")
+    return parsed
+
+def id_in(column, ids: List[int], dialect: str):
+    # Postgres: "= ANY(:ids)" binds one array parameter, so every batch size shares
+    # a single prepared statement instead of one IN (...) statement per length
+    if dialect == "postgresql":
+        return column == any_(literal(list(ids), ARRAY(column.type)))
+    return column.in_(ids)
@@ -0,0 +1,365 @@
+# common/cache.py
+"""
+Read-through Redis cache for dimension lookups.
+
+Entries hold the serialized response body, so a hit skips both the query and
+the ORM -> Pydantic conversion. Concurrent misses on one key are coalesced: callers
+in this process await a single load, and across replicas a short Redis lock lets
+one loader run while the others wait for its result.
+
+A bounded in-process LRU sits in front of Redis. Writers publish changed keys on
+INVALIDATION_CHANNEL and every replica evicts them, so the local tier is only
+used while this replica is subscribed.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+LOCK_TTL_MS = int(os.getenv("CACHE_LOCK_TTL_MS", "3000"))
+LOCK_POLL_SECONDS = 0.02
+NEGATIVE_TTL = int(os.getenv("CACHE_NEGATIVE_TTL", "30"))  # "not found" answers
+RETRY_AFTER_SECONDS = float(os.getenv("CACHE_RETRY_AFTER_SECONDS", "5"))  # back-off after a Redis error
+LOCAL_CACHE_SIZE = int(os.getenv("LOCAL_CACHE_SIZE", "10000"))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "60"))
+# Writers publish changed keys here (a trailing "*" means prefix); every replica evicts them
+INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache-invalidate")
+
+# Per-entity TTLs in seconds
+TTLS = {
+    "player": int(os.getenv("CACHE_TTL_PLAYER", "3600")),
+    "match": int(os.getenv("CACHE_TTL_MATCH", "600")),
+    "match_stats": int(os.getenv("CACHE_TTL_MATCH_STATS", "600")),
+    "team": int(os.getenv("CACHE_TTL_TEAM", "3600")),
+}
+
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end
+return 0
+"""
+
+_MISSING = object()
+
+class LocalCache:
+    """Size- and TTL-bounded LRU of decoded values; enabled only while subscribed."""
+
+    def __init__(self, maxsize: int = LOCAL_CACHE_SIZE, ttl: float = LOCAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = False
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        if entry[0] < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: Any):
+        if not self.enabled or self.maxsize <= 0:
+            return
+        # a cached "not found" must not outlive its Redis entry
+        ttl = self.ttl if value is not None else min(self.ttl, NEGATIVE_TTL)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[str]):
+        for key in keys:
+            if key.endswith("*"):
+                prefix = key[:-1]
+                for k in [k for k in self._data if k.startswith(prefix)]:
+                    del self._data[k]
+            else:
+                self._data.pop(key, None)
+
+    def disable(self):
+        # invalidations may be missed from here on: forget everything
+        self.enabled = False
+        self._data.clear()
+
+_client: Optional[aioredis.Redis] = None
+_down_until = 0.0
+_inflight: Dict[str, asyncio.Future] = {}
+_listener: Optional[asyncio.Task] = None
+local_cache = LocalCache()
+stats: Dict[str, Dict[str, int]] = defaultdict(
+    lambda: {"local_hits": 0, "hits": 0, "misses": 0, "coalesced": 0, "errors": 0})
+
+def get_client() -> Optional[aioredis.Redis]:
+    global _client
+    if time.monotonic() < _down_until:
+        return None
+    if _client is None and CACHE_ENABLED:
+        _client = aioredis.from_url(REDIS_URL, decode_responses=True,
+                                    socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+async def _listen():
+    while True:
+        client = aioredis.from_url(REDIS_URL, decode_responses=True)
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        local_cache.enabled = True
+                    elif message["type"] == "message":
+                        try:
+                            local_cache.invalidate(json.loads(message["data"]))
+                        except (TypeError, ValueError) as e:
+                            logger.warning(f"Ignoring malformed invalidation message: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Invalidation listener error, local cache disabled: {e}")
+            local_cache.disable()
+            await asyncio.sleep(RETRY_AFTER_SECONDS)
+        finally:
+            await client.close()
+
+def start_invalidation_listener():
+    global _listener
+    if CACHE_ENABLED and _listener is None:
+        _listener = asyncio.get_running_loop().create_task(_listen())
+
+async def close():
+    global _client, _listener
+    if _listener is not None:
+        _listener.cancel()
+        try:
+            await _listener
+        except asyncio.CancelledError:
+            pass
+        _listener = None
+    local_cache.disable()
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+def _mark_down(entity: str, action: str, key: str, error: Exception):
+    # skip Redis for a few seconds instead of paying a timeout on every request
+    global _down_until
+    _down_until = time.monotonic() + RETRY_AFTER_SECONDS
+    stats[entity]["errors"] += 1
+    logger.warning(f"Cache {action} failed for {key}: {error}")
+
+def cache_key(entity: str, ident: Any) -> str:
+    return f"cache:{entity}:{ident}"
+
+def row(schema) -> Callable[[Any], Any]:
+    """Serializer for a single ORM object (None stays None)."""
+    return lambda obj: schema.from_orm(obj).dict() if obj is not None else None
+
+def rows(schema) -> Callable[[Any], Any]:
+    """Serializer for a list of ORM objects."""
+    return lambda objs: [schema.from_orm(obj).dict() for obj in objs]
+
+async def _wait_for_value(client: aioredis.Redis, key: str):
+    deadline = asyncio.get_running_loop().time() + LOCK_TTL_MS / 1000.0
+    while asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+        cached = await client.get(key)
+        if cached is not None:
+            return True, json.loads(cached)
+    return False, None
+
+async def _load(client: aioredis.Redis, entity: str, key: str, loader: Callable[[], Awaitable[Any]]):
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    acquired = await client.set(lock_key, token, nx=True, px=LOCK_TTL_MS)
+    if not acquired:
+        # another replica is loading this key: use its result if it lands in time
+        found, value = await _wait_for_value(client, key)
+        if found:
+            return value
+    try:
+        value = await loader()
+        ttl = TTLS[entity] if value is not None else NEGATIVE_TTL
+        try:
+            await client.set(key, json.dumps(value, default=str), ex=ttl)
+        except RedisError as e:
+            _mark_down(entity, "write", key, e)
+        return value
+    finally:
+        if acquired:
+            try:
+                await client.eval(_RELEASE_LOCK, 1, lock_key, token)
+            except RedisError:
+                pass  # the lock expires on its own
+
+async def read_through(entity: str, key: str, loader: Callable[[], Awaitable[Any]]):
+    counters = stats[entity]
+    local = local_cache.get(key, _MISSING)
+    if local is not _MISSING:
+        counters["local_hits"] += 1
+        return local
+    client = get_client()
+    if client is None:
+        return await loader()
+    try:
+        cached = await client.get(key)
+    except RedisError as e:
+        _mark_down(entity, "read", key, e)
+        return await loader()
+    if cached is not None:
+        counters["hits"] += 1
+        value = json.loads(cached)
+        local_cache.set(key, value)
+        return value
+
+    counters["misses"] += 1
+    pending = _inflight.get(key)
+    if pending is not None:
+        counters["coalesced"] += 1
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[key] = future
+    try:
+        try:
+            value = await _load(client, entity, key, loader)
+        except RedisError as e:
+            _mark_down(entity, "lock", key, e)
+            value = await loader()
+        local_cache.set(key, value)
+        future.set_result(value)
+        return value
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+def cached(entity: str, key: Callable[..., Any], serialize: Callable[[Any], Any]):
+    """
+    Cache an async CRUD function that takes the session first.
+    key(*args, **kwargs) builds the id part of the cache key from the remaining arguments;
+    the cached (and returned) value is serialize(result).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(db, *args, **kwargs):
+            async def loader():
+                return serialize(await fn(db, *args, **kwargs))
+            return await read_through(entity, cache_key(entity, key(*args, **kwargs)), loader)
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
+
+async def read_many(entity: str, idents: Iterable[Any], loader: Callable[[List[Any]], Awaitable[Dict[Any, Any]]]
+                    ) -> Dict[Any, Any]:
+    """
+    Batched read_through: the local tier, then one MGET, then a single loader(missing)
+    call whose results are written back in one pipeline. Idents the loader does not
+    return are cached as None like single-key misses. There is no per-key lock: a batch
+    miss already costs one query however many keys it covers.
+    """
+    counters = stats[entity]
+    keys = {ident: cache_key(entity, ident) for ident in idents}
+    found: Dict[Any, Any] = {}
+    pending = []
+    for ident, key in keys.items():
+        local = local_cache.get(key, _MISSING)
+        if local is _MISSING:
+            pending.append(ident)
+        else:
+            counters["local_hits"] += 1
+            found[ident] = local
+    if not pending:
+        return found
+
+    client = get_client()
+    cached = [None] * len(pending)
+    if client is not None:
+        try:
+            cached = await client.mget([keys[ident] for ident in pending])
+        except RedisError as e:
+            _mark_down(entity, "read", f"{len(pending)} {entity} keys", e)
+            client = None
+    missing = []
+    for ident, value in zip(pending, cached):
+        if value is None:
+            missing.append(ident)
+        else:
+            counters["hits"] += 1
+            found[ident] = json.loads(value)
+            local_cache.set(keys[ident], found[ident])
+    if not missing:
+        return found
+
+    counters["misses"] += len(missing)
+    loaded = await loader(missing)
+    for ident in missing:
+        found[ident] = loaded.get(ident)
+        local_cache.set(keys[ident], found[ident])
+    if client is not None:
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for ident in missing:
+                    value = found[ident]
+                    pipe.set(keys[ident], json.dumps(value, default=str),
+                             ex=TTLS[entity] if value is not None else NEGATIVE_TTL)
+                await pipe.execute()
+        except RedisError as e:
+            _mark_down(entity, "write", f"{len(missing)} {entity} keys", e)
+    return found
+
+def cached_many(entity: str, serialize: Callable[[Any], Any]):
+    """
+    Cache a bulk CRUD function fn(db, ids) -> {id: ORM object} against the same entries
+    as the single-id reads of `entity`. The wrapper returns serialize(obj) (None for a
+    miss) for every requested id, in request order.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(db, ids):
+            async def loader(missing):
+                return {ident: serialize(obj) for ident, obj in (await fn(db, missing)).items()}
+            found = await read_many(entity, ids, loader)
+            return [found[ident] for ident in ids]
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
+
+async def invalidate(entity: str, ident: Any):
+    """Delete the Redis entry and evict it from every replica's local tier."""
+    key = cache_key(entity, ident)
+    local_cache.invalidate([key])
+    client = get_client()
+    if client is None:
+        return
+    try:
+        await client.delete(key)
+        await client.publish(INVALIDATION_CHANNEL, json.dumps([key]))
+    except RedisError as e:
+        _mark_down(entity, "invalidation", key, e)
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    out = {}
+    for entity, counters in stats.items():
+        lookups = counters["local_hits"] + counters["hits"] + counters["misses"]
+        hits = counters["local_hits"] + counters["hits"]
+        out[entity] = {**counters, "hit_ratio": hits / lookups if lookups else 0.0}
+    out["_local"] = {"enabled": local_cache.enabled, "size": len(local_cache._data)}
+    return out
@@ -0,0 +1,57 @@
+# common/db.py
+"""Database URL helpers and pool settings for the services' engines."""
+import os
+from typing import Dict, Optional
+
+from sqlalchemy.engine import make_url
+
+from .metrics import TimedAsyncQueuePool, TimedQueuePool
+
+# sync DBAPI driver -> the async driver for the same database
+ASYNC_DRIVERS = {"psycopg2": "asyncpg", "pysqlite": "aiosqlite"}
+
+# Pool tuning (per worker process): keep workers * (size + overflow) below max_connections
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# pre-ping costs a round trip per checkout; recycling already retires stale connections
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0") == "1"
+
+def async_database_url(url: str) -> str:
+    """The async-driver URL for a sync one; ValueError when there is no known counterpart."""
+    parsed = make_url(url)
+    driver = parsed.get_driver_name()
+    if driver in ASYNC_DRIVERS.values():
+        return url
+    if driver not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {parsed.drivername!r}: set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{ASYNC_DRIVERS[driver]}").render_as_string(
+        hide_password=False)
+
+def engine_options(url: str, is_async: bool = False, statement_timeout_ms: int = 5000,
+                   settings: Optional[Dict[str, str]] = None) -> dict:
+    """
+    create_engine / create_async_engine keyword arguments: the pool settings
+    above, a pool class timing checkouts for common.metrics and, on
+    PostgreSQL, per-connection settings. DB_STATEMENT_TIMEOUT_MS
+    overrides the service's statement_timeout_ms (0 disables the timeout).
+    """
+    if url.startswith("sqlite"):
+        # FastAPI opens and closes a sync dependency's session on different threadpool workers
+        return {} if is_async else {"connect_args": {"check_same_thread": False}}
+    options = dict(poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+                   pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT,
+                   pool_recycle=POOL_RECYCLE, pool_pre_ping=POOL_PRE_PING)
+    if not url.startswith("postgresql"):
+        return options
+    settings = dict(settings or {})
+    timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", str(statement_timeout_ms)))
+    if timeout:
+        settings["statement_timeout"] = str(timeout)
+    if settings:
+        if is_async:
+            options["connect_args"] = {"server_settings": settings}
+        else:
+            options["connect_args"] = {"options": " ".join(f"-c {k}={v}" for k, v in settings.items())}
+    return options
@@ -0,0 +1,228 @@
+# common/metrics.py
+"""
+Prometheus instrumentation for every service and the gateway.
+
+instrument_app(app) adds:
+- a latency histogram per (method, route template, status);
+- an in-flight gauge;
+- GET /metrics.
+instrument_engine(engine) adds:
+- SQL statement timing by statement type;
+- pool wait time: how long each checkout took to get a connection, queueing
+  for a free one or opening a new one included. Only engines built with
+  common.db.engine_options use the timed pools below; SQLite is not timed;
+- pool pressure from the pool's checkout/checkin and connect/close events:
+  checked-out and open connections, and connections opened.
+
+Under a multi-worker server, set PROMETHEUS_MULTIPROC_DIR so /metrics
+aggregates every worker.
+
+Sampling profiler: with PROFILE_SAMPLE_RATE > 0 and pyinstrument installed,
+that fraction of requests is profiled. Requests slower than PROFILE_MIN_SECONDS
+get an HTML flame report written to PROFILE_DIR. Only the event loop thread is
+sampled; time in sync endpoints shows up as the threadpool await.
+"""
+import logging
+import os
+import random
+import re
+import time
+from typing import Any, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.responses import Response
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MIN_SECONDS = float(os.getenv("PROFILE_MIN_SECONDS", "0.25"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Request latency by route template",
+                            ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being served", multiprocess_mode="livesum")
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "SQL statement execution time",
+                             ["engine", "statement"], buckets=LATENCY_BUCKETS)
+DB_POOL_WAIT = Histogram("db_pool_wait_seconds", "Time to get a connection from the pool",
+                         ["engine"], buckets=LATENCY_BUCKETS)
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently checked out of the pool",
+                            ["engine"], multiprocess_mode="livesum")
+DB_POOL_OPEN = Gauge("db_pool_connections_open", "Database connections the pool holds open",
+                     ["engine"], multiprocess_mode="livesum")
+DB_POOL_CONNECTS = Counter("db_pool_connections_opened_total", "New database connections opened by the pool",
+                           ["engine"])
+DB_ERRORS = Counter("db_errors_total", "SQL statements that raised", ["engine"])
+
+UNMATCHED_ROUTE = "<unmatched>"
+_STATEMENT = re.compile(r"\s*(\w+)")
+
+def _route_template(scope: Dict[str, Any], routes: Dict[Any, str]) -> str:
+    # the router leaves the matched endpoint in the scope; label by its path template, not the raw URL
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return UNMATCHED_ROUTE
+    path = routes.get(endpoint)
+    if path is None:
+        app = scope.get("app")
+        routes.update({getattr(r, "endpoint", None): getattr(r, "path", UNMATCHED_ROUTE)
+                       for r in getattr(app, "routes", [])})
+        path = routes.get(endpoint, UNMATCHED_ROUTE)
+    return path
+
+class _Profiler:
+    """Wraps one sampled request in a pyinstrument profile."""
+
+    available: Optional[bool] = None
+
+    @classmethod
+    def maybe_start(cls) -> Optional[Any]:
+        if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+            return None
+        if cls.available is None:
+            try:
+                import pyinstrument  # noqa: F401
+                cls.available = True
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+            except ImportError:
+                logger.warning("PROFILE_SAMPLE_RATE is set but pyinstrument is not installed")
+                cls.available = False
+        if not cls.available:
+            return None
+        from pyinstrument import Profiler
+        profiler = Profiler(async_mode="enabled")
+        profiler.start()
+        return profiler
+
+    @staticmethod
+    def finish(profiler, route: str, elapsed: float):
+        profiler.stop()
+        if elapsed < PROFILE_MIN_SECONDS:
+            return
+        name = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        path = os.path.join(PROFILE_DIR,
+                            f"{time.strftime('%Y%m%dT%H%M%S')}-{int(elapsed * 1000)}ms-{name}-{os.urandom(3).hex()}.html")
+        try:
+            with open(path, "w") as f:
+                f.write(profiler.output_html())
+        except OSError as e:
+            logger.warning(f"Could not write profile {path}: {e}")
+
+class MetricsMiddleware:
+    """Plain ASGI middleware: no per-request task or body buffering, so streaming responses are unaffected."""
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Any, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        profiler = _Profiler.maybe_start()
+        REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_PROGRESS.dec()
+            route = _route_template(scope, self._routes)
+            REQUEST_LATENCY.labels(scope["method"], route, str(status[0])).observe(elapsed)
+            if profiler is not None:
+                _Profiler.finish(profiler, route, elapsed)
+
+def metrics_response() -> Response:
+    registry = REGISTRY
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+def instrument_app(app):
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route("/metrics", metrics_response, methods=["GET"], include_in_schema=False)
+
+class _TimedPool:
+    """Pool mixin observing how long connect() took in db_pool_wait_seconds."""
+
+    engine_name = "default"
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_WAIT.labels(self.engine_name).observe(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose() swaps in a recreated pool: keep its label
+        pool = super().recreate()
+        pool.engine_name = self.engine_name
+        return pool
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+def instrument_engine(engine, name: str = "default"):
+    """Attach timing listeners to a (sync or async) SQLAlchemy engine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if isinstance(sync_engine.pool, _TimedPool):
+        sync_engine.pool.engine_name = name
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+    open_connections = DB_POOL_OPEN.labels(name)
+    connects = DB_POOL_CONNECTS.labels(name)
+    errors = DB_ERRORS.labels(name)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        match = _STATEMENT.match(statement)
+        DB_QUERY_LATENCY.labels(name, match.group(1).upper() if match else "OTHER").observe(elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        errors.inc()
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    @event.listens_for(sync_engine, "connect")
+    def _connect(dbapi_connection, record):
+        connects.inc()
+        open_connections.inc()
+
+    @event.listens_for(sync_engine, "close")
+    def _close(dbapi_connection, record):
+        open_connections.dec()
+
+    @event.listens_for(sync_engine, "close_detached")
+    def _close_detached(dbapi_connection):
+        open_connections.dec()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _checkout(dbapi_connection, record, proxy):
+        checked_out.inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def _checkin(dbapi_connection, record):
+        checked_out.dec()
@@ -0,0 +1,55 @@
+# common/pagination.py
+"""
+Keyset pagination cursors and streaming export helpers for the player and
+match services' history, list and export endpoints.
+
+A cursor is the sort key of the last row of a page, encoded as url-safe base64
+JSON, so the next page is an index range scan instead of an OFFSET. The next cursor
+travels in the X-Next-Cursor response header and list bodies stay unchanged.
+"""
+import base64
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def encode_cursor(values: Dict[str, Any]) -> str:
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def set_next_cursor(response: Response, rows: Sequence[Any], limit: int, key: Dict[str, str]):
+    """If the page is full, expose the sort key of its last row as the next cursor."""
+    if len(rows) == limit and rows:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({k: getattr(last, attr) for k, attr in key.items()})
+
+async def stream_rows(rows: AsyncIterator[List[Dict[str, Any]]], columns: List[str], fmt: str) -> AsyncIterator[str]:
+    """Render partitions of row mappings as NDJSON or CSV, one chunk per partition."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(columns)
+        yield buf.getvalue()
+        async for partition in rows:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows([[row[c] for c in columns] for row in partition])
+            yield buf.getvalue()
+    else:
+        async for partition in rows:
+            yield "".join(json.dumps({c: row[c] for c in columns}, default=str) + "\n" for row in partition)
@@ -0,0 +1,33 @@
+# common/search.py
+"""
+Fuzzy name search for the player and team services.
+
+On PostgreSQL, names match with pg_trgm's "%>" operator across every name
+variant (served by the GIN trigram indexes) and rank by word similarity; the
+threshold is a per-connection setting, so engines serving a search pass
+SEARCH_SETTINGS to common.db.engine_options. Elsewhere it falls back to ILIKE.
+"""
+import os
+
+from sqlalchemy import func, or_
+
+# pg_trgm threshold for the "%>" fuzzy name match (server default 0.6 is strict for typos)
+SEARCH_SIMILARITY_THRESHOLD = os.getenv("SEARCH_SIMILARITY_THRESHOLD", "0.4")
+SEARCH_SETTINGS = {"pg_trgm.word_similarity_threshold": SEARCH_SIMILARITY_THRESHOLD}
+
+def escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def name_search(query, columns, q: str, order_column, dialect: str):
+    """`query` filtered to rows whose name `columns` match q, best match first."""
+    q = q.strip()
+    if dialect != "postgresql":
+        pattern = f"%{escape_like(q)}%"
+        return query.where(or_(*[col.ilike(pattern, escape="\\") for col in columns])).order_by(order_column)
+    if len(q) < 3:
+        # too short for trigrams: prefix match, still index-assisted by gin_trgm_ops
+        pattern = f"{escape_like(q)}%"
+        return query.where(or_(*[col.ilike(pattern, escape="\\") for col in columns])).order_by(order_column)
+    score = func.greatest(*[func.word_similarity(q, col) for col in columns])
+    return (query.where(or_(*[col.op("%>")(q) for col in columns]))
+            .order_by(score.desc(), order_column))
@@ -0,0 +1,289 @@
+# etl/app/changes.py
+"""
+Change feed: cache invalidation and live push driven by committed data.
+
+Writers (the loader here, create_player in the player service) insert a
+change_feed row in the same transaction as the data it describes, so a change
+is published if and only if it committed. Topics and payloads:
+
+    gps     {"player_ids", "team_ids", "from", "to"}   GPS sessions upserted
+    match   {"match_ids", "player_ids"}                match results / Wyscout rows
+    rollup  {"from", "team_ids"}                       workload rollups refreshed
+    player  {"player_ids"}                             players created or merged
+    team    {"team_ids"}                               teams merged
+
+The dispatcher relays rows in id order. For each one it:
+  1. deletes exactly the Redis entries the change makes stale (the services'
+     "cache:<entity>:<id>" entries and the analytics predictions of the
+     affected players, found through the "pred:player:<id>:keys" set analytics
+     keeps of each player's cached prediction keys),
+  2. publishes the same keys on the services' invalidation channel, so every
+     replica's in-process tier drops them too,
+  3. appends the change to the CHANGE_STREAM Redis stream with the row id as
+     entry id. The gateway relays that stream to dashboards as server-sent
+     events, and a reconnecting client resumes from its last id.
+
+It resumes after the stream's newest entry, so nothing is relayed twice
+across restarts. On PostgreSQL a trigger NOTIFYs on every insert and the
+dispatcher wakes at once; elsewhere it polls every CHANGE_POLL_SECONDS.
+
+Serial ids can commit out of order: a missing id holds the rows after it back
+for CHANGE_GAP_SECONDS from when the dispatcher first saw the gap. After that
+the rows behind it move on, but the id stays watched for CHANGE_LATE_SECONDS
+(the longest a writer's transaction is expected to stay open). If its row
+commits in that time it is relayed late, as stream entry "<cursor>-<n>", so
+it sorts after everything already relayed. Ids still missing after that are
+taken to be rolled-back inserts. On resume, the gaps among the stream's most
+recent entries are watched again.
+
+    python -m app.changes
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import redis
+from redis.exceptions import ResponseError
+from select import select as wait_readable
+from sqlalchemy import func, select
+
+from .schema import change_feed
+
+logger = logging.getLogger("etl")
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+# Same channel the services' local cache tiers listen on (see their cache.py)
+INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache-invalidate")
+CHANGE_STREAM = os.getenv("CHANGE_STREAM", "changes")
+CHANGE_STREAM_MAXLEN = int(os.getenv("CHANGE_STREAM_MAXLEN", "10000"))
+CHANGE_POLL_SECONDS = float(os.getenv("CHANGE_POLL_SECONDS", "1"))
+CHANGE_GAP_SECONDS = float(os.getenv("CHANGE_GAP_SECONDS", "10"))
+CHANGE_LATE_SECONDS = float(os.getenv("CHANGE_LATE_SECONDS", "3600"))
+CHANGE_BATCH_SIZE = int(os.getenv("CHANGE_BATCH_SIZE", "500"))
+CHANGE_FEED_RETENTION_DAYS = int(os.getenv("CHANGE_FEED_RETENTION_DAYS", "7"))
+PURGE_INTERVAL_SECONDS = 3600
+# more players than this in one batch evict every prediction instead of one prefix each
+MAX_PLAYER_PREFIXES = 1000
+
+NOTIFY_CHANNEL = "change_feed"
+_NOTIFY_TRIGGER = f"""
+CREATE OR REPLACE FUNCTION change_feed_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', NEW.id::text);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS change_feed_notify ON change_feed;
+CREATE TRIGGER change_feed_notify AFTER INSERT ON change_feed FOR EACH ROW EXECUTE PROCEDURE change_feed_notify();
+"""
+
+def prediction_index_key(player_id: int) -> str:
+    # analytics-service/app/cache.py keeps the player's cached prediction keys in this set
+    return f"pred:player:{player_id}:keys"
+
+def record(conn, topic: str, **payload):
+    """Queue a change in the caller's transaction."""
+    conn.execute(change_feed.insert().values(topic=topic, payload=json.dumps(payload, default=str),
+                                             created_at=datetime.utcnow()))
+
+def invalidation_keys(topic: str, payload: dict) -> Tuple[List[str], Set[int]]:
+    """Exact cache keys a change makes stale, and the players whose predictions it does."""
+    if topic == "player":
+        return [f"cache:player:{pid}" for pid in payload.get("player_ids", [])], set()
+    if topic == "team":
+        return [f"cache:team:{tid}" for tid in payload.get("team_ids", [])], set()
+    if topic == "match":
+        keys = [f"cache:{entity}:{mid}" for mid in payload.get("match_ids", []) for entity in ("match", "match_stats")]
+        return keys, set(payload.get("player_ids", []))
+    if topic == "gps":
+        return [], set(payload.get("player_ids", []))
+    # rollup: nothing to evict. The /workload endpoints of player- and team-service read
+    # the rollup tables directly and are deliberately not cached; the gateway empties
+    # its response cache on every event, this one included.
+    return [], set()
+
+class Dispatcher:
+    """Relays change_feed rows to Redis in id order; see the module docstring."""
+
+    def __init__(self, engine, client: redis.Redis):
+        self.engine = engine
+        self.redis = client
+        self.cursor = 0
+        # ids not relayed yet -> monotonic time the gap was first seen; those <= cursor are watched late
+        self.missing: Dict[int, float] = {}
+        self._late_seq = 0
+        self._last_purge = 0.0
+
+    def resume(self):
+        recent = self.redis.xrevrange(CHANGE_STREAM, count=CHANGE_BATCH_SIZE)
+        if recent:
+            self.cursor, self._late_seq = (int(part) for part in recent[0][0].split("-"))
+            # the previous run may have skipped ids whose rows have not committed yet
+            relayed = {int(fields.get("id") or entry_id.split("-")[0]) for entry_id, fields in recent}
+            now = time.monotonic()
+            self.missing = {i: now for i in range(min(relayed), self.cursor) if i not in relayed}
+        else:
+            # empty stream (a fresh Redis): no cached entry predates it, so nothing is stale
+            with self.engine.connect() as conn:
+                self.cursor = conn.execute(select(func.max(change_feed.c.id))).scalar() or 0
+        logger.info("Change dispatcher resuming after row %d (%d ids watched)", self.cursor, len(self.missing))
+
+    def pending(self) -> List[tuple]:
+        """Rows after the cursor, stopping at an id gap that may still be filled by a commit."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(change_feed).where(change_feed.c.id > self.cursor)
+                                .order_by(change_feed.c.id).limit(CHANGE_BATCH_SIZE)).all()
+        ready = []
+        expected = self.cursor + 1
+        now = time.monotonic()
+        for row in rows:
+            gap = range(expected, row.id)
+            for missing in gap:
+                self.missing.setdefault(missing, now)
+            if any(now - self.missing[missing] < CHANGE_GAP_SECONDS for missing in gap):
+                break
+            self.missing.pop(row.id, None)
+            ready.append(row)
+            expected = row.id + 1
+        return ready
+
+    def late(self) -> List[tuple]:
+        """Rows that committed after the cursor had moved past their id."""
+        now = time.monotonic()
+        for missing, seen in list(self.missing.items()):
+            if now - seen > CHANGE_LATE_SECONDS:
+                # rolled back (or never going to commit in time to matter)
+                del self.missing[missing]
+        behind = sorted(missing for missing in self.missing if missing <= self.cursor)
+        rows = []
+        with self.engine.connect() as conn:
+            for start in range(0, len(behind), 1000):
+                rows += conn.execute(select(change_feed).where(change_feed.c.id.in_(behind[start:start + 1000]))
+                                     .order_by(change_feed.c.id)).all()
+        if rows:
+            logger.warning("Relaying %d changes that committed after later ones: %s", len(rows), [r.id for r in rows])
+        return rows
+
+    def _delete_predictions(self, players: Set[int]):
+        indexes = [prediction_index_key(pid) for pid in sorted(players)]
+        for start in range(0, len(indexes), 1000):
+            chunk = indexes[start:start + 1000]
+            pipe = self.redis.pipeline(transaction=False)
+            for index in chunk:
+                pipe.smembers(index)
+            doomed = chunk + sorted({key for members in pipe.execute() for key in members})
+            for i in range(0, len(doomed), 1000):
+                self.redis.delete(*doomed[i:i + 1000])
+
+    def dispatch(self, rows: Iterable[tuple], late: bool = False) -> int:
+        rows = list(rows)
+        if not rows:
+            return 0
+        keys: List[str] = []
+        players: Set[int] = set()
+        for row in rows:
+            row_keys, row_players = invalidation_keys(row.topic, json.loads(row.payload))
+            keys += row_keys
+            players |= row_players
+        # invalidate before announcing: a client refetching on the push must not read a stale entry
+        if keys:
+            self.redis.delete(*keys)
+        if players:
+            self._delete_predictions(players)
+        evicted = keys + ([f"pred:player:{pid}:*" for pid in sorted(players)]
+                          if len(players) <= MAX_PLAYER_PREFIXES else ["pred:player:*"])
+        if evicted:
+            self.redis.publish(INVALIDATION_CHANNEL, json.dumps(evicted))
+        for row in rows:
+            # a late row goes after the newest entry: stream ids only grow
+            entry_id = f"{self.cursor}-{self._late_seq + 1}" if late else f"{row.id}-0"
+            try:
+                self.redis.xadd(CHANGE_STREAM, {"id": row.id, "topic": row.topic, "payload": row.payload,
+                                                "created_at": row.created_at.isoformat()},
+                                id=entry_id, maxlen=CHANGE_STREAM_MAXLEN, approximate=True)
+            except ResponseError as e:
+                # already in the stream (another dispatcher got there first)
+                logger.warning("Change %d not appended: %s", row.id, e)
+            if late:
+                self._late_seq += 1
+                self.missing.pop(row.id, None)
+            else:
+                self.cursor, self._late_seq = row.id, 0
+        logger.info("Dispatched changes up to %d (%d keys, %d players)", self.cursor, len(keys), len(players))
+        return len(rows)
+
+    def purge(self):
+        """Drop relayed rows older than the retention period, at most once per PURGE_INTERVAL_SECONDS."""
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(days=CHANGE_FEED_RETENTION_DAYS)
+        with self.engine.begin() as conn:
+            deleted = conn.execute(change_feed.delete().where(change_feed.c.id <= self.cursor,
+                                                              change_feed.c.created_at < cutoff)).rowcount
+        if deleted:
+            logger.info("Purged %d relayed changes", deleted)
+
+    def run_once(self) -> int:
+        total = self.dispatch(self.late(), late=True)
+        while True:
+            count = self.dispatch(self.pending())
+            total += count
+            if count < CHANGE_BATCH_SIZE:
+                return total
+
+def _listener(engine):
+    """A raw LISTENing connection on PostgreSQL (None elsewhere), with the NOTIFY trigger installed."""
+    if engine.dialect.name != "postgresql":
+        return None
+    with engine.begin() as conn:
+        conn.exec_driver_sql(_NOTIFY_TRIGGER)
+    raw = engine.raw_connection()
+    raw.dbapi_connection.autocommit = True
+    raw.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+    return raw
+
+def _wait(listener, timeout: float):
+    if listener is None:
+        time.sleep(timeout)
+        return
+    conn = listener.dbapi_connection
+    if wait_readable([conn], [], [], timeout)[0]:
+        conn.poll()
+        conn.notifies.clear()
+
+def run(engine, client: Optional[redis.Redis] = None, once: bool = False):
+    client = client or redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    dispatcher = Dispatcher(engine, client)
+    dispatcher.resume()
+    listener = None if once else _listener(engine)
+    try:
+        while True:
+            try:
+                dispatcher.run_once()
+                dispatcher.purge()
+            except redis.RedisError as e:
+                # the cursor only moves past relayed rows: retry the same batch
+                logger.warning("Redis unavailable, retrying: %s", e)
+            if once:
+                return
+            # wake on NOTIFY, or poll; also the longest a held-back gap waits to be re-checked
+            _wait(listener, CHANGE_POLL_SECONDS)
+    finally:
+        if listener is not None:
+            listener.close()
+
+if __name__ == "__main__":
+    from .db import engine
+    from .schema import ensure_schema
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Relay the change feed to Redis (invalidation and live push)")
+    parser.add_argument("--once", action="store_true", help="relay what is pending and exit")
+    args = parser.parse_args()
+    ensure_schema(engine)
+    run(engine, once=args.once)
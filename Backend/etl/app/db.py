@@ -0,0 +1,8 @@
+# etl/app/db.py
+import os
+from sqlalchemy import create_engine
+
+# Same warehouse the services read from
+DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/analytics_db")
+
+engine = create_engine(DATABASE_URL, future=True)
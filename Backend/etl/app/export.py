@@ -0,0 +1,185 @@
+# etl/app/export.py
+"""
+Columnar export of the star schema for heavy analytical reads.
+
+Fact tables are written as Hive-partitioned Parquet,
+
+    <EXPORT_DIR>/<fact>/season=<start year>/team_id=<id>/month=<yyyy-mm>/part-0.parquet
+
+(team_id 0 when the team is unknown), dimensions as one file each
+(<EXPORT_DIR>/<dim>/<dim>.parquet). analytics-service reads them through DuckDB,
+so season-long scans and model-training reads stay off the primary database.
+
+Each month is read from the database as one slice, in date order, and its
+partitions are replaced as a whole, so an export is bounded by one month of
+facts in memory and re-exporting a month is idempotent. Every file is written
+next to its final path and renamed into place, so a reader never sees a
+half-written partition. After a load, only the months from the earliest
+staged date onward are rewritten.
+
+    python -m app.export                     # everything
+    python -m app.export --since 2024-09-01  # months from September 2024 on
+"""
+import argparse
+import glob
+import logging
+import os
+import shutil
+from datetime import date
+from typing import Callable, Dict, NamedTuple, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, func, select
+
+from .schema import (dim_competition, dim_date, dim_match, dim_player, dim_team, fact_player_gps,
+                     fact_player_wyscout, fact_wyscout_match)
+
+logger = logging.getLogger("etl")
+
+EXPORT_DIR = os.getenv("ETL_EXPORT_DIR", "")
+SEASON_START_MONTH = int(os.getenv("SEASON_START_MONTH", "7"))
+UNKNOWN_TEAM = 0
+
+def _arrow_type(column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+def season_of(d: date) -> int:
+    """Start year of the season a date belongs to."""
+    return d.year if d.month >= SEASON_START_MONTH else d.year - 1
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+# --- fact slices ---------------------------------------------------------------
+
+class FactExport(NamedTuple):
+    name: str
+    date_column: str
+    columns: list                       # SQLAlchemy columns, in file order
+    query: Callable                     # (start, end) -> select over [start, end)
+
+def _gps_query(start: date, end: date):
+    f = fact_player_gps
+    return select(*f.c).where(f.c.session_date >= start, f.c.session_date < end)
+
+def _wyscout_player_query(start: date, end: date):
+    f = fact_player_wyscout
+    return (select(*f.c, dim_match.c.match_date)
+            .join(dim_match, dim_match.c.match_id == f.c.match_id)
+            .where(dim_match.c.match_date >= start, dim_match.c.match_date < end))
+
+def _wyscout_match_query(start: date, end: date):
+    f = fact_wyscout_match
+    return (select(*f.c, dim_match.c.match_date)
+            .join(dim_match, dim_match.c.match_id == f.c.match_id)
+            .where(dim_match.c.match_date >= start, dim_match.c.match_date < end))
+
+FACTS = [
+    FactExport("fact_player_gps", "session_date", list(fact_player_gps.c), _gps_query),
+    # Wyscout player rows carry no team: they are filed under the player's GPS team
+    FactExport("fact_player_wyscout", "match_date", list(fact_player_wyscout.c) + [dim_match.c.match_date],
+               _wyscout_player_query),
+    FactExport("fact_wyscout_match", "match_date", list(fact_wyscout_match.c) + [dim_match.c.match_date],
+               _wyscout_match_query),
+]
+
+DIMENSIONS = [dim_date, dim_player, dim_team, dim_competition, dim_match]
+
+def _file_schema(columns) -> pa.Schema:
+    # explicit, so a month where a column is all NULL still writes the same schema;
+    # team_id (like season and month) lives in the partition path
+    return pa.schema([(c.name, _arrow_type(c)) for c in columns if c.name != "team_id"])
+
+def _player_teams(conn) -> Dict[int, int]:
+    f = fact_player_gps
+    return dict(conn.execute(select(f.c.player_id, func.max(f.c.team_id))
+                             .where(f.c.team_id.isnot(None)).group_by(f.c.player_id)).all())
+
+def _write_parquet(table: pa.Table, path: str):
+    # write then rename, so readers never see a half-written file
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+def _clear_month(root: str, month: str, keep=frozenset()):
+    for path in glob.glob(os.path.join(root, "season=*", "team_id=*", f"month={month}")):
+        if path not in keep:
+            shutil.rmtree(path)
+
+def export_fact(conn, fact: FactExport, root: str, since: Optional[date] = None,
+                player_teams: Optional[Dict[int, int]] = None) -> int:
+    """Rewrite the fact's partitions month by month from `since` (everything when None); returns rows written."""
+    every = fact.query(date.min, date.max).subquery()
+    first, last = conn.execute(select(func.min(every.c[fact.date_column]), func.max(every.c[fact.date_column]))).one()
+    if first is None:
+        return 0
+    month = _month_start(max(first, since) if since else first)
+    schema = _file_schema(fact.columns)
+    order = [next(c for c in fact.columns if c.name == name) for name in (fact.date_column, "id")]
+    out = os.path.join(root, fact.name)
+    written = 0
+    while month <= last:
+        end = _next_month(month)
+        rows = conn.execute(fact.query(month, end).order_by(*order)).all()
+        label = month.strftime("%Y-%m")
+        directories = set()
+        if rows:
+            frame = pd.DataFrame.from_records(rows, columns=[c.name for c in fact.columns])
+            if "team_id" not in frame:
+                frame["team_id"] = frame["player_id"].map(player_teams or {})
+            frame["team_id"] = frame["team_id"].fillna(UNKNOWN_TEAM).astype("int64")
+            for team_id, part in frame.groupby("team_id"):
+                directory = os.path.join(out, f"season={season_of(month)}", f"team_id={team_id}", f"month={label}")
+                os.makedirs(directory, exist_ok=True)
+                _write_parquet(pa.Table.from_pandas(part[schema.names], schema=schema, preserve_index=False),
+                               os.path.join(directory, "part-0.parquet"))
+                directories.add(directory)
+            written += len(frame)
+        # teams that no longer have rows this month
+        _clear_month(out, label, directories)
+        month = end
+    return written
+
+def export_dimension(conn, table, root: str) -> int:
+    frame = pd.DataFrame.from_records(conn.execute(select(*table.c)).all(), columns=list(table.c.keys()))
+    schema = pa.schema([(c.name, _arrow_type(c)) for c in table.c])
+    os.makedirs(os.path.join(root, table.name), exist_ok=True)
+    _write_parquet(pa.Table.from_pandas(frame, schema=schema, preserve_index=False),
+                   os.path.join(root, table.name, f"{table.name}.parquet"))
+    return len(frame)
+
+def export_all(conn, root: str = EXPORT_DIR, since: Optional[date] = None) -> Dict[str, int]:
+    """Export the dimensions and every fact month from `since` on; returns rows written per table."""
+    if not root:
+        raise ValueError("No export directory (set ETL_EXPORT_DIR or pass --out)")
+    counts = {table.name: export_dimension(conn, table, root) for table in DIMENSIONS}
+    teams = _player_teams(conn)
+    for fact in FACTS:
+        counts[fact.name] = export_fact(conn, fact, root, since, teams)
+    logger.info("Exported Parquet to %s from %s: %s", root, since or "the beginning", counts)
+    return counts
+
+if __name__ == "__main__":
+    from .db import engine
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Export the star schema as partitioned Parquet")
+    parser.add_argument("--out", default=EXPORT_DIR, help="dataset root (default: ETL_EXPORT_DIR)")
+    parser.add_argument("--since", type=date.fromisoformat, help="only months from this date's onward")
+    args = parser.parse_args()
+    with engine.connect() as conn:
+        export_all(conn, args.out, args.since)
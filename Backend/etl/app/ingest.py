@@ -0,0 +1,191 @@
+# etl/app/ingest.py
+"""
+Streaming, parallel CSV ingestion.
+
+Each source file is read in fixed-size blocks that only materialize the staging
+columns (Arrow's streaming CSV reader when pyarrow is installed, pandas chunks
+otherwise). Blocks are typed into NumPy-backed columns, filtered to the load
+window, get their periode/segment labels normalised and are spooled as a CSV
+part in staging column order. Files are prepared in parallel on a process pool
+and the parent COPYs the parts, so memory stays around one block per worker no
+matter how large or wide the exports are.
+"""
+import csv
+import multiprocessing
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, Float, Integer, Table
+
+from .matching import normalize_name
+from .schema import metadata
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pandas chunked reader fallback
+    pa = pacsv = None
+
+CSV_BACKEND = os.getenv("ETL_CSV_BACKEND", "arrow" if pacsv is not None else "pandas")
+INGEST_WORKERS = int(os.getenv("ETL_INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_BLOCK_BYTES = int(os.getenv("ETL_INGEST_BLOCK_BYTES", str(8 << 20)))  # arrow reader
+CSV_CHUNK_SIZE = int(os.getenv("ETL_CSV_CHUNK_SIZE", "50000"))  # pandas reader, rows
+
+NULL_VALUES = ["", "-", "NA", "N/A", "n/a", "nan", "NaN", "null", "NULL"]
+
+# Canonical periode/segment labels; rows labelled TOTAL hold the whole match
+TOTAL = "total"
+PERIODE_ALIASES = {
+    TOTAL: ["total", "match", "match complet", "tout le match", "full", "full match", "all", "90"],
+    "1h": ["1", "1h", "1st half", "first half", "1ere mi temps", "premiere mi temps", "1re mi temps"],
+    "2h": ["2", "2h", "2nd half", "second half", "2eme mi temps", "deuxieme mi temps", "2e mi temps"],
+    "et": ["et", "extra time", "prolongation", "prolongations"],
+}
+SEGMENT_ALIASES = {
+    TOTAL: ["total", "all", "tout", "tous", "global", "match"],
+}
+
+def _alias_map(aliases: Dict[str, List[str]]) -> Dict[str, str]:
+    return {normalize_name(alias): label for label, names in aliases.items() for alias in names}
+
+_LABEL_MAPS = {"periode": _alias_map(PERIODE_ALIASES), "segment": _alias_map(SEGMENT_ALIASES)}
+
+def normalize_labels(values: pd.Series, column: str) -> pd.Series:
+    """Vectorized over distinct values: canonical label, missing -> TOTAL, unknown -> normalized text."""
+    codes, uniques = pd.factorize(values)
+    mapping = _LABEL_MAPS[column]
+    labels = [mapping.get(n, n) or TOTAL for n in (normalize_name(u) for u in uniques)]
+    labels.append(TOTAL)  # code -1 (missing) picks the last entry
+    return pd.Series(np.array(labels, dtype=object)[codes], index=values.index)
+
+def coerce_frame(frame: pd.DataFrame, table: Table) -> pd.DataFrame:
+    """Type string columns to the staging table's column types (NumPy float64 / nullable Int64 / date)."""
+    out = {}
+    for column in table.c:
+        name = column.name
+        values = frame[name] if name in frame else pd.Series(None, index=frame.index, dtype=object)
+        if isinstance(column.type, Date):
+            out[name] = pd.to_datetime(values, errors="coerce").dt.date
+        elif isinstance(column.type, (Integer, Float)):
+            if values.dtype == object:
+                values = values.str.replace(",", ".", regex=False)  # French decimal comma
+            numbers = pd.to_numeric(values, errors="coerce")
+            out[name] = numbers.round().astype("Int64") if isinstance(column.type, Integer) else numbers.astype(float)
+        elif name in _LABEL_MAPS:
+            out[name] = normalize_labels(values, name)
+        else:
+            out[name] = values.str.strip() if values.dtype == object else values
+    return pd.DataFrame(out, index=frame.index)
+
+# Staging columns whose export header varies by source and language
+HEADER_ALIASES = {"minutes_played": ["minutes", "minutes_jouees", "temps_de_jeu"]}
+
+def normalize_header(name: str) -> str:
+    return normalize_name(name).replace(" ", "_")
+
+def _header(path: str) -> Dict[str, str]:
+    """normalized header -> raw header."""
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        raw = next(csv.reader(fh), [])
+    header = {normalize_header(c): c for c in raw}
+    for column, aliases in HEADER_ALIASES.items():
+        alias = next((a for a in aliases if a in header), None)
+        if column not in header and alias is not None:
+            header[column] = header[alias]
+    return header
+
+def read_blocks(path: str, table: Table, backend: str = CSV_BACKEND, block_bytes: int = INGEST_BLOCK_BYTES,
+                chunk_rows: int = CSV_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Blocks of the projected staging columns as strings, renamed to staging names."""
+    header = _header(path)
+    projected = {header[c]: c for c in table.c.keys() if c in header}
+    if not projected:
+        return
+    if backend == "arrow" and pacsv is not None:
+        reader = pacsv.open_csv(
+            path,
+            read_options=pacsv.ReadOptions(block_size=block_bytes),
+            convert_options=pacsv.ConvertOptions(
+                include_columns=list(projected), column_types={c: pa.string() for c in projected},
+                null_values=NULL_VALUES, strings_can_be_null=True),
+        )
+        for batch in reader:
+            yield batch.to_pandas().rename(columns=projected)
+    else:
+        for chunk in pd.read_csv(path, usecols=list(projected), dtype=str, chunksize=chunk_rows,
+                                 na_values=NULL_VALUES, keep_default_na=False, encoding="utf-8-sig"):
+            yield chunk.rename(columns=projected)
+
+def peak_rss_kb() -> int:
+    """High-water RSS of this process. VmHWM, since ru_maxrss carries over a spawning parent's peak."""
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+
+class FileResult(NamedTuple):
+    path: str
+    spool_path: str
+    rows_read: int
+    rows_kept: int
+    latest: Optional[date]
+    seconds: float
+    peak_rss_kb: int
+
+def prepare_file(path: str, table_name: str, date_column: str, since: Optional[date], spool_path: str,
+                 backend: str = CSV_BACKEND, block_bytes: int = INGEST_BLOCK_BYTES,
+                 chunk_rows: int = CSV_CHUNK_SIZE) -> FileResult:
+    """Parse, type, filter and normalise one file into a staging-ordered CSV spool (runs in a worker)."""
+    t0 = time.perf_counter()
+    table = metadata.tables[table_name]
+    read = kept = 0
+    latest = None
+    with open(spool_path, "w", newline="") as out:
+        for block in read_blocks(path, table, backend, block_bytes, chunk_rows):
+            read += len(block)
+            frame = coerce_frame(block, table)
+            frame = frame[frame[date_column].notna()]
+            if since is not None:
+                frame = frame[frame[date_column] > since]
+            if frame.empty:
+                continue
+            frame.to_csv(out, index=False, header=False, na_rep="")
+            kept += len(frame)
+            block_latest = frame[date_column].max()
+            latest = block_latest if latest is None else max(latest, block_latest)
+    return FileResult(path, spool_path, read, kept, latest, time.perf_counter() - t0, peak_rss_kb())
+
+def _prepare_task(args) -> FileResult:
+    return prepare_file(*args)
+
+def prepare_files(paths: Sequence[str], table: Table, date_column: str, since: Optional[date], spool_dir: str,
+                  workers: int = INGEST_WORKERS, backend: str = CSV_BACKEND,
+                  block_bytes: int = INGEST_BLOCK_BYTES, chunk_rows: int = CSV_CHUNK_SIZE) -> Iterator[FileResult]:
+    """Prepare every file, in parallel when there is more than one; yields results in file order."""
+    tasks = [(path, table.name, date_column, since, os.path.join(spool_dir, f"{table.name}-{i}.csv"),
+              backend, block_bytes, chunk_rows) for i, path in enumerate(paths)]
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        for task in tasks:
+            yield _prepare_task(task)
+        return
+    # spawn: workers must not inherit the parent's open database connection
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        yield from pool.map(_prepare_task, tasks)
+
+def read_spool(path: str, table: Table, chunk_rows: int = CSV_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Typed chunks back from a spool part (for databases without COPY)."""
+    for chunk in pd.read_csv(path, header=None, names=list(table.c.keys()), dtype=str, chunksize=chunk_rows,
+                             na_values=[""], keep_default_na=False):
+        yield coerce_frame(chunk, table)
@@ -0,0 +1,261 @@
+# etl/app/keys.py
+"""
+Surrogate key resolution.
+
+Dimension keys are loaded once per run into dictionaries keyed by normalized
+name, so resolving a staged name is a dict lookup rather than a query (or a
+name join in SQL). Names not seen before are matched against the other source's
+spellings (matching.py) and otherwise get new dimension rows, written in bulk by
+flush() together with the spelling -> key lookup rows.
+"""
+import re
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select
+
+from .matching import (ACCEPT_THRESHOLD, LOOKUP_STATUSES, PROPOSED, REJECTED, Candidate, match_names,
+                       normalize_name, save_mappings)
+from .schema import (dim_competition, dim_date, dim_match, dim_player, dim_team, entity_name_map,
+                     fact_player_gps)
+
+# "Home - Away" optionally followed by a score, e.g. "Esperance - Club Africain 2:1"
+_MATCH_LABEL = re.compile(r"^\s*(?P<home>.+?)\s+-\s+(?P<away>.+?)(?:\s+(?P<hs>\d+)\s*[:\-]\s*(?P<as>\d+))?\s*$")
+_SCORE = re.compile(r"^\s*(\d+)\s*[:\-]\s*(\d+)\s*$")
+
+def parse_match_label(label: Optional[str]) -> Optional[Tuple[str, str, Optional[int], Optional[int]]]:
+    """(home, away, home_score, away_score) from a Wyscout match label, or None."""
+    m = _MATCH_LABEL.match(label or "")
+    if not m:
+        return None
+    hs, as_ = m.group("hs"), m.group("as")
+    return m.group("home"), m.group("away"), int(hs) if hs else None, int(as_) if as_ else None
+
+def parse_score(score: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    m = _SCORE.match(score or "")
+    return (int(m.group(1)), int(m.group(2))) if m else (None, None)
+
+def date_key(d: date) -> int:
+    """dim_date id (yyyymmdd)."""
+    return d.year * 10000 + d.month * 100 + d.day
+
+def date_row(d: date) -> dict:
+    return {
+        "date_id": date_key(d), "full_date": d, "day": d.day, "month": d.month, "year": d.year,
+        "week": d.isocalendar()[1], "quarter": (d.month - 1) // 3 + 1,
+        "day_name": d.strftime("%A"), "month_name": d.strftime("%B"),
+    }
+
+class _NameDimension:
+    """
+    Name resolution for one dimension. Lookups go through the cached
+    entity_name_map ((source, normalized spelling) -> member) first, then the
+    names already on the dimension rows. prime() batch-matches unknown spellings
+    against members that lack that source's spelling before any new member is
+    created, so a GPS "A. Ben" lands on the Wyscout "Ali Ben" row. A spelling
+    whose match is only proposed gets a member of its own, and its proposal
+    stays in entity_name_map until an analyst accepts or rejects it.
+    """
+
+    def __init__(self, conn, table, key: str, prefix: str):
+        self.table = table
+        self.key = key
+        self.prefix = prefix
+        self.ids: Dict[str, int] = {}
+        self.names: Dict[int, str] = {}
+        self.teams: Dict[int, int] = {}  # member -> team, for blocking
+        self.filled: Dict[int, set] = {}
+        self.new_rows: List[dict] = []
+        self.updates: Dict[Tuple[int, str], str] = {}
+        cols = [f"{prefix}_name_std", f"{prefix}_name_gps", f"{prefix}_name_wyscout"]
+        rows = conn.execute(select(table.c[key], *[table.c[c] for c in cols])).all()
+        for row in rows:
+            self.filled[row[0]] = {source for source, value in zip(("std", "gps", "wyscout"), row[1:]) if value}
+            self.names[row[0]] = normalize_name(next((v for v in row[1:] if v), ""))
+            for value in row[1:]:
+                if value:
+                    self.ids.setdefault(normalize_name(value), row[0])
+        self.next_id = (max(self.filled) if self.filled else 0) + 1
+
+        self.mapped: Dict[Tuple[str, str], int] = {}
+        self.rejected = set()
+        self.proposed = set()  # awaiting an analyst: never recorded as resolved, never re-matched
+        self.map_rows: Dict[Tuple[str, str], dict] = {}
+        for source, name, member, status in conn.execute(
+                select(entity_name_map.c.source, entity_name_map.c.source_name, entity_name_map.c.entity_id,
+                       entity_name_map.c.status).where(entity_name_map.c.entity == prefix)):
+            if status in LOOKUP_STATUSES:
+                self.mapped[(source, name)] = member
+            elif status == REJECTED:
+                self.rejected.add((source, name))
+            elif status == PROPOSED:
+                self.proposed.add((source, name))
+
+    def _record(self, source: str, norm: str, member: int, score: float, status: str):
+        self.map_rows[(source, norm)] = {"entity": self.prefix, "source": source, "source_name": norm,
+                                         "entity_id": member, "score": score, "status": status}
+
+    def prime(self, names: Iterable[Tuple[Optional[str], Optional[int]]], source: str):
+        """Match the unknown spellings in (name, team) pairs before they are resolved."""
+        pending: Dict[str, Optional[int]] = {}
+        for name, team in names:
+            norm = normalize_name(name)
+            if norm and norm not in self.ids and (source, norm) not in self.mapped \
+                    and (source, norm) not in self.rejected and (source, norm) not in self.proposed:
+                pending.setdefault(norm, team)
+        members = [m for m, filled in self.filled.items() if source not in filled]
+        if not pending or not members:
+            return
+        left = [Candidate(norm, team) for norm, team in pending.items()]
+        right = [Candidate(self.names[m], self.teams.get(m)) for m in members]
+        for match in match_names(left, right):
+            norm, member = left[match.left].name, members[match.right]
+            if match.score >= ACCEPT_THRESHOLD:
+                self.mapped[(source, norm)] = member
+                self._record(source, norm, member, round(match.score, 4), "auto")
+            else:
+                self.proposed.add((source, norm))
+                self._record(source, norm, member, round(match.score, 4), PROPOSED)
+
+    def resolve(self, name: Optional[str], source: str, team: Optional[int] = None) -> Optional[int]:
+        """source is "gps" or "wyscout"; records the spelling against that source column."""
+        norm = normalize_name(name)
+        if not norm:
+            return None
+        key = self.mapped.get((source, norm))
+        if key is None:
+            key, status = self.ids.get(norm), "exact"
+            if key is None:
+                key, self.next_id, status = self.next_id, self.next_id + 1, "new"
+                self.ids[norm] = key
+                self.names[key] = norm
+                self.filled[key] = {"std", source}
+                self.new_rows.append({
+                    self.key: key,
+                    f"{self.prefix}_name_std": name.strip(),
+                    f"{self.prefix}_name_{source}": name.strip(),
+                    "has_gps": source == "gps",
+                    "has_wyscout": source == "wyscout",
+                })
+            self.mapped[(source, norm)] = key
+            if (source, norm) not in self.proposed:
+                self._record(source, norm, key, 1.0, status)
+        if source not in self.filled[key]:
+            self.filled[key].add(source)
+            self.updates[(key, source)] = name.strip()
+        if team is not None:
+            self.teams.setdefault(key, team)
+        return key
+
+    def flush(self, conn):
+        if self.new_rows:
+            defaults = {f"{self.prefix}_name_gps": None, f"{self.prefix}_name_wyscout": None}
+            conn.execute(self.table.insert(), [{**defaults, **row} for row in self.new_rows])
+            self.new_rows = []
+        for source in ("gps", "wyscout"):
+            params = [{"b_key": key, "b_name": name} for (key, s), name in self.updates.items() if s == source]
+            if params:
+                stmt = (self.table.update()
+                        .where(self.table.c[self.key] == bindparam("b_key"))
+                        .values({f"{self.prefix}_name_{source}": bindparam("b_name"), f"has_{source}": True}))
+                conn.execute(stmt, params)
+        self.updates = {}
+        save_mappings(conn, list(self.map_rows.values()))
+        self.map_rows = {}
+
+class KeyResolver:
+    def __init__(self, conn):
+        self.players = _NameDimension(conn, dim_player, "player_id", "player")
+        self.players.teams = dict(conn.execute(
+            select(fact_player_gps.c.player_id, func.max(fact_player_gps.c.team_id))
+            .where(fact_player_gps.c.team_id.isnot(None))
+            .group_by(fact_player_gps.c.player_id)).all())
+        self.teams = _NameDimension(conn, dim_team, "team_id", "team")
+        self.competitions: Dict[str, int] = {
+            normalize_name(name): cid
+            for cid, name in conn.execute(select(dim_competition.c.competition_id, dim_competition.c.competition_name))
+        }
+        self._next_competition = (conn.execute(select(func.max(dim_competition.c.competition_id))).scalar() or 0) + 1
+        self._new_competitions: List[dict] = []
+        self.matches: Dict[Tuple[date, int, int], int] = {
+            (d, home, away): mid
+            for mid, d, home, away in conn.execute(select(dim_match.c.match_id, dim_match.c.match_date,
+                                                          dim_match.c.home_team_id, dim_match.c.away_team_id))
+        }
+        self._next_match = (conn.execute(select(func.max(dim_match.c.match_id))).scalar() or 0) + 1
+        self._new_matches: List[dict] = []
+        self._scores: Dict[int, Tuple[int, int]] = {}
+        self.dates = set(conn.execute(select(dim_date.c.date_id)).scalars())
+        self._new_dates: List[dict] = []
+
+    def player(self, name: Optional[str], source: str, team: Optional[int] = None) -> Optional[int]:
+        return self.players.resolve(name, source, team)
+
+    def team(self, name: Optional[str], source: str) -> Optional[int]:
+        return self.teams.resolve(name, source)
+
+    def competition(self, name: Optional[str]) -> Optional[int]:
+        norm = normalize_name(name)
+        if not norm:
+            return None
+        cid = self.competitions.get(norm)
+        if cid is None:
+            cid, self._next_competition = self._next_competition, self._next_competition + 1
+            self.competitions[norm] = cid
+            self._new_competitions.append({"competition_id": cid, "competition_name": name.strip(), "country": None})
+        return cid
+
+    def match(self, match_date: date, label: Optional[str], competition: Optional[str] = None,
+              score: Optional[str] = None) -> Optional[int]:
+        """Match id for a Wyscout "Home - Away" label on a date, creating dim_match rows as needed."""
+        parsed = parse_match_label(label)
+        if parsed is None or match_date is None:
+            return None
+        home, away, home_score, away_score = parsed
+        if parse_score(score)[0] is not None:
+            home_score, away_score = parse_score(score)
+        home_id, away_id = self.team(home, "wyscout"), self.team(away, "wyscout")
+        self.date(match_date)
+        key = (match_date, home_id, away_id)
+        mid = self.matches.get(key)
+        if mid is None:
+            mid, self._next_match = self._next_match, self._next_match + 1
+            self.matches[key] = mid
+            self._new_matches.append({
+                "match_id": mid, "match_date": match_date, "competition_id": self.competition(competition),
+                "home_team_id": home_id, "away_team_id": away_id,
+                "home_score": home_score, "away_score": away_score, "is_played": home_score is not None,
+            })
+        elif home_score is not None:
+            self._scores[mid] = (home_score, away_score)
+        return mid
+
+    def date(self, d: date):
+        date_id = date_key(d)
+        if date_id not in self.dates:
+            self.dates.add(date_id)
+            self._new_dates.append(date_row(d))
+
+    def dates_from(self, values: Iterable[date]):
+        for d in values:
+            if d is not None:
+                self.date(d)
+
+    def flush(self, conn):
+        """Write new dimension members (and newly learned scores/spellings) in bulk."""
+        self.players.flush(conn)
+        self.teams.flush(conn)
+        if self._new_competitions:
+            conn.execute(dim_competition.insert(), self._new_competitions)
+            self._new_competitions = []
+        if self._new_dates:
+            conn.execute(dim_date.insert(), self._new_dates)
+            self._new_dates = []
+        if self._new_matches:
+            conn.execute(dim_match.insert(), self._new_matches)
+            self._new_matches = []
+        if self._scores:
+            stmt = (dim_match.update().where(dim_match.c.match_id == bindparam("b_id"))
+                    .values(home_score=bindparam("b_home"), away_score=bindparam("b_away"), is_played=True))
+            conn.execute(stmt, [{"b_id": mid, "b_home": h, "b_away": a} for mid, (h, a) in self._scores.items()])
+            self._scores = {}
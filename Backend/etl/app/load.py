@@ -0,0 +1,323 @@
+# etl/app/load.py
+"""
+Incremental staging -> star schema load.
+
+For every source CSV given on the command line:
+  1. rows dated after the source watermark (minus ETL_LOOKBACK_DAYS) are streamed
+     into its staging table with COPY (files are parsed in parallel, see .ingest),
+  2. the distinct player/team/match names in staging are resolved to surrogate keys
+     in memory (new dimension members are inserted in bulk),
+  3. the facts are upserted set-based from staging joined to the key maps, on
+     their natural keys, so re-staged days replace rather than duplicate rows,
+  4. the workload rollups are refreshed from the earliest re-staged GPS day (see .rollups),
+  5. one change_feed row per topic (gps / match / rollup) names the affected players,
+     teams, matches and dates, for cache invalidation and live push (see .changes),
+  6. with ETL_EXPORT_DIR set, the Parquet export is rewritten from the earliest staged month (see .export).
+Everything runs in one transaction; watermarks and change rows only land if the load commits.
+
+Nightly run:  python -m app.load --training-gps 'gps/training_*.csv' --wyscout-matches matches.csv ...
+Full reload:  add --full
+"""
+import argparse
+import glob
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Union
+
+from sqlalchemy import Table, func, select, text
+
+from . import changes
+from .db import engine
+from .export import EXPORT_DIR, export_all
+from .ingest import CSV_BACKEND, INGEST_WORKERS, TOTAL
+from .keys import KeyResolver, parse_match_label
+from .rollups import refresh as refresh_rollups
+from .schema import (SOURCES, Source, etl_watermark, ensure_schema, key_metadata, match_keys,
+                     player_keys, stg_matches, team_keys)
+from .staging import stage_files
+
+logger = logging.getLogger("etl")
+
+# Re-stage the last loaded day(s) so a partially delivered day is completed on the next run
+ETL_LOOKBACK_DAYS = int(os.getenv("ETL_LOOKBACK_DAYS", "1"))
+
+# One fact row per staged session. A player's sessions on one day are numbered in a
+# fixed order of their contents, so a re-staged day maps onto the same rows.
+# (WHERE true: SQLite needs it to parse INSERT ... SELECT ... ON CONFLICT)
+_GPS_UPSERT = """
+INSERT INTO fact_player_gps (player_id, team_id, session_date, session_type, session_no, total_distance,
+    total_duration, total_player_load, sprint_distance, explosive_efforts, accel_decel_efforts,
+    avg_heart_rate, max_heart_rate)
+SELECT p.player_id, t.team_id, s.{date_column}, '{session_type}',
+    ROW_NUMBER() OVER (PARTITION BY p.player_id, s.{date_column}
+                       ORDER BY s.type_session, s.total_duration, s.total_distance, s.total_player_load,
+                                s.sprint_distance, t.team_id),
+    s.total_distance, s.total_duration, s.total_player_load, s.sprint_distance,
+    s.explosive_efforts, s.accel_decel_efforts, s.avg_heart_rate, s.max_heart_rate
+FROM {staging} s
+JOIN etl_player_keys p ON p.source_name = s.player_name
+LEFT JOIN etl_team_keys t ON t.source_name = s.team_name
+WHERE true
+ON CONFLICT (player_id, session_date, session_type, session_no) DO UPDATE SET
+    team_id = excluded.team_id,
+    total_distance = excluded.total_distance,
+    total_duration = excluded.total_duration,
+    total_player_load = excluded.total_player_load,
+    sprint_distance = excluded.sprint_distance,
+    explosive_efforts = excluded.explosive_efforts,
+    accel_decel_efforts = excluded.accel_decel_efforts,
+    avg_heart_rate = excluded.avg_heart_rate,
+    max_heart_rate = excluded.max_heart_rate
+"""
+
+_WYSCOUT_PLAYER_ROWS = """
+SELECT p.player_id, m.match_id, s.minutes_played, {goals} AS goals, {assists} AS assists, {xg} AS xg,
+    CASE WHEN COALESCE(s.periode, '{total}') = '{total}'
+          AND COALESCE(s.segment, '{total}') = '{total}' THEN 1 ELSE 0 END AS is_total
+FROM {staging} s
+JOIN etl_player_keys p ON p.source_name = s.player
+JOIN etl_match_keys m ON m.match_date = s."date" AND m."match" = s."match"
+"""
+
+# Wyscout player rows come per periode/segment (normalised at ingest). The whole-match
+# rows are used when a player-match has them; otherwise its period rows are summed.
+_WYSCOUT_PLAYER_UPSERT = """
+INSERT INTO fact_player_wyscout (player_id, match_id, minutes_played, goals, assists, xg)
+SELECT player_id, match_id, SUM(minutes_played), COALESCE(SUM(goals), 0), COALESCE(SUM(assists), 0), SUM(xg)
+FROM (
+    SELECT r.*, MAX(r.is_total) OVER (PARTITION BY r.player_id, r.match_id) AS has_total
+    FROM ({rows}) r
+) ranked
+WHERE is_total = has_total
+GROUP BY player_id, match_id
+ON CONFLICT (player_id, match_id) DO UPDATE SET
+    minutes_played = excluded.minutes_played,
+    goals = excluded.goals,
+    assists = excluded.assists,
+    xg = excluded.xg
+"""
+
+_MATCH_UPSERT = """
+INSERT INTO fact_wyscout_match (match_id, team_id, possession_pct, shots_total, shots_on_target, xg)
+SELECT m.match_id, t.team_id,
+    CAST(ROUND(MAX(s.general_possession_pct)) AS INTEGER),
+    CAST(ROUND(MAX(s.attack_tirs)) AS INTEGER),
+    CAST(ROUND(MAX(s.attack_tirs_cadres)) AS INTEGER),
+    MAX(s.attack_xg)
+FROM stg_matches s
+JOIN etl_match_keys m ON m.match_date = s."date" AND m."match" = s."match"
+JOIN etl_team_keys t ON t.source_name = COALESCE(NULLIF(s.equipe, ''), s.team_name)
+GROUP BY m.match_id, t.team_id
+ON CONFLICT (match_id, team_id) DO UPDATE SET
+    possession_pct = excluded.possession_pct,
+    shots_total = excluded.shots_total,
+    shots_on_target = excluded.shots_on_target,
+    xg = excluded.xg
+"""
+
+def read_watermarks(conn) -> Dict[str, Optional[date]]:
+    return dict(conn.execute(select(etl_watermark.c.source, etl_watermark.c.watermark)).all())
+
+def write_watermark(conn, source: str, watermark: Optional[date], rows: int, exists: bool):
+    values = {"watermark": watermark, "rows_staged": rows, "loaded_at": datetime.utcnow()}
+    if exists:
+        conn.execute(etl_watermark.update().where(etl_watermark.c.source == source).values(**values))
+    else:
+        conn.execute(etl_watermark.insert().values(source=source, **values))
+
+def _distinct(conn, table: Table, *columns: str):
+    return conn.execute(select(*[table.c[c] for c in columns]).distinct()).all()
+
+def resolve_keys(conn, staged: Dict[str, Source], keys: KeyResolver):
+    """Resolve every distinct staged name through the in-memory dictionaries, then publish the key maps."""
+    players: Dict[str, int] = {}
+    teams: Dict[str, int] = {}
+    matches: Dict[tuple, int] = {}
+
+    def add(mapping, name, key):
+        if name and key is not None:
+            mapping[name] = key
+
+    wyscout_tables = [staged[n].table for n in ("wyscout_outfield", "wyscout_goalkeepers") if n in staged]
+    gps_sources = [staged[n] for n in ("training_gps", "matches_gps") if n in staged]
+    fixtures = []  # (date, label, competition, score)
+    if "wyscout_matches" in staged:
+        fixtures += _distinct(conn, stg_matches, "date", "match", "competition", "score")
+    for table in wyscout_tables:
+        fixtures += [(d, label, competition, None)
+                     for d, label, competition in _distinct(conn, table, "date", "match", "competition")]
+
+    # teams first (player blocking uses team ids), Wyscout spellings before GPS ones
+    wyscout_teams = set()
+    for _, label, _, _ in fixtures:
+        wyscout_teams.update((parse_match_label(label) or ())[:2])
+    if "wyscout_matches" in staged:
+        wyscout_teams.update(equipe or team_name for team_name, equipe in _distinct(conn, stg_matches, "team_name", "equipe"))
+    for table in wyscout_tables:
+        wyscout_teams.update(team_name for (team_name,) in _distinct(conn, table, "team_name"))
+    gps_teams = {team_name for source in gps_sources for (team_name,) in _distinct(conn, source.table, "team_name")}
+    keys.teams.prime([(name, None) for name in wyscout_teams], "wyscout")
+    for name in wyscout_teams:
+        add(teams, name, keys.team(name, "wyscout"))
+    keys.teams.prime([(name, None) for name in gps_teams], "gps")
+    for name in gps_teams:
+        add(teams, name, keys.team(name, "gps"))
+
+    for d, label, competition, score in fixtures:
+        add(matches, (d, label), keys.match(d, label, competition, score))
+
+    wyscout_players = {(player, teams.get(team_name))
+                       for table in wyscout_tables for player, team_name in _distinct(conn, table, "player", "team_name")}
+    gps_players = {(player, teams.get(team_name))
+                   for source in gps_sources for player, team_name in _distinct(conn, source.table, "player_name", "team_name")}
+    for names, source in ((wyscout_players, "wyscout"), (gps_players, "gps")):
+        keys.players.prime(names, source)
+        for name, team in names:
+            add(players, name, keys.player(name, source, team))
+
+    for source in gps_sources:
+        keys.dates_from(d for (d,) in _distinct(conn, source.table, source.date_column))
+    keys.flush(conn)
+
+    key_metadata.create_all(conn)
+    for table in (player_keys, team_keys, match_keys):
+        conn.execute(table.delete())
+    if players:
+        conn.execute(player_keys.insert(), [{"source_name": n, "player_id": k} for n, k in players.items()])
+    if teams:
+        conn.execute(team_keys.insert(), [{"source_name": n, "team_id": k} for n, k in teams.items()])
+    if matches:
+        conn.execute(match_keys.insert(),
+                     [{"match_date": d, "match": label, "match_id": k} for (d, label), k in matches.items()])
+    logger.info("Resolved %d player, %d team and %d match keys", len(players), len(teams), len(matches))
+
+def upsert_facts(conn, staged: Dict[str, Source]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    if "wyscout_matches" in staged:
+        counts["fact_wyscout_match"] = conn.execute(text(_MATCH_UPSERT)).rowcount
+    player_rows = []
+    if "wyscout_outfield" in staged:
+        player_rows.append(_WYSCOUT_PLAYER_ROWS.format(
+            staging="staging_outfield_players", goals="s.attack_buts", assists="s.attack_passes_decisives",
+            xg="s.attack_xg", total=TOTAL))
+    if "wyscout_goalkeepers" in staged:
+        player_rows.append(_WYSCOUT_PLAYER_ROWS.format(
+            staging="staging_goalkeepers", goals="NULL", assists="NULL", xg="NULL", total=TOTAL))
+    if player_rows:
+        sql = _WYSCOUT_PLAYER_UPSERT.format(rows=" UNION ALL ".join(player_rows))
+        counts["fact_player_wyscout"] = conn.execute(text(sql)).rowcount
+    gps = 0
+    for name, session_type in (("training_gps", "training"), ("matches_gps", "match")):
+        if name in staged:
+            source = staged[name]
+            sql = _GPS_UPSERT.format(staging=source.table.name, date_column=source.date_column,
+                                     session_type=session_type)
+            gps += conn.execute(text(sql)).rowcount
+    if gps:
+        counts["fact_player_gps"] = gps
+    return counts
+
+_GPS_CHANGED = """
+SELECT DISTINCT p.player_id, t.team_id
+FROM {staging} s
+JOIN etl_player_keys p ON p.source_name = s.player_name
+LEFT JOIN etl_team_keys t ON t.source_name = s.team_name
+"""
+
+_WYSCOUT_CHANGED = """
+SELECT DISTINCT p.player_id
+FROM {staging} s
+JOIN etl_player_keys p ON p.source_name = s.player
+"""
+
+def record_changes(conn, staged: Dict[str, Source], rollups_from: Optional[date], rollups: bool):
+    """Queue the change feed rows for what this load upserted (the key maps still hold this run's keys)."""
+    gps_sources = [staged[n] for n in ("training_gps", "matches_gps") if n in staged]
+    gps_teams = set()
+    if gps_sources:
+        players, days = set(), []
+        for source in gps_sources:
+            for player_id, team_id in conn.execute(text(_GPS_CHANGED.format(staging=source.table.name))):
+                players.add(player_id)
+                if team_id is not None:
+                    gps_teams.add(team_id)
+            column = source.table.c[source.date_column]
+            days += conn.execute(select(func.min(column), func.max(column))).one()
+        days = [d for d in days if d is not None]
+        changes.record(conn, "gps", player_ids=sorted(players), team_ids=sorted(gps_teams),
+                       **{"from": min(days, default=None), "to": max(days, default=None)})
+    wyscout = [n for n in ("wyscout_outfield", "wyscout_goalkeepers") if n in staged]
+    if wyscout or "wyscout_matches" in staged:
+        players = {player_id for name in wyscout
+                   for (player_id,) in conn.execute(text(_WYSCOUT_CHANGED.format(staging=staged[name].table.name)))}
+        match_ids = sorted(m for (m,) in conn.execute(select(match_keys.c.match_id).distinct()))
+        changes.record(conn, "match", match_ids=match_ids, player_ids=sorted(players))
+    if rollups:
+        changes.record(conn, "rollup", team_ids=sorted(gps_teams), **{"from": rollups_from})
+
+def expand_paths(patterns: Union[str, Sequence[str], None]) -> List[str]:
+    if not patterns:
+        return []
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return [path for pattern in patterns for path in (sorted(glob.glob(pattern)) or [pattern])]
+
+def run_load(paths: Dict[str, Union[str, Sequence[str]]], full: bool = False,
+             lookback_days: int = ETL_LOOKBACK_DAYS, workers: int = INGEST_WORKERS,
+             backend: str = CSV_BACKEND) -> Dict[str, int]:
+    """
+    paths maps source names (see SOURCES) to CSV files or glob patterns;
+    returns rows upserted per fact table.
+    """
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        watermarks = read_watermarks(conn)
+        staged: Dict[str, Source] = {}
+        for source in SOURCES:
+            files = expand_paths(paths.get(source.name))
+            if not files:
+                continue
+            previous = watermarks.get(source.name)
+            since = None if full or previous is None else previous - timedelta(days=lookback_days)
+            rows, latest = stage_files(conn, source.table, files, source.date_column, since, workers, backend)
+            logger.info("Staged %d %s rows after %s", rows, source.name, since)
+            if rows:
+                staged[source.name] = source
+            if latest is not None and previous is not None and not full:
+                latest = max(latest, previous)
+            write_watermark(conn, source.name, latest or previous, rows, source.name in watermarks)
+
+        if not staged:
+            logger.info("Nothing new to load.")
+            return {}
+        resolve_keys(conn, staged, KeyResolver(conn))
+        counts = upsert_facts(conn, staged)
+        earliest = {name: conn.execute(select(func.min(s.table.c[s.date_column]))).scalar()
+                    for name, s in staged.items()}
+        gps_days = [earliest[n] for n in ("training_gps", "matches_gps") if n in staged]
+        rollups_from = None if full or not gps_days else min(gps_days)
+        if gps_days:
+            refresh_rollups(conn, rollups_from)
+        # last before the commit: keeps change ids allocated close to it (see changes.py on gaps)
+        record_changes(conn, staged, rollups_from, bool(gps_days))
+    logger.info("Upserted %s", counts)
+    if EXPORT_DIR:
+        # after the commit, so the export reads what was just loaded
+        with engine.connect() as conn:
+            export_all(conn, EXPORT_DIR, None if full else min(earliest.values()))
+    return counts
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Incremental load of source CSVs into the star schema")
+    for source in SOURCES:
+        parser.add_argument(f"--{source.name.replace('_', '-')}", dest=source.name, metavar="CSV", nargs="+",
+                            help="files or glob patterns")
+    parser.add_argument("--full", action="store_true", help="ignore watermarks and re-stage every row")
+    parser.add_argument("--lookback-days", type=int, default=ETL_LOOKBACK_DAYS)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--backend", choices=["arrow", "pandas"], default=CSV_BACKEND)
+    args = parser.parse_args()
+    paths = {source.name: getattr(args, source.name) for source in SOURCES}
+    run_load(paths, args.full, args.lookback_days, args.workers, args.backend)
@@ -0,0 +1,316 @@
+# etl/app/matching.py
+"""
+Entity resolution between GPS and Wyscout spellings of player and team names.
+
+Candidate pairs come from blocking (shared team, shared first/last initials or
+shared surname prefix), so the work grows with block sizes rather than with
+roster size squared. Inside a block, similarity is scored as one matrix
+operation: character-trigram Dice over binary trigram vectors, plus a bonus
+for "A. Surname" vs "Ali Surname". Pairs are then assigned one-to-one, best
+score first.
+
+Offline pass over the dimensions (GPS-only rows vs Wyscout-only rows):
+
+    python -m app.matching player            # record proposals in entity_name_map
+    python -m app.matching player --merge    # also fold accepted pairs into one row
+
+Accepted mappings (status auto or manual) are what the loader's key resolution
+reads; analysts accept a proposal by setting its status to manual.
+"""
+import argparse
+import logging
+import os
+import re
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, delete, exists, func, select, update
+
+from . import changes
+from .schema import (dim_match, dim_player, dim_team, entity_name_map, fact_player_gps,
+                     fact_player_wyscout, fact_wyscout_match)
+
+logger = logging.getLogger("etl")
+
+ACCEPT_THRESHOLD = float(os.getenv("ER_ACCEPT_THRESHOLD", "0.85"))
+REVIEW_THRESHOLD = float(os.getenv("ER_REVIEW_THRESHOLD", "0.6"))
+INITIAL_MATCH_SCORE = 0.9  # same surname, compatible first initial, one side abbreviated
+
+# entity_name_map statuses; LOOKUP_STATUSES resolve names, the others are kept for review
+LOOKUP_STATUSES = ("exact", "new", "auto", "manual")
+PROPOSED, REJECTED = "proposed", "rejected"
+MATCH_STATUSES = ("auto", PROPOSED)  # written by the matcher, the only ones that may replace a proposal
+
+def normalize_name(name: Optional[str]) -> str:
+    """Lowercase, accents and punctuation stripped, single spaces."""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text.lower()).split())
+
+class Candidate(NamedTuple):
+    name: str                 # normalized
+    team: Optional[int] = None
+
+class Match(NamedTuple):
+    left: int
+    right: int
+    score: float
+
+def _trigrams(name: str) -> List[str]:
+    padded = f"  {name} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def block_keys(candidate: Candidate) -> List[str]:
+    tokens = candidate.name.split()
+    if not tokens:
+        return []
+    keys = [f"i:{tokens[0][0]}{tokens[-1][0]}", f"s:{tokens[-1][:4]}"]
+    if candidate.team is not None:
+        keys.append(f"t:{candidate.team}")
+    return keys
+
+def similarity_matrix(left: Sequence[str], right: Sequence[str]) -> np.ndarray:
+    """(len(left), len(right)) scores in [0, 1] for normalized names."""
+    vocab: Dict[str, int] = {}
+    left_grams = [[vocab.setdefault(g, len(vocab)) for g in set(_trigrams(n))] for n in left]
+    right_grams = [[vocab.setdefault(g, len(vocab)) for g in set(_trigrams(n))] for n in right]
+    a = np.zeros((len(left), len(vocab)), dtype=np.float32)
+    b = np.zeros((len(right), len(vocab)), dtype=np.float32)
+    for i, grams in enumerate(left_grams):
+        a[i, grams] = 1.0
+    for j, grams in enumerate(right_grams):
+        b[j, grams] = 1.0
+    overlap = a @ b.T
+    sizes = a.sum(axis=1)[:, None] + b.sum(axis=1)[None, :]
+    dice = np.divide(2.0 * overlap, sizes, out=np.zeros_like(overlap), where=sizes > 0)
+
+    # "a ben" vs "ali ben": trigrams undersell abbreviated first names
+    def parts(names):
+        tokens = [n.split() or [""] for n in names]
+        return (np.array([t[-1] for t in tokens], dtype=object),
+                np.array([t[0][:1] for t in tokens], dtype=object),
+                np.array([len(t) > 1 and len(t[0]) == 1 for t in tokens]))
+    l_surname, l_initial, l_abbrev = parts(left)
+    r_surname, r_initial, r_abbrev = parts(right)
+    initials = ((l_surname[:, None] == r_surname[None, :])
+                & (l_initial[:, None] == r_initial[None, :])
+                & (l_abbrev[:, None] | r_abbrev[None, :]))
+    return np.maximum(dice, np.where(initials, INITIAL_MATCH_SCORE, 0.0))
+
+def match_names(left: Sequence[Candidate], right: Sequence[Candidate],
+                min_score: float = REVIEW_THRESHOLD) -> List[Match]:
+    """One-to-one matches between left and right scoring at least min_score, best first."""
+    blocks: Dict[str, Tuple[List[int], List[int]]] = {}
+    for i, candidate in enumerate(left):
+        for key in block_keys(candidate):
+            blocks.setdefault(key, ([], []))[0].append(i)
+    for j, candidate in enumerate(right):
+        for key in block_keys(candidate):
+            if key in blocks:
+                blocks[key][1].append(j)
+
+    best: Dict[Tuple[int, int], float] = {}
+    for li, ri in blocks.values():
+        if not li or not ri:
+            continue
+        scores = similarity_matrix([left[i].name for i in li], [right[j].name for j in ri])
+        for a, b in zip(*np.nonzero(scores >= min_score)):
+            pair = (li[a], ri[b])
+            best[pair] = max(best.get(pair, 0.0), float(scores[a, b]))
+
+    used_left, used_right, matches = set(), set(), []
+    for (i, j), score in sorted(best.items(), key=lambda item: -item[1]):
+        if i not in used_left and j not in used_right:
+            used_left.add(i)
+            used_right.add(j)
+            matches.append(Match(i, j, score))
+    return matches
+
+# --- offline pass over the dimensions ------------------------------------------
+
+_ENTITIES = {
+    "player": (dim_player, "player_id", "player"),
+    "team": (dim_team, "team_id", "team"),
+}
+
+def _one_sided(conn, entity: str, source: str) -> List[Tuple[int, str]]:
+    table, key, prefix = _ENTITIES[entity]
+    other = "wyscout" if source == "gps" else "gps"
+    rows = conn.execute(select(table.c[key], table.c[f"{prefix}_name_{source}"], table.c[f"{prefix}_name_std"])
+                        .where(table.c[f"has_{source}"].is_(True))
+                        .where(table.c[f"has_{other}"].isnot(True))).all()
+    return [(row[0], normalize_name(row[1] or row[2])) for row in rows]
+
+def save_mappings(conn, rows: List[dict]) -> List[dict]:
+    """
+    Upsert entity_name_map rows, keeping analyst decisions (manual/rejected) untouched
+    and pending proposals until the matcher revisits them; returns rows written.
+    """
+    if not rows:
+        return []
+    existing = {(r.entity, r.source, r.source_name): r.status for r in conn.execute(select(
+        entity_name_map.c.entity, entity_name_map.c.source, entity_name_map.c.source_name, entity_name_map.c.status))}
+    now = datetime.utcnow()
+    inserts, written = [], []
+    for row in rows:
+        key = (row["entity"], row["source"], row["source_name"])
+        status = existing.get(key)
+        if status in ("manual", REJECTED) or (status == PROPOSED and row["status"] not in MATCH_STATUSES):
+            continue
+        written.append(row)
+        if status is None:
+            inserts.append({**row, "updated_at": now})
+        else:
+            conn.execute(update(entity_name_map)
+                         .where(and_(entity_name_map.c.entity == key[0], entity_name_map.c.source == key[1],
+                                     entity_name_map.c.source_name == key[2]))
+                         .values(entity_id=row["entity_id"], score=row["score"], status=row["status"], updated_at=now))
+    if inserts:
+        conn.execute(entity_name_map.insert(), inserts)
+    return written
+
+def propose(conn, entity: str, accept: float = ACCEPT_THRESHOLD, review: float = REVIEW_THRESHOLD) -> List[dict]:
+    """Match GPS-only members to Wyscout-only members and record the mappings (GPS spelling -> Wyscout row)."""
+    gps = _one_sided(conn, entity, "gps")
+    wyscout = _one_sided(conn, entity, "wyscout")
+    matches = match_names([Candidate(n) for _, n in gps], [Candidate(n) for _, n in wyscout], review)
+    rows = [{"entity": entity, "source": "gps", "source_name": gps[m.left][1], "entity_id": wyscout[m.right][0],
+             "score": round(m.score, 4), "status": "auto" if m.score >= accept else PROPOSED} for m in matches]
+    rows = save_mappings(conn, rows)
+    logger.info("%s: %d GPS-only vs %d Wyscout-only, %d accepted, %d for review", entity, len(gps), len(wyscout),
+                sum(r["status"] == "auto" for r in rows), sum(r["status"] == PROPOSED for r in rows))
+    return rows
+
+# Fact tables whose natural key includes the member: (table, member column, rest of the key)
+_KEYED_FACTS = {
+    "player": [(fact_player_gps, "player_id", ("session_date", "session_type", "session_no")),
+               (fact_player_wyscout, "player_id", ("match_id",))],
+    "team": [(fact_wyscout_match, "team_id", ("match_id",))],
+}
+
+def _drop_collisions(conn, table, column: str, rest: Sequence[str], old: int, new: int) -> int:
+    """Delete old's rows whose natural key new already has: the same session or match loaded under both spellings."""
+    kept = table.alias("kept")
+    duplicate = exists().where(kept.c[column] == new, *[kept.c[c] == table.c[c] for c in rest])
+    return conn.execute(delete(table).where(table.c[column] == old, duplicate)).rowcount
+
+def _repoint(conn, entity: str, old: int, new: int):
+    conn.execute(update(entity_name_map).where(entity_name_map.c.entity == entity, entity_name_map.c.entity_id == old)
+                 .values(entity_id=new))
+    for table, column, rest in _KEYED_FACTS[entity]:
+        dropped = _drop_collisions(conn, table, column, rest, old, new)
+        if dropped:
+            logger.info("%s %d -> %d: dropped %d %s rows already loaded for %d", entity, old, new, dropped,
+                        table.name, new)
+    if entity == "player":
+        for table in (fact_player_gps, fact_player_wyscout):
+            conn.execute(update(table).where(table.c.player_id == old).values(player_id=new))
+    else:
+        for table in (fact_player_gps, fact_wyscout_match):
+            conn.execute(update(table).where(table.c.team_id == old).values(team_id=new))
+        for column in ("home_team_id", "away_team_id"):
+            conn.execute(update(dim_match).where(dim_match.c[column] == old).values({column: new}))
+
+class _Touched:
+    """What a merge changes, reported to the change feed in the merge's transaction."""
+
+    def __init__(self, entity: str):
+        self.entity = entity
+        self.members, self.gps_players, self.gps_teams = set(), set(), set()
+        self.matches, self.match_players = set(), set()
+        self.days: List = []
+
+    def add(self, conn, old: int, new: int):
+        """Call before old's rows are repointed to new."""
+        self.members |= {old, new}
+        f = fact_player_gps
+        member = f.c.player_id if self.entity == "player" else f.c.team_id
+        rows = conn.execute(select(f.c.player_id, f.c.team_id, func.min(f.c.session_date), func.max(f.c.session_date))
+                            .where(member == old).group_by(f.c.player_id, f.c.team_id)).all()
+        for player_id, team_id, first, last in rows:
+            self.gps_players.add(player_id)
+            if team_id is not None:
+                self.gps_teams.add(team_id)
+            self.days += [first, last]
+        if rows and self.entity == "player":
+            self.gps_players.add(new)
+        elif rows:
+            self.gps_teams.add(new)
+        if self.entity == "player":
+            w = fact_player_wyscout
+            matches = set(conn.execute(select(w.c.match_id).where(w.c.player_id == old).distinct()).scalars())
+            if matches:
+                self.matches |= matches
+                self.match_players |= {old, new}
+        else:
+            self.matches |= set(conn.execute(select(dim_match.c.match_id).where(
+                (dim_match.c.home_team_id == old) | (dim_match.c.away_team_id == old))).scalars())
+            self.matches |= set(conn.execute(select(fact_wyscout_match.c.match_id)
+                                             .where(fact_wyscout_match.c.team_id == old).distinct()).scalars())
+
+    def record(self, conn):
+        if self.members:
+            changes.record(conn, self.entity, **{f"{self.entity}_ids": sorted(self.members)})
+        if self.gps_players:
+            changes.record(conn, "gps", player_ids=sorted(self.gps_players), team_ids=sorted(self.gps_teams),
+                           **{"from": min(self.days), "to": max(self.days)})
+        if self.matches:
+            changes.record(conn, "match", match_ids=sorted(self.matches), player_ids=sorted(self.match_players))
+
+def merge(conn, entity: str) -> int:
+    """
+    Fold every member whose GPS spelling has an accepted mapping to another member
+    into that member: facts are repointed (rows the member already has under the
+    same natural key are dropped first), the spelling and has_gps flag move over
+    and the duplicate row is deleted. The repointed facts change the per-member
+    workload rollups, so those are rebuilt after any merge.
+    """
+    table, key, prefix = _ENTITIES[entity]
+    mappings = conn.execute(select(entity_name_map.c.source_name, entity_name_map.c.entity_id).where(
+        entity_name_map.c.entity == entity, entity_name_map.c.source == "gps",
+        entity_name_map.c.status.in_(("auto", "manual")))).all()
+    owners = {name: member for member, name in _one_sided(conn, entity, "gps")}
+    touched = _Touched(entity)
+    merged = 0
+    for name, target in mappings:
+        owner = owners.get(name)
+        if owner is None or owner == target:
+            continue
+        gps_name = conn.execute(select(table.c[f"{prefix}_name_gps"]).where(table.c[key] == owner)).scalar()
+        touched.add(conn, owner, target)
+        _repoint(conn, entity, owner, target)
+        conn.execute(delete(table).where(table.c[key] == owner))
+        conn.execute(update(table).where(table.c[key] == target)
+                     .values({f"{prefix}_name_gps": gps_name, "has_gps": True}))
+        merged += 1
+    if merged:
+        from .rollups import refresh  # rollups -> keys -> matching
+        refresh(conn)
+        # last before the caller commits: keeps change ids allocated close to the commit
+        touched.record(conn)
+        changes.record(conn, "rollup", team_ids=sorted(conn.execute(select(dim_team.c.team_id)).scalars()),
+                       **{"from": None})
+    logger.info("%s: merged %d duplicate members", entity, merged)
+    return merged
+
+if __name__ == "__main__":
+    from .db import engine
+    from .schema import ensure_schema
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Match GPS and Wyscout name variants in a dimension")
+    parser.add_argument("entity", choices=sorted(_ENTITIES))
+    parser.add_argument("--merge", action="store_true", help="fold accepted pairs into one member")
+    parser.add_argument("--accept", type=float, default=ACCEPT_THRESHOLD)
+    parser.add_argument("--review", type=float, default=REVIEW_THRESHOLD)
+    args = parser.parse_args()
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        for row in propose(conn, args.entity, args.accept, args.review):
+            print(f"{row['status']:>8}  {row['score']:.3f}  {row['source_name']!r} -> {args.entity} {row['entity_id']}")
+        if args.merge:
+            merge(conn, args.entity)
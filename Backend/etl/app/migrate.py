@@ -0,0 +1,120 @@
+# etl/app/migrate.py
+"""
+Index migrations for the warehouse tables the services read.
+
+create_all only builds indexes together with a new table, so indexes added to
+the models later (schema.NATURAL_KEYS and schema.ACCESS_INDEXES) never reach a
+warehouse that already exists. This brings one up to date:
+
+  0. adds the columns added to existing tables (schema.ADDED_COLUMNS) and drops
+     the natural keys a wider one replaced (schema.RETIRED_NATURAL_KEYS),
+  1. builds every missing index; on PostgreSQL with CREATE INDEX CONCURRENTLY,
+     so loads and reads carry on while it runs (an index left INVALID by an
+     interrupted build is dropped and rebuilt),
+  2. adds fact_player_wyscout.match_id -> dim_match as NOT VALID and then
+     validates it, which does not block writes (PostgreSQL only),
+  3. drops the single-column indexes the composites supersede,
+  4. ANALYZEs the tables it touched so the planner sees the new indexes.
+
+Idempotent; run it after deploying a release that changes the indexes:
+
+    python -m app.migrate --dry-run   # print the statements only
+    python -m app.migrate
+"""
+import argparse
+import logging
+import re
+from typing import List
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+
+from .schema import (ACCESS_INDEXES, NATURAL_KEYS, RETIRED_NATURAL_KEYS, SUPERSEDED_INDEXES, add_column_ddl,
+                     fact_player_wyscout, missing_columns)
+
+logger = logging.getLogger("etl")
+
+_CREATE = re.compile(r"^CREATE (UNIQUE )?INDEX ")
+_MATCH_FK = next(iter(fact_player_wyscout.c.match_id.foreign_keys)).constraint
+
+def _invalid_indexes(conn) -> List[str]:
+    rows = conn.exec_driver_sql(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid")
+    return [name for (name,) in rows]
+
+def plan(conn, drop_superseded: bool = True) -> List[str]:
+    """The statements that bring the connected warehouse's indexes up to date, in order."""
+    postgres = conn.dialect.name == "postgresql"
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    existing = {index["name"] for table in tables for index in inspector.get_indexes(table)}
+    added = missing_columns(conn)
+    statements = [add_column_ddl(column, conn.dialect) for column in added]
+    touched = {column.table.name for column in added}
+    for name, table in RETIRED_NATURAL_KEYS.items():
+        if name in existing:
+            statements.append(f"DROP INDEX {'CONCURRENTLY ' if postgres else ''}IF EXISTS {name}")
+            touched.add(table)
+    managed = NATURAL_KEYS + ACCESS_INDEXES
+    if postgres:
+        for name in set(_invalid_indexes(conn)) & {index.name for index in managed}:
+            statements.append(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            existing.discard(name)
+
+    for index in managed:
+        if index.name in existing or index.table.name not in tables:
+            continue
+        ddl = str(CreateIndex(index).compile(dialect=conn.dialect))
+        if postgres:
+            ddl = _CREATE.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX CONCURRENTLY IF NOT EXISTS ", ddl)
+        statements.append(ddl)
+        touched.add(index.table.name)
+
+    if postgres and {"fact_player_wyscout", "dim_match"} <= tables:
+        keys = inspector.get_foreign_keys("fact_player_wyscout")
+        if not any(k["referred_table"] == "dim_match" and k["constrained_columns"] == ["match_id"] for k in keys):
+            statements.append(f"ALTER TABLE fact_player_wyscout ADD CONSTRAINT {_MATCH_FK.name} "
+                              f"FOREIGN KEY (match_id) REFERENCES dim_match (match_id) NOT VALID")
+            statements.append(f"ALTER TABLE fact_player_wyscout VALIDATE CONSTRAINT {_MATCH_FK.name}")
+
+    if drop_superseded:
+        for name, table in SUPERSEDED_INDEXES.items():
+            if name in existing:
+                statements.append(f"DROP INDEX {'CONCURRENTLY ' if postgres else ''}IF EXISTS {name}")
+                touched.add(table)
+
+    statements += [f"ANALYZE {table}" for table in sorted(touched)]
+    return statements
+
+def migrate(engine, dry_run: bool = False, drop_superseded: bool = True) -> List[str]:
+    """Apply plan() one autocommitted statement at a time; returns the statements run (or planned)."""
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        statements = plan(conn, drop_superseded)
+        for statement in statements:
+            if dry_run:
+                print(f"{statement};")
+                continue
+            logger.info("Running %s", statement)
+            try:
+                conn.exec_driver_sql(statement)
+            except DBAPIError as e:
+                if "VALIDATE CONSTRAINT" not in statement:
+                    raise
+                # rows referencing missing matches: the NOT VALID constraint still guards new rows
+                logger.warning("Could not validate %s, left NOT VALID: %s", _MATCH_FK.name, e.orig)
+    if not statements:
+        logger.info("Warehouse indexes are up to date")
+    return statements
+
+if __name__ == "__main__":
+    from .db import engine
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Create the service read-path indexes on an existing warehouse")
+    parser.add_argument("--dry-run", action="store_true", help="print the statements instead of running them")
+    parser.add_argument("--keep-superseded", action="store_true",
+                        help="do not drop the single-column indexes the composites replace")
+    args = parser.parse_args()
+    migrate(engine, args.dry_run, not args.keep_superseded)
@@ -0,0 +1,183 @@
+# etl/app/rollups.py
+"""
+Weekly, monthly and quarterly workload rollups per player and per team.
+
+agg_player_workload / agg_team_workload hold one row per member, grain and
+period, keyed by the period's first day (a dim_date row), so a season overview
+is a primary-key range scan instead of a scan of fact_player_gps. The loader
+calls refresh() with the earliest session date it re-staged: only periods from
+that date's period onward are recomputed. Full rebuild:
+
+    python -m app.rollups
+
+Sessions are read and rolled up in windows of whole periods spanning at least
+ETL_ROLLUP_WINDOW_DAYS, so a full rebuild never holds all of fact_player_gps
+in memory.
+
+Heart-rate zones: the GPS facts keep one average heart rate per session, so a
+session's whole duration is credited to the zone of its average (zone bounds in
+bpm from ETL_HR_ZONES).
+"""
+import argparse
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+
+from .keys import date_key, date_row
+from .schema import (HR_ZONE_COLUMNS, WORKLOAD_SUMS, agg_player_workload, agg_team_workload, dim_date,
+                     fact_player_gps)
+
+logger = logging.getLogger("etl")
+
+GRAINS = ("week", "month", "quarter")
+ROLLUP_WINDOW_DAYS = int(os.getenv("ETL_ROLLUP_WINDOW_DAYS", "92"))
+HR_ZONES = [float(b) for b in os.getenv("ETL_HR_ZONES", "120,140,160,180").split(",")]
+if len(HR_ZONES) != len(HR_ZONE_COLUMNS) - 1:
+    raise ValueError(f"ETL_HR_ZONES needs {len(HR_ZONE_COLUMNS) - 1} bounds")
+
+def period_start(d: date, grain: str) -> date:
+    if grain == "week":
+        return date.fromordinal(d.toordinal() - d.weekday())
+    if grain == "month":
+        return d.replace(day=1)
+    return d.replace(month=(d.month - 1) // 3 * 3 + 1, day=1)
+
+def next_period(start: date, grain: str) -> date:
+    if grain == "week":
+        return start + timedelta(days=7)
+    month = start.month - 1 + (1 if grain == "month" else 3)
+    return date(start.year + month // 12, month % 12 + 1, 1)
+
+def _windows(first: date, last: date, grain: str, days: int = ROLLUP_WINDOW_DAYS) -> Iterator[Tuple[date, date]]:
+    """[start, end) ranges of whole periods covering first..last."""
+    start = period_start(first, grain)
+    while start <= last:
+        end = next_period(start, grain)
+        while (end - start).days < days:
+            end = next_period(end, grain)
+        yield start, end
+        start = end
+
+def _periods(dates: pd.Series, grain: str) -> pd.DataFrame:
+    """period_start, year and period number per session date."""
+    if grain == "week":
+        iso = dates.dt.isocalendar()
+        return pd.DataFrame({"period_start": dates - pd.to_timedelta(dates.dt.weekday, unit="D"),
+                             "year": iso.year.astype("int64"), "period": iso.week.astype("int64")})
+    freq, number = ("M", dates.dt.month) if grain == "month" else ("Q", dates.dt.quarter)
+    return pd.DataFrame({"period_start": dates.dt.to_period(freq).dt.start_time,
+                         "year": dates.dt.year, "period": number})
+
+def _sessions(conn, start: date, end: date) -> pd.DataFrame:
+    f = fact_player_gps
+    query = (select(f.c.player_id, f.c.team_id, f.c.session_date, f.c.session_type,
+                    *[f.c[c] for c in WORKLOAD_SUMS], f.c.avg_heart_rate, f.c.max_heart_rate)
+             .where(f.c.session_date >= start, f.c.session_date < end))
+    frame = pd.DataFrame(conn.execute(query).all(), columns=list(query.selected_columns.keys()))
+    frame["session_date"] = pd.to_datetime(frame["session_date"])
+    frame[WORKLOAD_SUMS + ["avg_heart_rate", "max_heart_rate"]] = (
+        frame[WORKLOAD_SUMS + ["avg_heart_rate", "max_heart_rate"]].astype("float64"))
+
+    # per-session terms that sum to the period values
+    frame["training_sessions"] = (frame["session_type"] == "training").astype("int64")
+    frame["match_sessions"] = (frame["session_type"] == "match").astype("int64")
+    has_hr = frame["avg_heart_rate"].notna()
+    duration = frame["total_duration"].fillna(0.0)
+    frame["_hr_weight"] = (frame["avg_heart_rate"] * duration).where(has_hr, 0.0)
+    frame["_hr_minutes"] = duration.where(has_hr, 0.0)
+    zone = np.digitize(frame["avg_heart_rate"].fillna(0.0), HR_ZONES)
+    for i, column in enumerate(HR_ZONE_COLUMNS):
+        frame[column] = duration.where(has_hr & (zone == i), 0.0)
+    return frame
+
+def _rollup(frame: pd.DataFrame, key: str, grain: str) -> pd.DataFrame:
+    frame = frame.reset_index(drop=True)
+    frame = pd.concat([frame, _periods(frame["session_date"], grain)], axis=1)
+    aggs = {"year": ("year", "first"), "period": ("period", "first"), "sessions": ("session_date", "size"),
+            "training_sessions": ("training_sessions", "sum"), "match_sessions": ("match_sessions", "sum"),
+            "max_heart_rate": ("max_heart_rate", "max"), "_hr_mean": ("avg_heart_rate", "mean"),
+            "_hr_weight": ("_hr_weight", "sum"), "_hr_minutes": ("_hr_minutes", "sum")}
+    aggs.update({c: (c, "sum") for c in HR_ZONE_COLUMNS})
+    if key == "player_id":
+        aggs["team_id"] = ("team_id", "max")
+    else:
+        aggs["players"] = ("player_id", "nunique")
+    grouped = frame.groupby([key, "period_start"])
+    out = grouped.agg(**aggs)
+    # sums stay NULL when no session reported the metric
+    out = out.join(grouped[WORKLOAD_SUMS].sum(min_count=1)).reset_index()
+    weighted = out["_hr_weight"] / out["_hr_minutes"].where(out["_hr_minutes"] > 0)
+    out["avg_heart_rate"] = weighted.fillna(out["_hr_mean"])
+    out["period_start"] = out["period_start"].dt.date
+    out["date_id"] = [date_key(d) for d in out["period_start"]]
+    out["grain"] = grain
+    if key == "player_id":
+        out["team_id"] = out["team_id"].astype("Int64")
+    return out.drop(columns=["_hr_mean", "_hr_weight", "_hr_minutes"])
+
+def _records(frame: pd.DataFrame, table, refreshed_at: datetime):
+    frame = frame[[c for c in table.c.keys() if c in frame.columns]].astype(object)
+    records = frame.where(frame.notna(), None).to_dict("records")
+    for record in records:
+        record["refreshed_at"] = refreshed_at
+    return records
+
+def _ensure_dates(conn, starts):
+    ids = {date_key(d): d for d in starts}
+    if not ids:
+        return
+    known = set(conn.execute(select(dim_date.c.date_id).where(dim_date.c.date_id.in_(list(ids)))).scalars())
+    missing = [date_row(d) for date_id, d in ids.items() if date_id not in known]
+    if missing:
+        conn.execute(dim_date.insert(), missing)
+
+def refresh(conn, since: Optional[date] = None) -> Dict[str, int]:
+    """
+    Recompute the rollup periods containing `since` and everything after it
+    (all periods when since is None); returns rows written per table.
+    """
+    f = fact_player_gps
+    bounds = select(func.min(f.c.session_date), func.max(f.c.session_date))
+    if since is not None:
+        bounds = bounds.where(f.c.session_date >= min(period_start(since, grain) for grain in GRAINS))
+    first, last = conn.execute(bounds).one()
+    now = datetime.utcnow()
+    counts = {agg_player_workload.name: 0, agg_team_workload.name: 0}
+    for grain in GRAINS:
+        start = period_start(since, grain) if since else None
+        for table in (agg_player_workload, agg_team_workload):
+            stale = table.delete().where(table.c.grain == grain)
+            if start is not None:
+                stale = stale.where(table.c.period_start >= start)
+            conn.execute(stale)
+        if first is None:
+            continue
+        for window in _windows(max(first, start) if start else first, last, grain):
+            sessions = _sessions(conn, *window)
+            for table, key in ((agg_player_workload, "player_id"), (agg_team_workload, "team_id")):
+                rows = sessions[sessions[key].notna()].astype({key: "int64"})
+                if rows.empty:
+                    continue
+                rollup = _rollup(rows, key, grain)
+                _ensure_dates(conn, set(rollup["period_start"]))
+                conn.execute(table.insert(), _records(rollup, table, now))
+                counts[table.name] += len(rollup)
+    logger.info("Refreshed workload rollups from %s: %s", since or "the beginning", counts)
+    return counts
+
+if __name__ == "__main__":
+    from .db import engine
+    from .schema import ensure_schema
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild the workload rollups")
+    parser.add_argument("--since", type=date.fromisoformat, help="only periods from this date's onward")
+    args = parser.parse_args()
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        refresh(conn, args.since)
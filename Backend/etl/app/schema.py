@@ -0,0 +1,355 @@
+# etl/app/schema.py
+"""
+Tables the loader reads and writes.
+
+Staging tables mirror DW/Staging_*.sql. Dimension and fact tables mirror the
+service models (create_all is a no-op for tables the services already created),
+plus the unique natural keys the incremental upserts conflict on and the
+composite/covering indexes behind the services' queries (see migrate.py).
+"""
+from typing import List, NamedTuple
+
+from sqlalchemy import (Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer,
+                        MetaData, String, Table, Text, inspect, text)
+
+metadata = MetaData()
+
+def _staging(name, text_columns, date_column, int_columns=(), float_columns=()):
+    columns = [Column(c, String(255)) for c in text_columns]
+    columns.append(Column(date_column, Date))
+    columns += [Column(c, Integer) for c in int_columns]
+    columns += [Column(c, Float) for c in float_columns]
+    return Table(name, metadata, *columns)
+
+_GPS_METRICS = [
+    "accel_decel_efforts", "max_acceleration", "max_deceleration", "total_distance",
+    "total_duration", "total_player_load", "sprint_distance", "explosive_efforts",
+    "avg_heart_rate", "max_heart_rate",
+]
+
+stg_training_gps = _staging(
+    "stg_training_gps", ["player_name", "team_name", "report_type", "type_session"], "session_date",
+    float_columns=_GPS_METRICS,
+)
+
+stg_matches_gps = _staging(
+    "stg_matches_gps", ["player_name", "team_name", "type_session", "opponent"], "match_date",
+    int_columns=["gameweek"], float_columns=_GPS_METRICS,
+)
+
+stg_matches = _staging(
+    "stg_matches", ["team_name", "match", "score", "competition", "equipe", "adversaire"], "date",
+    float_columns=[
+        "attack_attaques_positionnelles", "attack_contre_attaques", "attack_corners",
+        "attack_coups_francs", "attack_penaltys", "attack_tirs", "attack_tirs_cadres", "attack_xg",
+        "defense_buts_concedes", "defense_duels_defensifs_gagnes", "defense_duels_defensifs_pct",
+        "defense_interceptions_total", "defense_cartons_jaunes", "defense_cartons_rouges",
+        "general_passes_precises", "general_passes_precises_pct", "general_passes_total",
+        "general_duels_gagnes", "general_duels_pct", "general_tirs_cadres", "general_xg",
+        "general_possession_pct", "indice_ppda", "indice_rythme_match", "pass_but_coup_franc",
+    ],
+)
+
+_WYSCOUT_PLAYER_TEXT = ["team_name", "match", "competition", "player", "periode", "segment"]
+# minutes on the pitch, when the export has them (see ingest.HEADER_ALIASES)
+_WYSCOUT_PLAYER_MINUTES = ["minutes_played"]
+
+staging_outfield_players = _staging(
+    "staging_outfield_players", _WYSCOUT_PLAYER_TEXT, "date",
+    int_columns=_WYSCOUT_PLAYER_MINUTES + [
+        "attack_buts", "attack_centres_precis", "attack_centres_total", "attack_courses_progressives",
+        "attack_dribbles_reussis", "attack_dribbles_total", "attack_duels_offensifs_gagnes",
+        "attack_duels_offensifs_total", "attack_fautes_subies", "attack_hors_jeu",
+        "attack_passes_decisives", "attack_passes_decisives_tir", "attack_tirs_cadres",
+        "attack_tirs_total", "attack_touches_surface_reparation",
+        "defense_cartons_jaunes", "defense_cartons_rouges", "defense_degagements_total",
+        "defense_duels_aeriens_gagnes", "defense_duels_aeriens_total", "defense_duels_defensifs_gagnes",
+        "defense_duels_defensifs_total", "defense_duels_perdus_gagnes", "defense_duels_perdus_total",
+        "defense_fautes_total", "defense_interceptions_total",
+    ],
+    float_columns=["attack_xg"],
+)
+
+staging_goalkeepers = _staging(
+    "staging_goalkeepers", _WYSCOUT_PLAYER_TEXT, "date",
+    int_columns=_WYSCOUT_PLAYER_MINUTES + [
+        "goalkeeper_but_coup_franc", "goalkeeper_but_coup_franc_courtes",
+        "goalkeeper_but_coup_franc_longues", "goalkeeper_buts_concedes",
+        "goalkeeper_passes_courtes_precises", "goalkeeper_passes_courtes_total",
+        "goalkeeper_passes_longues_precises", "goalkeeper_passes_longues_total", "goalkeeper_place",
+        "goalkeeper_sorties_total", "goalkeeper_tirs_contre_cadres", "goalkeeper_tirs_contre_total",
+    ],
+    float_columns=["goalkeeper_xcg"],
+)
+
+class Source(NamedTuple):
+    """A source CSV feed: its staging table and the column its watermark tracks."""
+    name: str
+    table: Table
+    date_column: str
+
+# Load order matters: matches first so player rows find their dim_match rows
+SOURCES = [
+    Source("wyscout_matches", stg_matches, "date"),
+    Source("wyscout_outfield", staging_outfield_players, "date"),
+    Source("wyscout_goalkeepers", staging_goalkeepers, "date"),
+    Source("training_gps", stg_training_gps, "session_date"),
+    Source("matches_gps", stg_matches_gps, "match_date"),
+]
+
+dim_date = Table(
+    "dim_date", metadata,
+    Column("date_id", Integer, primary_key=True, autoincrement=False),  # yyyymmdd
+    Column("full_date", Date, nullable=False),
+    Column("day", Integer),
+    Column("month", Integer),
+    Column("year", Integer),
+    Column("week", Integer),
+    Column("quarter", Integer),
+    Column("day_name", String(10)),
+    Column("month_name", String(20)),
+)
+
+dim_player = Table(
+    "dim_player", metadata,
+    Column("player_id", Integer, primary_key=True, index=True),
+    Column("player_name_std", String(200), nullable=False),
+    Column("player_name_gps", String(200)),
+    Column("player_name_wyscout", String(200)),
+    Column("position", String(50)),
+    Column("birth_date", Date),
+    Column("height_cm", Integer),
+    Column("weight_kg", Integer),
+    Column("has_gps", Boolean, default=False),
+    Column("has_wyscout", Boolean, default=False),
+    Column("image_url", String(512)),
+)
+
+dim_team = Table(
+    "dim_team", metadata,
+    Column("team_id", Integer, primary_key=True, index=True),
+    Column("team_name_std", String(200), nullable=False),
+    Column("team_name_gps", String(200)),
+    Column("team_name_wyscout", String(200)),
+    Column("created_at", DateTime),
+    Column("image_url", String(512)),
+    Column("has_gps", Boolean, default=False),
+    Column("has_wyscout", Boolean, default=False),
+)
+
+dim_competition = Table(
+    "dim_competition", metadata,
+    Column("competition_id", Integer, primary_key=True),
+    Column("competition_name", String(100)),
+    Column("country", String(50)),
+)
+
+dim_match = Table(
+    "dim_match", metadata,
+    Column("match_id", Integer, primary_key=True, index=True),
+    Column("match_date", Date, nullable=False),
+    Column("competition_id", Integer),
+    Column("home_team_id", Integer, index=True),
+    Column("away_team_id", Integer, index=True),
+    Column("home_score", Integer),
+    Column("away_score", Integer),
+    Column("is_played", Boolean, default=False),
+)
+
+fact_player_gps = Table(
+    "fact_player_gps", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("player_id", Integer, nullable=False),
+    Column("team_id", Integer),
+    Column("session_date", Date, nullable=False),
+    Column("session_type", String(50)),
+    # 1, 2, ... for a player's sessions of one type on the same day
+    Column("session_no", Integer, nullable=False, server_default=text("1")),
+    Column("total_distance", Float),
+    Column("total_duration", Float),
+    Column("total_player_load", Float),
+    Column("sprint_distance", Float),
+    Column("explosive_efforts", Float),
+    Column("accel_decel_efforts", Float),
+    Column("avg_heart_rate", Float),
+    Column("max_heart_rate", Float),
+)
+
+fact_player_wyscout = Table(
+    "fact_player_wyscout", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("player_id", Integer, nullable=False),
+    Column("match_id", Integer, ForeignKey("dim_match.match_id", name="fk_fact_player_wyscout_match_id"),
+           index=True),
+    Column("minutes_played", Integer),
+    Column("goals", Integer, default=0),
+    Column("assists", Integer, default=0),
+    Column("xg", Float),
+    Column("passes_total", Integer),
+    Column("passes_precise", Integer),
+)
+
+fact_wyscout_match = Table(
+    "fact_wyscout_match", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("match_id", Integer),
+    Column("team_id", Integer, index=True),
+    Column("possession_pct", Integer),
+    Column("shots_total", Integer),
+    Column("shots_on_target", Integer),
+    Column("xg", Float),
+)
+
+# High-water mark per source: the next run only stages rows dated after it
+etl_watermark = Table(
+    "etl_watermark", metadata,
+    Column("source", String(50), primary_key=True),
+    Column("watermark", Date),
+    Column("rows_staged", Integer),
+    Column("loaded_at", DateTime),
+)
+
+# Resolved source spellings (normalized) -> dimension member, written by key
+# resolution and the matcher; see matching.py for the statuses
+entity_name_map = Table(
+    "entity_name_map", metadata,
+    Column("entity", String(10), primary_key=True),  # player / team
+    Column("source", String(10), primary_key=True),  # gps / wyscout
+    Column("source_name", String(255), primary_key=True),
+    Column("entity_id", Integer, nullable=False),
+    Column("score", Float),
+    Column("status", String(10), nullable=False),
+    Column("updated_at", DateTime),
+)
+
+# Transactional outbox: the loader and the player service insert one row per change
+# in the same transaction as the data; changes.py relays them in id order
+change_feed = Table(
+    "change_feed", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("topic", String(20), nullable=False),  # gps / match / rollup / player
+    Column("payload", Text, nullable=False),      # JSON: the affected ids and dates
+    Column("created_at", DateTime, nullable=False),
+)
+
+# Workload rollups (see rollups.py): one row per member, grain (week / month /
+# quarter) and period, keyed by the period's first day, which is also a dim_date row
+HR_ZONE_COLUMNS = [f"hr_z{i}_minutes" for i in range(1, 6)]
+WORKLOAD_SUMS = ["total_distance", "total_duration", "total_player_load", "sprint_distance",
+                  "explosive_efforts", "accel_decel_efforts"]
+
+def _rollup(name, key, *columns):
+    return Table(
+        name, metadata,
+        Column(key, Integer, primary_key=True, autoincrement=False),
+        Column("grain", String(10), primary_key=True),
+        Column("period_start", Date, primary_key=True),
+        Column("date_id", Integer, nullable=False),
+        Column("year", Integer),     # ISO year for weeks
+        Column("period", Integer),   # week, month or quarter number
+        *columns,
+        Column("sessions", Integer),
+        Column("training_sessions", Integer),
+        Column("match_sessions", Integer),
+        *[Column(c, Float) for c in WORKLOAD_SUMS],
+        Column("avg_heart_rate", Float),  # duration-weighted
+        Column("max_heart_rate", Float),
+        *[Column(c, Float) for c in HR_ZONE_COLUMNS],
+        Column("refreshed_at", DateTime),
+    )
+
+agg_player_workload = _rollup("agg_player_workload", "player_id", Column("team_id", Integer))
+agg_team_workload = _rollup("agg_team_workload", "team_id", Column("players", Integer))
+
+# Natural keys for ON CONFLICT; created separately so they also land on tables
+# that already existed before the loader first ran
+NATURAL_KEYS = [
+    Index("ux_fact_player_gps_session", fact_player_gps.c.player_id, fact_player_gps.c.session_date,
+          fact_player_gps.c.session_type, fact_player_gps.c.session_no, unique=True),
+    Index("ux_fact_player_wyscout_natural", fact_player_wyscout.c.player_id,
+          fact_player_wyscout.c.match_id, unique=True),
+    Index("ux_fact_wyscout_match_natural", fact_wyscout_match.c.match_id,
+          fact_wyscout_match.c.team_id, unique=True),
+]
+
+# Read-path indexes, one per service query shape; the service models declare the
+# same names. INCLUDE columns (PostgreSQL only, plain composites elsewhere) make
+# the hot reads index-only scans.
+ACCESS_INDEXES = [
+    # match-service list_matches / stream_matches by competition, newest first with a (date, id) keyset
+    Index("ix_dim_match_competition_date", dim_match.c.competition_id, dim_match.c.match_date,
+          dim_match.c.match_id),
+    # list_matches without a competition; analytics' Wyscout totals join on a match_date range
+    Index("ix_dim_match_date", dim_match.c.match_date, dim_match.c.match_id),
+    # match-service get_match_stats: WHERE match_id = ?
+    Index("ix_fact_wyscout_match_match", fact_wyscout_match.c.match_id,
+          postgresql_include=["id", "team_id", "possession_pct", "shots_total", "shots_on_target", "xg"]),
+    # player-service match history (WHERE player_id ORDER BY id DESC, keyset on id) and its export;
+    # analytics' Wyscout totals per player
+    Index("ix_fact_player_wyscout_player_history", fact_player_wyscout.c.player_id, fact_player_wyscout.c.id,
+          postgresql_include=["match_id", "minutes_played", "goals", "assists", "xg",
+                              "passes_total", "passes_precise"]),
+    # analytics' daily GPS features: player_id IN (...) over a session_date window
+    Index("ix_fact_player_gps_player_date_covering", fact_player_gps.c.player_id, fact_player_gps.c.session_date,
+          postgresql_include=["session_type", "total_distance", "total_player_load", "sprint_distance",
+                              "explosive_efforts"]),
+    # team-service get_team_roster and analytics team_roster: team, date window, distinct players
+    Index("ix_fact_player_gps_team_date_player", fact_player_gps.c.team_id, fact_player_gps.c.session_date,
+          fact_player_gps.c.player_id),
+    # scoring active_players and the workload job: every player in a date window
+    Index("ix_fact_player_gps_date_player", fact_player_gps.c.session_date, fact_player_gps.c.player_id),
+    # search_players / list_teams without a query: ORDER BY name LIMIT n
+    Index("ix_dim_player_name_std", dim_player.c.player_name_std),
+    Index("ix_dim_team_name_std", dim_team.c.team_name_std),
+]
+
+# Indexes an ACCESS_INDEXES entry makes redundant (it has the same leading columns)
+SUPERSEDED_INDEXES = {
+    "ix_dim_match_competition_id": "dim_match",
+    "ix_fact_player_wyscout_player_id": "fact_player_wyscout",
+    "ix_fact_player_gps_player_date": "fact_player_gps",
+    "ix_fact_player_gps_team_id": "fact_player_gps",
+}
+
+# Columns added after their table first shipped: create_all leaves existing tables alone
+ADDED_COLUMNS = [fact_player_gps.c.session_no, staging_outfield_players.c.minutes_played,
+                 staging_goalkeepers.c.minutes_played]
+
+# Natural keys replaced by a wider one; they would reject rows the new key allows, so
+# ensure_schema and migrate always drop them
+RETIRED_NATURAL_KEYS = {"ux_fact_player_gps_natural": "fact_player_gps"}
+
+def missing_columns(conn) -> List[Column]:
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    return [column for column in ADDED_COLUMNS if column.table.name in tables
+            and column.name not in {c["name"] for c in inspector.get_columns(column.table.name)}]
+
+def add_column_ddl(column: Column, dialect) -> str:
+    spec = dialect.ddl_compiler(dialect, None).get_column_specification(column)
+    return f"ALTER TABLE {column.table.name} ADD COLUMN {spec}"
+
+# Per-run key maps (source spelling -> surrogate key), filled from the in-memory
+# dictionaries so the star transforms stay set-based joins
+key_metadata = MetaData()
+
+def _key_map(name, *columns):
+    return Table(name, key_metadata, *columns, prefixes=["TEMPORARY"])
+
+player_keys = _key_map("etl_player_keys", Column("source_name", String(255), primary_key=True),
+                       Column("player_id", Integer, nullable=False))
+team_keys = _key_map("etl_team_keys", Column("source_name", String(255), primary_key=True),
+                     Column("team_id", Integer, nullable=False))
+match_keys = _key_map("etl_match_keys", Column("match_date", Date, primary_key=True),
+                      Column("match", String(255), primary_key=True),
+                      Column("match_id", Integer, nullable=False))
+
+def ensure_schema(engine):
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        for column in missing_columns(conn):
+            conn.exec_driver_sql(add_column_ddl(column, conn.dialect))
+        for name in RETIRED_NATURAL_KEYS:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    for index in NATURAL_KEYS + ACCESS_INDEXES:
+        index.create(engine, checkfirst=True)
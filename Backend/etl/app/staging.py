@@ -0,0 +1,77 @@
+# etl/app/staging.py
+"""
+Load prepared rows into the staging tables.
+
+Source files are parsed by .ingest into staging-ordered CSV spools, which are
+appended with COPY on PostgreSQL, or with chunked executemany inserts on other
+databases.
+"""
+import csv
+import io
+import logging
+import tempfile
+from datetime import date
+from typing import Optional, Sequence, Tuple
+
+import pandas as pd
+from sqlalchemy import Table
+
+from .ingest import CSV_BACKEND, INGEST_WORKERS, prepare_files, read_spool
+
+logger = logging.getLogger("etl")
+
+def _copy(conn, table: Table, columns: Sequence[str], fh):
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({column_list}) FROM STDIN WITH (FORMAT csv)", fh)
+    finally:
+        cursor.close()
+
+def copy_frame(conn, table: Table, frame: pd.DataFrame):
+    if frame.empty:
+        return
+    if conn.dialect.name == "postgresql":
+        buf = io.StringIO()
+        frame.to_csv(buf, index=False, header=False, na_rep="", quoting=csv.QUOTE_MINIMAL)
+        buf.seek(0)
+        _copy(conn, table, list(frame.columns), buf)
+    else:
+        records = frame.astype(object).where(frame.notna(), None).to_dict("records")
+        conn.execute(table.insert(), records)
+
+def copy_file(conn, table: Table, spool_path: str):
+    """Append a spool part (all staging columns, in order) without loading it into memory."""
+    if conn.dialect.name == "postgresql":
+        with open(spool_path, newline="") as fh:
+            _copy(conn, table, list(table.c.keys()), fh)
+    else:
+        for chunk in read_spool(spool_path, table):
+            copy_frame(conn, table, chunk)
+
+def truncate(conn, table: Table):
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql(f"TRUNCATE {table.name}")
+    else:
+        conn.execute(table.delete())
+
+def stage_files(conn, table: Table, paths: Sequence[str], date_column: str, since: Optional[date] = None,
+                workers: int = INGEST_WORKERS, backend: str = CSV_BACKEND) -> Tuple[int, Optional[date]]:
+    """
+    Replace the staging table's contents with the rows of `paths` dated after `since`.
+    Returns (rows staged, latest date staged).
+    """
+    truncate(conn, table)
+    staged, latest = 0, None
+    with tempfile.TemporaryDirectory(prefix="etl-spool-") as spool_dir:
+        for result in prepare_files(paths, table, date_column, since, spool_dir, workers, backend):
+            if result.rows_kept:
+                copy_file(conn, table, result.spool_path)
+            staged += result.rows_kept
+            if result.latest is not None:
+                latest = result.latest if latest is None else max(latest, result.latest)
+            logger.info("%s: %d/%d rows kept in %.2fs (%.0f rows/s, peak RSS %.0f MiB)",
+                        result.path, result.rows_kept, result.rows_read, result.seconds,
+                        result.rows_read / result.seconds if result.seconds else 0.0,
+                        result.peak_rss_kb / 1024)
+    return staged, latest
@@ -0,0 +1,466 @@
+# etl/app/synthetic.py
+"""
+Synthetic star-schema data at any scale.
+
+Builds a consistent warehouse from a seed: --competitions leagues of --teams
+teams, each playing a double round-robin per season, squads of --squad players
+with a GPS session six days a week (a match session for the players who
+featured on match days, lighter loads the day before and after), Wyscout lines
+for the players who featured and one team line per side.
+
+Dimensions are small and built in memory. Facts are generated vectorized, one
+team (GPS) or competition (Wyscout) at a time from its own random stream, and
+handed to the sink in chunks of about --chunk-rows rows, so memory stays flat
+at any volume and a seed gives the same rows whatever the chunk size.
+
+Formats:
+  db       the star-schema tables of DATABASE_URL (COPY on PostgreSQL), then the rollups,
+           with change_feed rows for what was written (and replaced) in the same transaction
+  csv      <table>.csv per star-schema table in --out
+  parquet  <table>.parquet per star-schema table in --out
+  sources  source-shaped exports in --out (training_gps.csv, matches_gps.csv,
+           wyscout_matches.csv, wyscout_outfield.csv) to run app.load against
+
+    python -m app.synthetic --seasons 2 --teams 8 --squad 25 --replace
+    python -m app.synthetic --competitions 20 --teams 20 --squad 30 --seasons 5 --format parquet --out /data/dw
+"""
+import argparse
+import logging
+import os
+import time
+from datetime import date
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Table, select, text
+
+from . import changes
+from .export import SEASON_START_MONTH
+from .keys import date_row
+from .rollups import refresh
+from .schema import (dim_competition, dim_date, dim_match, dim_player, dim_team, fact_player_gps,
+                     fact_player_wyscout, fact_wyscout_match, stg_matches, stg_matches_gps, stg_training_gps,
+                     staging_outfield_players)
+from .staging import copy_frame, truncate
+
+logger = logging.getLogger("etl")
+
+CHUNK_ROWS = int(os.getenv("ETL_SYNTHETIC_CHUNK_ROWS", "500000"))
+DB_CHUNK_ROWS = 50000  # rows per COPY / executemany call
+
+POSITIONS = np.array(["GK", "DF", "DF", "DF", "DF", "MF", "MF", "MF", "FW", "FW"], dtype=object)
+MATCHDAY_PLAYERS = 16
+FIRST_ROUND_WEEK = 3  # leagues start on the fourth Saturday of the season
+SEASON_WEEKS = 50
+# training load the day before and the day after a match, relative to a normal session
+MD_MINUS_1, MD_PLUS_1 = 0.6, 0.5
+
+DIMENSIONS = [dim_date, dim_competition, dim_team, dim_player, dim_match]
+FACTS = [fact_player_gps, fact_player_wyscout, fact_wyscout_match]
+TABLES = {table.name: table for table in DIMENSIONS + FACTS}
+
+# independent random streams, so one table's volume never shifts another's values
+_PLAN, _GPS, _WYSCOUT = 0, 1, 2
+
+class Plan(NamedTuple):
+    """What the fact generators share: dimensions, session days, fixtures and lineups."""
+    seed: int
+    squad: int
+    dims: Dict[str, pd.DataFrame]
+    days: np.ndarray          # datetime64[D] session days (every day but Sunday)
+    fixtures: pd.DataFrame    # dim_match columns plus gameweek and the Wyscout match label
+    lineups: np.ndarray       # (matches, 2, players) ids of the players who featured, home side first
+    capacity: np.ndarray      # per-player load multiplier, indexed by player_id - 1
+
+def _weekday(days: np.ndarray) -> np.ndarray:
+    # 1970-01-01 was a Thursday; Monday = 0
+    return (days.astype("int64") + 3) % 7
+
+def _round_robin(teams: int) -> List[List[Tuple[int, int]]]:
+    """Circle-method rounds of one half season (0-based team numbers): every pair meets once."""
+    ids = list(range(teams)) + ([None] if teams % 2 else [])
+    rounds = []
+    for r in range(len(ids) - 1):
+        pairs = [(ids[i], ids[-1 - i]) for i in range(len(ids) // 2)]
+        rounds.append([(a, b) if r % 2 else (b, a) for a, b in pairs if a is not None and b is not None])
+        ids = [ids[0], ids[-1]] + ids[1:-1]
+    return rounds
+
+def _staging_order(table: Table, frame: pd.DataFrame) -> pd.DataFrame:
+    return frame[[c for c in table.c.keys() if c in frame]]
+
+def build_plan(competitions: int = 1, teams: int = 8, squad: int = 25, seasons: int = 2,
+               first_season: int = 2022, seed: int = 7) -> Plan:
+    rounds = _round_robin(teams)
+    rounds += [[(b, a) for a, b in r] for r in rounds]
+    if FIRST_ROUND_WEEK + len(rounds) > SEASON_WEEKS:
+        raise ValueError(f"{teams} teams need {len(rounds)} rounds, more than fit in a season")
+    rng = np.random.default_rng([seed, _PLAN])
+    calendar = np.arange(np.datetime64(date(first_season, SEASON_START_MONTH, 1)),
+                         np.datetime64(date(first_season + seasons, SEASON_START_MONTH, 1)), dtype="datetime64[D]")
+    days = calendar[_weekday(calendar) != 6]
+
+    team_count = competitions * teams
+    team_ids = np.arange(1, team_count + 1)
+    team_frame = pd.DataFrame({
+        "team_id": team_ids,
+        "team_name_std": [f"Team {t:04d}" for t in team_ids],
+        "team_name_gps": [f"TEAM {t:04d} FC" for t in team_ids],
+        "team_name_wyscout": [f"Team {t:04d} FC" for t in team_ids],
+        "has_gps": True, "has_wyscout": True,
+    })
+    competition_ids = np.arange(1, competitions + 1)
+    competition_frame = pd.DataFrame({"competition_id": competition_ids,
+                                      "competition_name": [f"Synthetic League {c}" for c in competition_ids],
+                                      "country": "Synthetic"})
+
+    players = team_count * squad
+    player_ids = np.arange(1, players + 1)
+    birth = np.datetime64(f"{first_season - 20}-01-01") - rng.integers(0, 15 * 365, players).astype("timedelta64[D]")
+    player_frame = pd.DataFrame({
+        "player_id": player_ids,
+        "player_name_std": [f"Player {p:06d}" for p in player_ids],
+        "player_name_gps": [f"PLAYER {p:06d}" for p in player_ids],
+        "player_name_wyscout": [f"Player {p:06d}" for p in player_ids],
+        "position": POSITIONS[np.arange(players) % squad % len(POSITIONS)],
+        "birth_date": birth.astype(object),
+        "height_cm": rng.integers(165, 196, players),
+        "weight_kg": rng.integers(60, 92, players),
+        "has_gps": True, "has_wyscout": True,
+    })
+
+    # fixtures: season-major, then competition, then the round-robin template
+    template = np.array([(i, home, away) for i, pairs in enumerate(rounds) for home, away in pairs])
+    repeats = seasons * competitions
+    season_index = np.repeat(np.arange(seasons), competitions * len(template))
+    competition_index = np.tile(np.repeat(np.arange(competitions), len(template)), seasons)
+    gameweek = np.tile(template[:, 0], repeats)
+    season_start = np.array([np.datetime64(date(first_season + s, SEASON_START_MONTH, 1)) for s in range(seasons)])
+    first_saturday = season_start + ((5 - _weekday(season_start)) % 7).astype("timedelta64[D]")
+    match_dates = first_saturday[season_index] + ((FIRST_ROUND_WEEK + gameweek) * 7).astype("timedelta64[D]")
+    matches = len(gameweek)
+    fixtures = pd.DataFrame({
+        "match_id": np.arange(1, matches + 1),
+        "match_date": match_dates.astype(object),
+        "competition_id": competition_index + 1,
+        "home_team_id": competition_index * teams + np.tile(template[:, 1], repeats) + 1,
+        "away_team_id": competition_index * teams + np.tile(template[:, 2], repeats) + 1,
+        "home_score": rng.poisson(1.5, matches),
+        "away_score": rng.poisson(1.1, matches),
+        "is_played": True,
+        "gameweek": gameweek + 1,
+    })
+    wyscout_names = team_frame["team_name_wyscout"].to_numpy()
+    fixtures["label"] = (wyscout_names[fixtures["home_team_id"] - 1] + " - " + wyscout_names[fixtures["away_team_id"] - 1]
+                         + " " + fixtures["home_score"].astype(str) + ":" + fixtures["away_score"].astype(str))
+
+    sides = np.stack([fixtures["home_team_id"].to_numpy(), fixtures["away_team_id"].to_numpy()], axis=1)
+    picks = np.argsort(rng.random((matches, 2, squad)), axis=2)[:, :, :min(MATCHDAY_PLAYERS, squad)]
+    lineups = (sides[:, :, None] - 1) * squad + 1 + picks
+
+    dims = {dim_date.name: pd.DataFrame([date_row(d) for d in calendar.astype(object)]),
+            dim_competition.name: competition_frame, dim_team.name: team_frame, dim_player.name: player_frame,
+            dim_match.name: _staging_order(dim_match, fixtures)}
+    return Plan(seed, squad, dims, days, fixtures, lineups, rng.normal(1.0, 0.08, players).clip(0.75, 1.25))
+
+def _gps_team(plan: Plan, team_id: int, featured: np.ndarray) -> Dict[str, np.ndarray]:
+    """One team's GPS rows: every squad member on every session day."""
+    rng = np.random.default_rng([plan.seed, _GPS, team_id])
+    fixtures = plan.fixtures
+    played = (fixtures["home_team_id"] == team_id) | (fixtures["away_team_id"] == team_id)
+    match_days = np.sort(fixtures.loc[played, "match_date"].to_numpy().astype("datetime64[D]").astype("int64"))
+    day = plan.days.astype("int64")
+    if len(match_days):
+        after = np.minimum(np.searchsorted(match_days, day), len(match_days) - 1)
+        before = np.maximum(np.searchsorted(match_days, day, side="right") - 1, 0)
+        cycle = np.where(match_days[after] - day == 1, MD_MINUS_1,
+                         np.where(day - match_days[before] == 1, MD_PLUS_1, 1.0))
+    else:
+        cycle = np.ones(len(day))
+
+    n_days = len(day)
+    first_player = (team_id - 1) * plan.squad + 1
+    players = np.repeat(np.arange(first_player, first_player + plan.squad), n_days)
+    # featured is sorted: only this squad's slice of it can match
+    own = featured[np.searchsorted(featured, first_player * n_days):
+                   np.searchsorted(featured, (first_player + plan.squad) * n_days)]
+    is_match = np.isin(players * n_days + np.tile(np.arange(n_days), plan.squad), own)
+    n = len(players)
+    intensity = (plan.capacity[players - 1] * np.where(is_match, 1.6, np.tile(cycle, plan.squad))
+                 * rng.normal(1.0, 0.15, n).clip(0.4, 1.8))
+    return {
+        "player_id": players,
+        "team_id": np.full(n, team_id),
+        "session_date": np.tile(plan.days.astype(object), plan.squad),
+        "session_type": np.where(is_match, "match", "training").astype(object),
+        "session_no": np.ones(n, dtype="int64"),
+        "total_distance": np.round(5600 * intensity, 1),
+        "total_duration": np.round(np.where(is_match, 95.0, 75.0) * rng.normal(1.0, 0.1, n).clip(0.5, 1.3), 1),
+        "total_player_load": np.round(520 * intensity, 1),
+        "sprint_distance": np.round(260 * intensity ** 2, 1),
+        "explosive_efforts": np.round(28 * intensity),
+        "accel_decel_efforts": np.round(65 * intensity),
+        "avg_heart_rate": np.round(138 + 14 * (intensity - 1) + rng.normal(0, 5, n), 1),
+        "max_heart_rate": np.round(182 + 8 * (intensity - 1) + rng.normal(0, 4, n), 1),
+    }
+
+def gps_chunks(plan: Plan, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """fact_player_gps in chunks of whole teams; ids follow team order."""
+    n_days = len(plan.days)
+    day_of_match = np.searchsorted(plan.days, plan.fixtures["match_date"].to_numpy().astype("datetime64[D]"))
+    # player_id * n_days + day index of every match appearance
+    featured = np.unique(plan.lineups * n_days + day_of_match[:, None, None])
+    rows_per_team = plan.squad * n_days
+    teams_per_chunk = max(1, chunk_rows // rows_per_team)
+    team_count = len(plan.dims[dim_team.name])
+    for first in range(1, team_count + 1, teams_per_chunk):
+        blocks = [_gps_team(plan, t, featured) for t in range(first, min(first + teams_per_chunk, team_count + 1))]
+        frame = pd.DataFrame({c: np.concatenate([b[c] for b in blocks]) for c in blocks[0]})
+        offset = (first - 1) * rows_per_team
+        frame.insert(0, "id", np.arange(offset + 1, offset + len(frame) + 1))
+        yield frame
+
+def wyscout_chunks(plan: Plan) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """(fact_player_wyscout, fact_wyscout_match) rows per competition."""
+    fixtures = plan.fixtures
+    player_offset = team_offset = 0
+    for competition_id in plan.dims[dim_competition.name]["competition_id"]:
+        rng = np.random.default_rng([plan.seed, _WYSCOUT, competition_id])
+        mask = (fixtures["competition_id"] == competition_id).to_numpy()
+        match_ids = fixtures["match_id"].to_numpy()[mask]
+        lineups = plan.lineups[mask]
+        m = lineups.size
+        players = pd.DataFrame({
+            "id": np.arange(player_offset + 1, player_offset + m + 1),
+            "player_id": lineups.reshape(-1),
+            "match_id": np.repeat(match_ids, lineups.shape[1] * lineups.shape[2]),
+            "minutes_played": np.where(rng.random(m) < 0.7, 90, rng.integers(10, 90, m)),
+            "goals": rng.poisson(0.12, m),
+            "assists": rng.poisson(0.09, m),
+            "xg": np.round(rng.gamma(0.6, 0.18, m), 2),
+            "passes_total": rng.integers(10, 80, m),
+        })
+        players["passes_precise"] = np.round(players["passes_total"] * rng.uniform(0.6, 0.95, m)).astype("int64")
+        player_offset += m
+
+        k = 2 * len(match_ids)
+        possession = rng.integers(35, 66, len(match_ids))
+        shots = rng.integers(4, 22, k)
+        teams = pd.DataFrame({
+            "id": np.arange(team_offset + 1, team_offset + k + 1),
+            "match_id": np.repeat(match_ids, 2),
+            "team_id": np.stack([fixtures["home_team_id"].to_numpy()[mask],
+                                 fixtures["away_team_id"].to_numpy()[mask]], axis=1).reshape(-1),
+            "possession_pct": np.stack([possession, 100 - possession], axis=1).reshape(-1),
+            "shots_total": shots,
+            "shots_on_target": (shots * rng.uniform(0.2, 0.6, k)).astype("int64"),
+            "xg": np.round(rng.gamma(2.0, 0.6, k), 2),
+        })
+        team_offset += k
+        yield players, teams
+
+def generate(plan: Plan, chunk_rows: int = CHUNK_ROWS) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """(table name, rows) for every star-schema table, dimensions first."""
+    for table in DIMENSIONS:
+        yield table.name, plan.dims[table.name]
+    for frame in gps_chunks(plan, chunk_rows):
+        yield fact_player_gps.name, frame
+    for players, teams in wyscout_chunks(plan):
+        yield fact_player_wyscout.name, players
+        yield fact_wyscout_match.name, teams
+
+def to_sources(plan: Plan, name: str, frame: pd.DataFrame) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """The same facts as the source exports app.load ingests; the loader derives the dimensions from names."""
+    players, teams, fixtures = plan.dims[dim_player.name], plan.dims[dim_team.name], plan.fixtures
+    competitions = plan.dims[dim_competition.name].set_index("competition_id")["competition_name"]
+    gps_names, wyscout_names = teams["team_name_gps"].to_numpy(), teams["team_name_wyscout"].to_numpy()
+    if name == fact_player_gps.name:
+        sessions = frame.assign(player_name=players["player_name_gps"].to_numpy()[frame["player_id"] - 1],
+                                team_name=gps_names[frame["team_id"] - 1])
+        training = sessions[sessions["session_type"] == "training"].assign(report_type="Session",
+                                                                           type_session="Training")
+        yield "training_gps", _staging_order(stg_training_gps, training)
+        columns = ["session_date", "team_id", "opponent_id", "gameweek"]
+        sides = pd.concat([fixtures[["match_date", "home_team_id", "away_team_id", "gameweek"]].set_axis(columns, axis=1),
+                           fixtures[["match_date", "away_team_id", "home_team_id", "gameweek"]].set_axis(columns, axis=1)])
+        played = sessions[sessions["session_type"] == "match"].merge(sides, on=["session_date", "team_id"])
+        played = played.assign(match_date=played["session_date"], type_session="Match",
+                               opponent=gps_names[played["opponent_id"] - 1])
+        yield "matches_gps", _staging_order(stg_matches_gps, played)
+    elif name == fact_player_wyscout.name:
+        lines = frame.merge(fixtures[["match_id", "match_date", "label", "competition_id"]], on="match_id")
+        yield "wyscout_outfield", _staging_order(staging_outfield_players, pd.DataFrame({
+            "team_name": wyscout_names[(lines["player_id"] - 1) // plan.squad],
+            "match": lines["label"],
+            "competition": competitions.reindex(lines["competition_id"]).to_numpy(),
+            "player": players["player_name_wyscout"].to_numpy()[lines["player_id"] - 1],
+            "periode": "Match",
+            "segment": "Total",
+            "date": lines["match_date"],
+            "minutes_played": lines["minutes_played"],
+            "attack_buts": lines["goals"],
+            "attack_passes_decisives": lines["assists"],
+            "attack_xg": lines["xg"],
+        }))
+    elif name == fact_wyscout_match.name:
+        lines = frame.merge(fixtures, on="match_id")
+        opponent = np.where(lines["team_id"] == lines["home_team_id"], lines["away_team_id"], lines["home_team_id"])
+        yield "wyscout_matches", _staging_order(stg_matches, pd.DataFrame({
+            "team_name": wyscout_names[lines["team_id"] - 1],
+            "match": lines["label"],
+            "score": lines["home_score"].astype(str) + ":" + lines["away_score"].astype(str),
+            "competition": competitions.reindex(lines["competition_id"]).to_numpy(),
+            "equipe": wyscout_names[lines["team_id"] - 1],
+            "adversaire": wyscout_names[opponent - 1],
+            "date": lines["match_date"],
+            "general_possession_pct": lines["possession_pct"],
+            "attack_tirs": lines["shots_total"],
+            "attack_tirs_cadres": lines["shots_on_target"],
+            "attack_xg": lines["xg"],
+        }))
+
+class CsvSink:
+    """Appends each chunk to <out>/<name>.csv, with the header on the first one."""
+
+    def __init__(self, out: str):
+        self.out = out
+        self._started = set()
+        os.makedirs(out, exist_ok=True)
+
+    def write(self, name: str, frame: pd.DataFrame):
+        first = name not in self._started
+        frame.to_csv(os.path.join(self.out, f"{name}.csv"), mode="w" if first else "a", header=first, index=False)
+        self._started.add(name)
+
+    def close(self):
+        pass
+
+class ParquetSink:
+    """One row group per chunk in <out>/<table>.parquet, typed like the Parquet export."""
+
+    def __init__(self, out: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from .export import _arrow_type
+        self._pa, self._pq, self._arrow_type = pa, pq, _arrow_type
+        self.out = out
+        self._writers = {}
+        os.makedirs(out, exist_ok=True)
+
+    def write(self, name: str, frame: pd.DataFrame):
+        writer = self._writers.get(name)
+        if writer is None:
+            schema = self._pa.schema([(c.name, self._arrow_type(c)) for c in TABLES[name].c if c.name in frame])
+            writer = self._writers[name] = self._pq.ParquetWriter(os.path.join(self.out, f"{name}.parquet"), schema)
+        writer.write_table(self._pa.Table.from_pandas(frame[writer.schema.names], schema=writer.schema,
+                                                      preserve_index=False))
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+
+class DatabaseSink:
+    """
+    COPY (PostgreSQL) or chunked inserts into the star-schema tables. close()
+    refreshes the workload rollups (with rollups set), then queues the change
+    feed rows last, right before the caller commits.
+    """
+
+    def __init__(self, conn, replace: bool = False, rollups: bool = False):
+        self.conn = conn
+        self.rollups = rollups
+        # what close() reports to the change feed
+        self.players, self.gps_players, self.gps_teams = set(), set(), set()
+        self.matches, self.match_players = set(), set()
+        self.days: List[date] = []
+        if replace:
+            # everything cached about the rows being replaced goes stale too
+            self.players |= set(conn.execute(select(dim_player.c.player_id)).scalars())
+            self.gps_players |= self.players
+            self.match_players |= self.players
+            self.matches |= set(conn.execute(select(dim_match.c.match_id)).scalars())
+        if replace and conn.dialect.name == "postgresql":
+            # one statement: the facts reference the dimensions, which TRUNCATE refuses table by table
+            conn.exec_driver_sql("TRUNCATE " + ", ".join(table.name for table in DIMENSIONS + FACTS))
+        elif replace:
+            for table in reversed(DIMENSIONS + FACTS):
+                truncate(conn, table)
+
+    def write(self, name: str, frame: pd.DataFrame):
+        table = TABLES[name]
+        frame = _staging_order(table, frame)
+        for start in range(0, len(frame), DB_CHUNK_ROWS):
+            copy_frame(self.conn, table, frame.iloc[start:start + DB_CHUNK_ROWS])
+        if name == dim_player.name:
+            self.players.update(frame["player_id"].tolist())
+        elif name == fact_player_gps.name:
+            self.gps_players.update(frame["player_id"].unique().tolist())
+            self.gps_teams.update(frame["team_id"].dropna().unique().tolist())
+            self.days += [frame["session_date"].min(), frame["session_date"].max()]
+        elif name == fact_player_wyscout.name:
+            self.match_players.update(frame["player_id"].unique().tolist())
+            self.matches.update(frame["match_id"].unique().tolist())
+        elif name in (dim_match.name, fact_wyscout_match.name):
+            self.matches.update(frame["match_id"].unique().tolist())
+
+    def close(self):
+        if self.conn.dialect.name == "postgresql":
+            # ids were written explicitly: move the serial sequences past them for later inserts
+            for table in DIMENSIONS + FACTS:
+                key = next(iter(table.primary_key.columns)).name
+                self.conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table.name}', '{key}'), "
+                                       f"(SELECT MAX({key}) FROM {table.name}))"))
+        if self.rollups:
+            refresh(self.conn)
+        if self.players:
+            changes.record(self.conn, "player", player_ids=sorted(self.players))
+        if self.gps_players:
+            changes.record(self.conn, "gps", player_ids=sorted(self.gps_players), team_ids=sorted(self.gps_teams),
+                           **{"from": min(self.days, default=None), "to": max(self.days, default=None)})
+        if self.matches:
+            changes.record(self.conn, "match", match_ids=sorted(self.matches), player_ids=sorted(self.match_players))
+        if self.rollups:
+            changes.record(self.conn, "rollup", team_ids=sorted(self.gps_teams), **{"from": None})
+
+def write(plan: Plan, sink, sources: bool = False, chunk_rows: int = CHUNK_ROWS) -> Dict[str, int]:
+    """Stream every table (or source export) through `sink`; returns rows written per name."""
+    counts: Dict[str, int] = {}
+    for name, frame in generate(plan, chunk_rows):
+        for out_name, out in (to_sources(plan, name, frame) if sources else [(name, frame)]):
+            sink.write(out_name, out)
+            counts[out_name] = counts.get(out_name, 0) + len(out)
+    sink.close()
+    return counts
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Generate a synthetic multi-season warehouse")
+    parser.add_argument("--competitions", type=int, default=1)
+    parser.add_argument("--teams", type=int, default=8, help="teams per competition")
+    parser.add_argument("--squad", type=int, default=25)
+    parser.add_argument("--seasons", type=int, default=2)
+    parser.add_argument("--first-season", type=int, default=2022)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--format", choices=["db", "csv", "parquet", "sources"], default="db")
+    parser.add_argument("--out", help="output directory for csv, parquet and sources")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--replace", action="store_true", help="db: clear the star-schema tables first")
+    parser.add_argument("--no-rollups", action="store_true", help="db: skip the workload rollup refresh")
+    args = parser.parse_args()
+    if args.format != "db" and not args.out:
+        parser.error("--out is required for csv, parquet and sources")
+
+    started = time.perf_counter()
+    plan = build_plan(args.competitions, args.teams, args.squad, args.seasons, args.first_season, args.seed)
+    if args.format == "db":
+        from .db import engine
+        from .schema import ensure_schema
+        ensure_schema(engine)
+        with engine.begin() as conn:
+            counts = write(plan, DatabaseSink(conn, args.replace, rollups=not args.no_rollups),
+                           chunk_rows=args.chunk_rows)
+    else:
+        sink = ParquetSink(args.out) if args.format == "parquet" else CsvSink(args.out)
+        counts = write(plan, sink, sources=args.format == "sources", chunk_rows=args.chunk_rows)
+    logger.info("Wrote %s in %.1fs", counts, time.perf_counter() - started)
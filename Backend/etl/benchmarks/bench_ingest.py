@@ -0,0 +1,99 @@
+# etl/benchmarks/bench_ingest.py
+"""
+Ingestion throughput and memory per source.
+
+Writes synthetic exports for every staging source (the projected columns plus
+--extra-columns unused French-named columns, like the raw Wyscout files), then
+runs the ingest stage over them and reports rows/s and peak RSS per source and
+CSV backend. No database is needed: only parsing, typing, filtering and spooling
+are measured.
+
+    cd Backend/etl
+    python -m benchmarks.bench_ingest --rows 200000 --files 4 --workers 1 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Date, Float, Integer
+
+from app import ingest
+from app.schema import SOURCES
+
+_PERIODES = np.array(["1ère mi-temps", "2ème mi-temps", "Match", ""], dtype=object)
+
+def _synthetic_file(path: str, source, rows: int, extra_columns: int, seed: int):
+    rng = np.random.default_rng(seed)
+    data: Dict[str, object] = {}
+    for column in source.table.c:
+        if isinstance(column.type, Date):
+            days = rng.integers(0, 365, rows).astype("timedelta64[D]")
+            data[column.name] = (np.datetime64("2024-01-01") + days).astype(str)
+        elif isinstance(column.type, Integer):
+            data[column.name] = rng.integers(0, 10, rows)
+        elif isinstance(column.type, Float):
+            data[column.name] = np.round(rng.random(rows) * 100, 2)
+        elif column.name == "periode":
+            data[column.name] = _PERIODES[rng.integers(0, len(_PERIODES), rows)]
+        elif column.name == "match":
+            data[column.name] = "Equipe A - Equipe B 1:0"
+        else:
+            data[column.name] = np.char.add(f"{column.name}_", rng.integers(0, 500, rows).astype(str))
+    for i in range(extra_columns):
+        data[f"indicateur_supplementaire_{i}"] = np.round(rng.random(rows), 3)
+    # shuffle column order like a real export
+    frame = pd.DataFrame(data)
+    frame[rng.permutation(frame.columns)].to_csv(path, index=False)
+
+def bench_source(source_name: str, paths: List[str], workers: int, backend: str) -> Dict[str, object]:
+    source = next(s for s in SOURCES if s.name == source_name)
+    with tempfile.TemporaryDirectory(prefix="bench-spool-") as spool_dir:
+        t0 = time.perf_counter()
+        results = list(ingest.prepare_files(paths, source.table, source.date_column, None, spool_dir,
+                                            workers, backend))
+        elapsed = time.perf_counter() - t0
+    rows = sum(r.rows_read for r in results)
+    # pool workers report their own peak; single-worker runs happen in this (fresh) process
+    peak_kb = max([r.peak_rss_kb for r in results] + [ingest.peak_rss_kb()])
+    return {"source": source.name, "backend": backend, "workers": workers, "files": len(paths), "rows": rows,
+            "seconds": elapsed, "rows_per_s": rows / elapsed if elapsed else 0.0, "peak_rss_mib": peak_kb / 1024}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="rows per file")
+    parser.add_argument("--files", type=int, default=4, help="files per source")
+    parser.add_argument("--extra-columns", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, ingest.INGEST_WORKERS])
+    parser.add_argument("--backends", nargs="+", default=["arrow", "pandas"])
+    parser.add_argument("--sources", nargs="+", default=[s.name for s in SOURCES])
+    args = parser.parse_args()
+
+    backends = [b for b in args.backends if b != "arrow" or ingest.pacsv is not None]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-ingest-") as data_dir:
+        for source in SOURCES:
+            if source.name not in args.sources:
+                continue
+            paths = []
+            for i in range(args.files):
+                path = os.path.join(data_dir, f"{source.name}-{i}.csv")
+                _synthetic_file(path, source, args.rows, args.extra_columns, seed=i)
+                paths.append(path)
+            size_mib = sum(os.path.getsize(p) for p in paths) / 2 ** 20
+            print(f"{source.name}: {args.files} x {args.rows} rows, {size_mib:.0f} MiB")
+            for backend in backends:
+                for workers in dict.fromkeys(args.workers):
+                    # fresh process per run so peak RSS is not inherited from earlier runs
+                    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as runner:
+                        results.append(runner.submit(bench_source, source.name, paths, workers, backend).result())
+
+    print(pd.DataFrame(results).to_string(index=False, float_format=lambda v: f"{v:,.1f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# graphql-gateway/caches.py
+"""
+In-process caches for the gateway.
+
+Whole responses are cached per (auth token, document, operation, variables) for
+a short TTL, so a dashboard polling the same query re-executes nothing. The key
+holds a hash of the token, never the token itself, and one caller's cached
+answers are never served to another. The TTL of a response is the smallest TTL
+among the root fields it selects (FIELD_TTLS, default RESPONSE_TTL); 0 disables
+caching for that response.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+RESPONSE_TTL = float(os.getenv("RESPONSE_TTL", "30"))
+# camelCase root field -> TTL in seconds; live checks must not be served stale
+FIELD_TTLS = {"playerServiceStatus": 0.0, "hello": 3600.0}
+
+_MISSING = object()
+
+class LRUCache:
+    """Size-bounded LRU; entries optionally expire after a per-entry TTL."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires, value = entry
+        if expires is not None and expires < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl if ttl is not None else None, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+responses = LRUCache(RESPONSE_CACHE_SIZE)
+stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+def response_ttl(root_fields: Iterable[str]) -> float:
+    return min((FIELD_TTLS.get(name, RESPONSE_TTL) for name in root_fields), default=RESPONSE_TTL)
+
+def response_key(token: str, document_hash: str, operation_name: Optional[str],
+                 variables: Optional[dict]) -> str:
+    raw = json.dumps([token, document_hash, operation_name, variables or {}], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def get_response(key: str) -> Any:
+    value = responses.get(key, _MISSING)
+    stats["responses"]["misses" if value is _MISSING else "hits"] += 1
+    return None if value is _MISSING else value
+
+def set_response(key: str, value: Any, ttl: float):
+    if ttl > 0:
+        responses.set(key, value, ttl)
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    out = {}
+    for name, counters in stats.items():
+        lookups = counters["hits"] + counters["misses"]
+        out[name] = {**counters, "hit_ratio": counters["hits"] / lookups if lookups else 0.0}
+    return out
@@ -0,0 +1,116 @@
+# graphql-gateway/documents.py
+"""
+Persisted queries and the parsed-document cache.
+
+Queries are identified by the sha256 of their text. A parsed and validated
+document is cached by that hash, so a repeated query skips parsing and
+validation entirely.
+
+Clients may send only the hash, following the Apollo automatic persisted
+queries protocol (extensions.persistedQuery.sha256Hash): an unknown hash is
+answered with PERSISTED_QUERY_NOT_FOUND, and the client retries once with the
+full text, which registers it. Queries listed in PERSISTED_QUERIES_FILE (a JSON
+object of hash -> query) are always known; with PERSISTED_QUERIES_ONLY=1 they
+are the only queries accepted.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from graphql import DocumentNode, GraphQLError, GraphQLSchema, parse, validate
+
+from caches import LRUCache, stats
+
+logger = logging.getLogger("graphql-gateway")
+
+DOCUMENT_CACHE_SIZE = int(os.getenv("DOCUMENT_CACHE_SIZE", "1000"))
+PERSISTED_QUERIES_FILE = os.getenv("PERSISTED_QUERIES_FILE", "")
+PERSISTED_QUERIES_ONLY = os.getenv("PERSISTED_QUERIES_ONLY", "0") == "1"
+
+class QueryError(Exception):
+    """The request does not name a usable query; code goes to the error's extensions."""
+
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+class InvalidDocument(Exception):
+    """The query does not parse or validate against the schema."""
+
+    def __init__(self, errors: List[GraphQLError]):
+        super().__init__(errors)
+        self.errors = errors
+
+class Document:
+    def __init__(self, query_hash: str, query: str, ast: DocumentNode):
+        self.hash = query_hash
+        self.query = query
+        self.ast = ast
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode()).hexdigest()
+
+def _load_persisted() -> Dict[str, str]:
+    if not PERSISTED_QUERIES_FILE:
+        return {}
+    with open(PERSISTED_QUERIES_FILE) as f:
+        queries = json.load(f)
+    for h, query in queries.items():
+        if query_hash(query) != h:
+            raise ValueError(f"{PERSISTED_QUERIES_FILE}: hash {h} does not match its query")
+    logger.info(f"Loaded {len(queries)} persisted queries")
+    return queries
+
+persisted: Dict[str, str] = _load_persisted()
+parsed = LRUCache(DOCUMENT_CACHE_SIZE)
+
+def _requested_hash(extensions: Optional[dict]) -> Optional[str]:
+    persisted_query = (extensions or {}).get("persistedQuery")
+    if not isinstance(persisted_query, dict):
+        return None
+    if persisted_query.get("version", 1) != 1:
+        raise QueryError("Unsupported persisted query version", "PERSISTED_QUERY_NOT_SUPPORTED")
+    return persisted_query.get("sha256Hash")
+
+def resolve(schema: GraphQLSchema, query: Optional[str], extensions: Optional[dict]) -> Document:
+    """
+    Parsed, validated document for a request's query text and/or persisted-query hash.
+    Raises QueryError for unknown or mismatched hashes and InvalidDocument when the
+    query does not parse or validate.
+    """
+    h = _requested_hash(extensions)
+    if query is None:
+        if h is None:
+            raise QueryError("Missing query", "BAD_REQUEST")
+        document = parsed.get(h)
+        if document is not None:
+            stats["documents"]["hits"] += 1
+            return document
+        query = persisted.get(h)
+        if query is None:
+            raise QueryError("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+    else:
+        actual = query_hash(query)
+        if h is not None and h != actual:
+            raise QueryError("provided sha does not match query", "BAD_REQUEST")
+        h = actual
+        document = parsed.get(h)
+        if document is not None:
+            stats["documents"]["hits"] += 1
+            return document
+    if PERSISTED_QUERIES_ONLY and h not in persisted:
+        raise QueryError("Only persisted queries are accepted", "PERSISTED_QUERY_REQUIRED")
+
+    stats["documents"]["misses"] += 1
+    try:
+        ast = parse(query)
+    except GraphQLError as e:
+        raise InvalidDocument([e])
+    errors = validate(schema, ast)
+    if errors:
+        raise InvalidDocument(errors)
+    document = Document(h, query, ast)
+    parsed.set(h, document)
+    return document
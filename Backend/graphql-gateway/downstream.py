@@ -0,0 +1,71 @@
+# graphql-gateway/downstream.py
+"""
+Shared async HTTP client for the REST microservices.
+
+One pooled httpx.AsyncClient per gateway process: connections are kept alive
+and reused across requests, and HTTP/2 is negotiated where a service offers it
+(TLS with ALPN), multiplexing concurrent calls over one connection.
+"""
+import os
+import time
+from typing import Any, Optional
+
+import httpx
+from prometheus_client import Histogram
+
+from common.metrics import LATENCY_BUCKETS
+
+PLAYER_SERVICE_URL = os.getenv("PLAYER_SERVICE_URL", "http://player-service")
+MATCH_SERVICE_URL = os.getenv("MATCH_SERVICE_URL", "http://match-service")
+TEAM_SERVICE_URL = os.getenv("TEAM_SERVICE_URL", "http://team-service")
+
+MAX_CONNECTIONS = int(os.getenv("DOWNSTREAM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("DOWNSTREAM_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("DOWNSTREAM_KEEPALIVE_EXPIRY", "30"))
+TIMEOUT = float(os.getenv("DOWNSTREAM_TIMEOUT", "5"))
+HTTP2 = os.getenv("DOWNSTREAM_HTTP2", "1") == "1"
+
+DOWNSTREAM_LATENCY = Histogram("downstream_request_duration_seconds", "Gateway -> service call latency",
+                               ["service", "status"], buckets=LATENCY_BUCKETS)
+
+class DownstreamError(Exception):
+    """A service answered with an error (other than 404) or could not be reached."""
+
+_client: Optional[httpx.AsyncClient] = None
+
+def start():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=httpx.Timeout(TIMEOUT),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE,
+                                keepalive_expiry=KEEPALIVE_EXPIRY),
+        )
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def client() -> httpx.AsyncClient:
+    if _client is None:
+        start()
+    return _client
+
+async def get_json(url: str, token: Optional[str] = None, params: Optional[dict] = None) -> Any:
+    """GET a JSON document; None on 404."""
+    headers = {"Authorization": token} if token else None
+    start = time.perf_counter()
+    try:
+        response = await client().get(url, params=params, headers=headers)
+    except httpx.HTTPError as e:
+        DOWNSTREAM_LATENCY.labels(httpx.URL(url).host, "error").observe(time.perf_counter() - start)
+        raise DownstreamError(f"{url} unreachable: {e}") from e
+    DOWNSTREAM_LATENCY.labels(response.url.host, str(response.status_code)).observe(time.perf_counter() - start)
+    if response.status_code == 404:
+        return None
+    if response.status_code >= 400:
+        raise DownstreamError(f"{url} returned {response.status_code}")
+    return response.json()
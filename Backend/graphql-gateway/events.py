@@ -0,0 +1,205 @@
+# graphql-gateway/events.py
+"""
+Live change events for dashboards, as server-sent events.
+
+The ETL's change dispatcher (etl/app/changes.py) appends every committed
+change (new GPS sessions, match results, refreshed rollups, new players) to
+the CHANGE_STREAM Redis stream, with its change_feed row id as entry id, after
+it has invalidated the affected cache entries. Per gateway process one task
+follows the stream and fans each entry out to the connected clients; it also
+empties the response cache, so a refetch prompted by an event never gets an
+answer cached before the change.
+
+GET /events relays the entries with `id:` set to the row id, or to
+"<row id>-<n>" for a change the dispatcher relayed late (it committed after
+changes with higher ids). A browser EventSource reconnects with Last-Event-ID
+and is first replayed what it missed from the stream; a client further behind
+than the stream reaches gets a `reset` event (refetch everything). A client
+too slow to keep up with its queue is disconnected and catches up the same
+way on reconnect.
+
+EventSource cannot send an Authorization header, and a token in the URL ends up
+in access logs. A dashboard therefore first POSTs to /events/session with its
+bearer token and gets an HttpOnly cookie scoped to /events: a gateway-signed
+session that lasts EVENTS_SESSION_SECONDS at most and never outlives the bearer
+token. It then opens EventSource(url, {withCredentials: true}).
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from typing import AsyncIterator, List, NamedTuple, Optional, Set, Tuple
+
+import jwt
+import redis.asyncio as aioredis
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+
+import caches
+
+logger = logging.getLogger("graphql-gateway")
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+CHANGE_STREAM = os.getenv("CHANGE_STREAM", "changes")
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+RETRY_AFTER_SECONDS = 1.0
+RECONNECT_MS = 3000  # EventSource retry delay
+
+SESSION_COOKIE = "events_session"
+EVENTS_SESSION_SECONDS = int(os.getenv("EVENTS_SESSION_SECONDS", "3600"))
+EVENTS_COOKIE_SECURE = os.getenv("EVENTS_COOKIE_SECURE", "true").lower() == "true"
+EVENTS_COOKIE_SAMESITE = os.getenv("EVENTS_COOKIE_SAMESITE", "lax")
+_SESSION_AUDIENCE = "gateway-events"
+# shared by every replica behind the same load balancer; a per-process secret only suits a single one
+_session_secret = os.getenv("EVENTS_SESSION_SECRET") or secrets.token_urlsafe(32)
+if not os.getenv("EVENTS_SESSION_SECRET"):
+    logger.warning("EVENTS_SESSION_SECRET is not set: /events sessions only work on the replica that issued them")
+
+def issue_session(claims: dict) -> Tuple[str, int]:
+    """(cookie value, max age in seconds) for a verified bearer token's claims."""
+    now = int(time.time())
+    expires = now + EVENTS_SESSION_SECONDS
+    if claims.get("exp"):
+        expires = min(expires, int(claims["exp"]))
+    if expires <= now:
+        raise HTTPException(status_code=401, detail="Token expired")
+    value = jwt.encode({"sub": claims.get("sub"), "aud": _SESSION_AUDIENCE, "exp": expires},
+                       _session_secret, algorithm="HS256")
+    return value, expires - now
+
+def verify_session(value: Optional[str]) -> dict:
+    if not value:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    try:
+        return jwt.decode(value, _session_secret, algorithms=["HS256"], audience=_SESSION_AUDIENCE)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid or expired events session")
+
+def parse_event_id(value: str) -> Tuple[int, int]:
+    """(row id, late sequence) of a stream entry id or Last-Event-ID: "12" or "12-3"."""
+    row_id, dash, seq = value.partition("-")
+    return int(row_id), int(seq) if dash else 0
+
+class Event(NamedTuple):
+    id: Tuple[int, int]  # parse_event_id of the stream entry id
+    topic: str
+    payload: str  # JSON
+
+    @classmethod
+    def from_entry(cls, entry_id: str, fields: dict) -> "Event":
+        return cls(parse_event_id(entry_id), fields.get("topic", "change"), fields.get("payload", "{}"))
+
+    def format(self) -> str:
+        row_id, seq = self.id
+        return f"id: {row_id if seq == 0 else f'{row_id}-{seq}'}\nevent: {self.topic}\ndata: {self.payload}\n\n"
+
+_RESET = f"event: reset\ndata: {json.dumps({'reason': 'missed events'})}\n\n"
+_closed = object()  # queued to a client that fell behind
+
+class Broadcaster:
+    """Follows the change stream and fans entries out to per-client queues."""
+
+    def __init__(self):
+        self.clients: Set[asyncio.Queue] = set()
+        self._redis: Optional[aioredis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+            self._task = asyncio.get_running_loop().create_task(self._follow())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for queue in list(self.clients):
+            self._drop(queue)
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    async def _follow(self):
+        last = None
+        while True:
+            try:
+                if last is None:
+                    newest = await self._redis.xrevrange(CHANGE_STREAM, count=1)
+                    last = newest[0][0] if newest else "0-0"
+                batches = await self._redis.xread({CHANGE_STREAM: last}, count=100,
+                                                  block=int(EVENT_HEARTBEAT_SECONDS * 1000))
+                for _, entries in batches or []:
+                    for entry_id, fields in entries:
+                        last = entry_id
+                        self.publish(Event.from_entry(entry_id, fields))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Change stream follower error, retrying: {e}")
+                await asyncio.sleep(RETRY_AFTER_SECONDS)
+
+    def publish(self, event: Event):
+        caches.responses.clear()
+        for queue in list(self.clients):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(queue)
+
+    def _drop(self, queue: asyncio.Queue):
+        # the client resumes from its last delivered id when it reconnects
+        self.clients.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(_closed)
+
+    async def _replay(self, after: Tuple[int, int]) -> Optional[List[Event]]:
+        # Ids have gaps (rolled-back inserts), so the distance to the first entry says
+        # nothing. Only a client whose last entry has been trimmed away may have missed some.
+        first = await self._redis.xrange(CHANGE_STREAM, count=1)
+        if first and Event.from_entry(*first[0]).id > after:
+            return None
+        entries = await self._redis.xrange(CHANGE_STREAM, min=f"{after[0]}-{after[1] + 1}")
+        return [Event.from_entry(entry_id, fields) for entry_id, fields in entries]
+
+    async def subscribe(self, last_event_id: Optional[Tuple[int, int]]) -> AsyncIterator[str]:
+        """SSE lines for one client: the missed entries after last_event_id, then live ones."""
+        queue: asyncio.Queue = asyncio.Queue(EVENT_QUEUE_SIZE + 1)
+        # register before replaying so nothing published meanwhile falls in between
+        self.clients.add(queue)
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            sent = last_event_id or (0, 0)
+            if last_event_id is not None:
+                try:
+                    missed = await self._replay(last_event_id)
+                except RedisError as e:
+                    logger.warning(f"Could not replay changes after {last_event_id}: {e}")
+                    missed = None
+                if missed is None:
+                    yield _RESET
+                for event in missed or []:
+                    sent = event.id
+                    yield event.format()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is _closed:
+                    return
+                if event.id > sent:
+                    sent = event.id
+                    yield event.format()
+        finally:
+            self.clients.discard(queue)
+
+broadcaster = Broadcaster()
@@ -1,13 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from starlette.requests import Request
-import requests
-import graphene
 from fastapi.middleware.cors import CORSMiddleware
-from graphene import ObjectType, String, Field
-import os
+from typing import Optional
+import inspect
+import json
+
+from graphql import FieldNode, OperationType, execute, get_operation_ast
+
+from common import auth, metrics
+import caches
+import documents
+import downstream
+import events
+import limits
+from loaders import Loaders
+from schema import schema
 
 # FastAPI app
 app = FastAPI(title="GraphQL API Gateway")
+metrics.instrument_app(app)
 
 # Allow CORS for frontend
 app.add_middleware(
@@ -18,40 +30,118 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Dummy Auth Dependency (simulate Keycloak)
+@app.on_event("startup")
+async def startup():
+    # one pooled keep-alive client for every downstream call
+    downstream.start()
+    auth.start_jwks_refresh()
+    events.broadcaster.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await downstream.close()
+    await auth.stop_jwks_refresh()
+    await events.broadcaster.stop()
+
 def verify_token(request: Request):
     token = request.headers.get("Authorization")
     if not token or not token.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Unauthorized")
-    # In real scenario, call Keycloak to verify JWT
+    # reject bad tokens at the edge; the header is forwarded to the services as is
+    auth.verify(token[len("Bearer "):])
     return token
 
-# GraphQL Services URLs (these would point to your ACI services)
-PLAYER_SERVICE_URL = os.getenv("PLAYER_SERVICE_URL", "http://player-service:8001/graphql")
-MATCH_SERVICE_URL = os.getenv("MATCH_SERVICE_URL", "http://match-service:8002/graphql")
-TEAM_SERVICE_URL = os.getenv("TEAM_SERVICE_URL", "http://team-service:8003/graphql")
+def _error(message: str, code: str) -> dict:
+    return {"errors": [{"message": message, "extensions": {"code": code}}]}
+
+def _parse_json_param(value: Optional[str], name: str):
+    try:
+        return json.loads(value) if value else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be JSON")
+
+async def _execute(response: Response, query: Optional[str], variables: Optional[dict],
+                   operation_name: Optional[str], extensions: Optional[dict], token: str):
+    try:
+        document = documents.resolve(schema.graphql_schema, query, extensions)
+    except documents.QueryError as e:
+        return _error(str(e), e.code)
+    except documents.InvalidDocument as e:
+        return {"errors": [error.formatted for error in e.errors]}
+    operation = get_operation_ast(document.ast, operation_name)
+    if operation is None:
+        return _error("Unknown or ambiguous operation", "BAD_REQUEST")
+    too_expensive = limits.check(schema.graphql_schema, document.ast, operation_name, variables)
+    if too_expensive:
+        return {"errors": [too_expensive]}
+
+    ttl = 0.0
+    if operation.operation == OperationType.QUERY:
+        ttl = caches.response_ttl(sel.name.value for sel in operation.selection_set.selections
+                                  if isinstance(sel, FieldNode))
+    key = caches.response_key(token, document.hash, operation_name, variables) if ttl > 0 else None
+    if key is not None:
+        cached = caches.get_response(key)
+        if cached is not None:
+            response.headers["X-Cache"] = "HIT"
+            return cached
+        response.headers["X-Cache"] = "MISS"
 
-# Graphene schema
-class Query(ObjectType):
-    hello = String(description="Test endpoint for gateway")
-    player_service_status = String(description="Check Player service")
+    # fresh loaders per request: batching and caching never leak between callers
+    result = execute(schema.graphql_schema, document.ast, variable_values=variables, operation_name=operation_name,
+                     context_value={"loaders": Loaders(token)})
+    if inspect.isawaitable(result):
+        result = await result
+    body = result.formatted
+    if key is not None and not result.errors:
+        caches.set_response(key, body, ttl)
+    return body
 
-    async def resolve_hello(root, info):
-        return "Hello from GraphQL Gateway!"
+@app.post("/graphql")
+async def graphql_post(request: Request, response: Response, token: str = Depends(verify_token)):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Body must be a JSON object")
+    return await _execute(response, body.get("query"), body.get("variables"), body.get("operationName"),
+                          body.get("extensions"), token)
 
-    async def resolve_player_service_status(root, info):
-        try:
-            response = requests.get(f"{PLAYER_SERVICE_URL}/status")
-            return f"Player service status: {response.text}"
-        except Exception as e:
-            return f"Player service unreachable: {e}"
+@app.get("/graphql")
+async def graphql_get(response: Response, query: Optional[str] = None, variables: Optional[str] = None,
+                      operationName: Optional[str] = None, extensions: Optional[str] = None,
+                      token: str = Depends(verify_token)):
+    return await _execute(response, query, _parse_json_param(variables, "variables"), operationName,
+                          _parse_json_param(extensions, "extensions"), token)
 
-schema = graphene.Schema(query=Query)
+@app.post("/events/session", status_code=204)
+def events_session(token: str = Depends(verify_token)):
+    # EventSource cannot set headers: trade the bearer token for a cookie it sends instead
+    value, max_age = events.issue_session(auth.verify(token[len("Bearer "):]))
+    response = Response(status_code=204)
+    response.set_cookie(events.SESSION_COOKIE, value, max_age=max_age, path="/events", httponly=True,
+                        secure=events.EVENTS_COOKIE_SECURE, samesite=events.EVENTS_COOKIE_SAMESITE)
+    return response
 
-from starlette.graphql import GraphQLApp
+@app.get("/events")
+async def change_events(request: Request, last_event_id: Optional[str] = None):
+    if request.headers.get("Authorization"):
+        verify_token(request)
+    else:
+        events.verify_session(request.cookies.get(events.SESSION_COOKIE))
+    resume = request.headers.get("Last-Event-ID") or last_event_id
+    try:
+        resume = events.parse_event_id(resume) if resume else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Last-Event-ID must be a change id")
+    return StreamingResponse(events.broadcaster.subscribe(resume),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-# Mount GraphQL endpoint
-app.add_route("/graphql", GraphQLApp(schema=schema))
+@app.get("/cache/stats")
+def cache_stats():
+    return {**caches.snapshot(), "_sizes": {"responses": len(caches.responses), "documents": len(documents.parsed)}}
 
 # Healthcheck endpoint
 @app.get("/status")
@@ -0,0 +1,98 @@
+# graphql-gateway/limits.py
+"""
+Depth and cost limits, checked before a query runs.
+
+Depth counts nested selections (a root field is depth 1). Cost estimates the
+downstream loads a query can trigger: every object-typed field costs 1, and a
+list field multiplies its own and its children's cost by its `limit` argument,
+or by LIST_COST_FACTOR when it has none. Scalars are free. Introspection
+fields are not counted.
+"""
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from graphql import (DocumentNode, FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError,
+                     GraphQLObjectType, GraphQLSchema, InlineFragmentNode, OperationDefinitionNode,
+                     SelectionSetNode, get_named_type, get_nullable_type, get_operation_ast, is_list_type,
+                     is_object_type)
+from graphql.execution.values import get_argument_values
+
+MAX_DEPTH = int(os.getenv("GRAPHQL_MAX_DEPTH", "8"))
+MAX_COST = int(os.getenv("GRAPHQL_MAX_COST", "2000"))
+LIST_COST_FACTOR = int(os.getenv("GRAPHQL_LIST_COST_FACTOR", "10"))
+
+class _Walk:
+    def __init__(self, schema: GraphQLSchema, fragments: Dict[str, FragmentDefinitionNode],
+                 variables: Optional[dict]):
+        self.schema = schema
+        self.fragments = fragments
+        self.variables = variables or {}
+
+    def _multiplier(self, field_def, node: FieldNode) -> int:
+        if not is_list_type(get_nullable_type(field_def.type)):
+            return 1
+        if "limit" not in field_def.args:
+            return LIST_COST_FACTOR
+        try:
+            limit = get_argument_values(field_def, node, self.variables).get("limit")
+        except GraphQLError:
+            limit = None
+        return max(int(limit), 0) if isinstance(limit, int) else LIST_COST_FACTOR
+
+    def selection_set(self, parent: GraphQLObjectType, selection_set: SelectionSetNode,
+                      seen: Tuple[str, ...] = ()) -> Tuple[int, int]:
+        """(depth, cost) of a selection set on `parent`."""
+        depth = cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                name = selection.name.value
+                field_def = parent.fields.get(name)
+                if name.startswith("__") or field_def is None:
+                    continue
+                child_depth = child_cost = 0
+                named = get_named_type(field_def.type)
+                if selection.selection_set is not None and is_object_type(named):
+                    child_depth, child_cost = self.selection_set(named, selection.selection_set, seen)
+                depth = max(depth, 1 + child_depth)
+                if is_object_type(named):
+                    cost += self._multiplier(field_def, selection) * (1 + child_cost)
+                continue
+            if isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in seen:
+                    continue
+                type_condition, inner, seen = fragment.type_condition, fragment.selection_set, seen + (name,)
+            elif isinstance(selection, InlineFragmentNode):
+                type_condition, inner = selection.type_condition, selection.selection_set
+            else:
+                continue
+            target = self.schema.get_type(type_condition.name.value) if type_condition else parent
+            if is_object_type(target):
+                d, c = self.selection_set(target, inner, seen)
+                depth, cost = max(depth, d), cost + c
+        return depth, cost
+
+def measure(schema: GraphQLSchema, document: DocumentNode, operation_name: Optional[str] = None,
+            variables: Optional[dict] = None) -> Tuple[int, int]:
+    """(depth, cost) of the operation that would run; (0, 0) if there is none."""
+    operation: Optional[OperationDefinitionNode] = get_operation_ast(document, operation_name)
+    if operation is None:
+        return 0, 0
+    root = schema.get_root_type(operation.operation)
+    if root is None:
+        return 0, 0
+    fragments = {d.name.value: d for d in document.definitions if isinstance(d, FragmentDefinitionNode)}
+    return _Walk(schema, fragments, variables).selection_set(root, operation.selection_set)
+
+def check(schema: GraphQLSchema, document: DocumentNode, operation_name: Optional[str] = None,
+          variables: Optional[dict] = None) -> Optional[Dict[str, Any]]:
+    """None if the operation is within the limits, otherwise a GraphQL error dict."""
+    depth, cost = measure(schema, document, operation_name, variables)
+    if depth > MAX_DEPTH:
+        return {"message": f"Query depth {depth} exceeds the limit of {MAX_DEPTH}",
+                "extensions": {"code": "QUERY_TOO_DEEP", "depth": depth, "maxDepth": MAX_DEPTH}}
+    if cost > MAX_COST:
+        return {"message": f"Query cost {cost} exceeds the limit of {MAX_COST}",
+                "extensions": {"code": "QUERY_TOO_COSTLY", "cost": cost, "maxCost": MAX_COST}}
+    return None
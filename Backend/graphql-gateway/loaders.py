@@ -0,0 +1,63 @@
+# graphql-gateway/loaders.py
+"""
+Per-request DataLoaders over the downstream services.
+
+Every GraphQL request gets a fresh Loaders: resolvers call .load(key) and all
+keys requested in the same tick are collected into one batch, deduplicated and
+cached for the rest of the request. Players, teams and matches are fetched with
+one bulk /batch?ids= call per batch; the remaining per-entity resources run one
+call per distinct key, concurrently.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+from aiodataloader import DataLoader
+
+from common.batch import MAX_BATCH_IDS
+from downstream import MATCH_SERVICE_URL, PLAYER_SERVICE_URL, TEAM_SERVICE_URL, DownstreamError, get_json
+
+class _FanOutLoader(DataLoader):
+    """Loads a batch by fetching every key concurrently."""
+
+    def __init__(self, fetch: Callable[[Any], Awaitable[Any]]):
+        super().__init__()
+        self._fetch = fetch
+
+    async def batch_load_fn(self, keys: Sequence[Any]) -> List[Any]:
+        # errors are returned per key, so one failing entity does not fail the batch
+        return list(await asyncio.gather(*(self._fetch(key) for key in keys), return_exceptions=True))
+
+class _BulkLoader(DataLoader):
+    """Loads a batch with one GET {url}/batch?ids=...; items come back in key order, None for misses."""
+
+    def __init__(self, url: str, token: Optional[str]):
+        super().__init__(max_batch_size=MAX_BATCH_IDS)
+        self._url = url
+        self._token = token
+
+    async def batch_load_fn(self, keys: Sequence[int]) -> List[Any]:
+        try:
+            body = await get_json(f"{self._url}/batch", self._token, params={"ids": ",".join(map(str, keys))})
+        except DownstreamError as e:
+            return [e] * len(keys)
+        return body["items"]
+
+class Loaders:
+    def __init__(self, token: Optional[str] = None):
+        self.token = token
+        self.player = _BulkLoader(f"{PLAYER_SERVICE_URL}/players", token)
+        self.team = _BulkLoader(f"{TEAM_SERVICE_URL}/teams", token)
+        self.match = _BulkLoader(f"{MATCH_SERVICE_URL}/matches", token)
+        self.match_stats = _FanOutLoader(
+            lambda mid: get_json(f"{MATCH_SERVICE_URL}/matches/{mid}/stats", token))
+        # keyed by (id, limit): different page sizes are different resources
+        self.player_history = _FanOutLoader(lambda key: get_json(
+            f"{PLAYER_SERVICE_URL}/players/{key[0]}/history", token, params={"limit": key[1]}))
+        self.team_roster = _FanOutLoader(lambda tid: get_json(f"{TEAM_SERVICE_URL}/teams/{tid}/players", token))
+
+    async def search(self, url: str, params: dict, loader: DataLoader, key: str) -> List[dict]:
+        """List endpoints are not batched; their rows prime the entity loader so later loads are free."""
+        rows = await get_json(url, self.token, params={k: v for k, v in params.items() if v is not None}) or []
+        for row in rows:
+            loader.prime(row[key], row)
+        return rows
@@ -0,0 +1,145 @@
+# graphql-gateway/schema.py
+"""
+GraphQL types over the player, match and team services.
+
+Roots are the services' JSON documents; every cross-entity field goes through
+the request's DataLoaders (info.context["loaders"]), never straight to HTTP.
+"""
+from datetime import date
+
+import graphene
+from graphene import Boolean, Field, Float, Int, List, NonNull, ObjectType, String
+
+from downstream import MATCH_SERVICE_URL, PLAYER_SERVICE_URL, TEAM_SERVICE_URL, DownstreamError, get_json
+
+def _loaders(info):
+    return info.context["loaders"]
+
+def _date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+async def _load_many(loader, keys):
+    return [row for row in await loader.load_many(list(keys)) if row is not None]
+
+class Team(ObjectType):
+    team_id = Int(required=True)
+    team_name_std = String()
+    image_url = String()
+    has_gps = Boolean()
+    has_wyscout = Boolean()
+    players = List(NonNull(lambda: Player), description="Players with recent GPS sessions for the team")
+
+    async def resolve_players(root, info):
+        loaders = _loaders(info)
+        return await _load_many(loaders.player, await loaders.team_roster.load(root["team_id"]) or [])
+
+class TeamMatchStats(ObjectType):
+    match_id = Int(required=True)
+    team_id = Int(required=True)
+    possession_pct = Int()
+    shots_total = Int()
+    team = Field(Team)
+
+    async def resolve_team(root, info):
+        return await _loaders(info).team.load(root["team_id"])
+
+class Match(ObjectType):
+    match_id = Int(required=True)
+    match_date = graphene.Date()
+    competition_id = Int()
+    home_team_id = Int()
+    away_team_id = Int()
+    home_score = Int()
+    away_score = Int()
+    is_played = Boolean()
+    home_team = Field(Team)
+    away_team = Field(Team)
+    stats = List(NonNull(TeamMatchStats))
+
+    def resolve_match_date(root, info):
+        return _date(root.get("match_date"))
+
+    async def resolve_home_team(root, info):
+        return await _loaders(info).team.load(root["home_team_id"]) if root.get("home_team_id") else None
+
+    async def resolve_away_team(root, info):
+        return await _loaders(info).team.load(root["away_team_id"]) if root.get("away_team_id") else None
+
+    async def resolve_stats(root, info):
+        return await _loaders(info).match_stats.load(root["match_id"]) or []
+
+class PlayerMatchStat(ObjectType):
+    match_id = Int()
+    minutes_played = Int()
+    goals = Int()
+    assists = Int()
+    xg = Float()
+    match = Field(Match)
+
+    async def resolve_match(root, info):
+        return await _loaders(info).match.load(root["match_id"]) if root.get("match_id") else None
+
+class Player(ObjectType):
+    player_id = Int(required=True)
+    player_name_std = String()
+    position = String()
+    birth_date = graphene.Date()
+    height_cm = Int()
+    weight_kg = Int()
+    has_gps = Boolean()
+    has_wyscout = Boolean()
+    image_url = String()
+    history = List(NonNull(PlayerMatchStat), limit=Int(default_value=10),
+                   description="Most recent matches first")
+
+    def resolve_birth_date(root, info):
+        return _date(root.get("birth_date"))
+
+    async def resolve_history(root, info, limit):
+        return await _loaders(info).player_history.load((root["player_id"], limit)) or []
+
+class Query(ObjectType):
+    hello = String(description="Test endpoint for gateway")
+    player_service_status = String(description="Check Player service")
+
+    player = Field(Player, player_id=Int(required=True))
+    players = List(NonNull(Player), q=String(), limit=Int(default_value=25))
+    team = Field(Team, team_id=Int(required=True))
+    teams = List(NonNull(Team), q=String(), limit=Int(default_value=50))
+    match = Field(Match, match_id=Int(required=True))
+    matches = List(NonNull(Match), competition_id=Int(), limit=Int(default_value=50))
+
+    async def resolve_hello(root, info):
+        return "Hello from GraphQL Gateway!"
+
+    async def resolve_player_service_status(root, info):
+        try:
+            status = await get_json(f"{PLAYER_SERVICE_URL}/healthz")
+            return f"Player service status: {status}"
+        except DownstreamError as e:
+            return f"Player service unreachable: {e}"
+
+    async def resolve_player(root, info, player_id):
+        return await _loaders(info).player.load(player_id)
+
+    async def resolve_players(root, info, limit, q=None):
+        loaders = _loaders(info)
+        return await loaders.search(f"{PLAYER_SERVICE_URL}/players", {"q": q, "limit": limit},
+                                    loaders.player, "player_id")
+
+    async def resolve_team(root, info, team_id):
+        return await _loaders(info).team.load(team_id)
+
+    async def resolve_teams(root, info, limit, q=None):
+        loaders = _loaders(info)
+        return await loaders.search(f"{TEAM_SERVICE_URL}/teams", {"q": q, "limit": limit}, loaders.team, "team_id")
+
+    async def resolve_match(root, info, match_id):
+        return await _loaders(info).match.load(match_id)
+
+    async def resolve_matches(root, info, limit, competition_id=None):
+        loaders = _loaders(info)
+        return await loaders.search(f"{MATCH_SERVICE_URL}/matches", {"competition_id": competition_id, "limit": limit},
+                                    loaders.match, "match_id")
+
+schema = graphene.Schema(query=Query)
@@ -0,0 +1,445 @@
+# loadtest/bench.py
+"""
+Reproducible benchmark suite for the services and the GraphQL gateway.
+
+Seeds a warehouse with the ETL's synthetic multi-season dataset
+(etl/app/synthetic.py, deterministic per --seed), starts the player, match,
+analytics and team services plus the gateway under uvicorn, and drives each
+scenario with closed-loop virtual users. By default everything is local: a
+SQLite file and an in-process fakeredis TCP server. Pass --database-url and
+--redis-url to run against Postgres and Redis instead.
+
+Every scenario reports req/s, p50/p95/p99 and errors per endpoint. After the
+timed run each endpoint is driven alone for --memory-duration seconds to
+measure its memory (Linux only): resident and peak RSS of the processes serving
+it (the gateway plus the services behind it for GraphQL), with the peak reset
+first through /proc/<pid>/clear_refs, and how much RSS grew meanwhile.
+--save writes the run to a JSON baseline; --compare diffs a run against one
+and exits 1 when a metric regressed by more than --tolerance. Baselines are
+named for the environment they were recorded in (baselines/main-sqlite.json:
+the default SQLite file and fakeredis); compare like with like:
+
+    python bench.py --duration 10 --save baselines/main-sqlite.json
+    python bench.py --duration 10 --compare baselines/main-sqlite.json
+
+Needs the services' requirements and requirements.txt here (uvicorn,
+aiosqlite for the default SQLite warehouse, fakeredis unless --redis-url) in
+the current interpreter.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+from loadtest import demo_token, percentile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_TIMEOUT = 60.0
+
+class Service(NamedTuple):
+    directory: str
+    app: str
+
+SERVICES = {
+    "player": Service("player-service", "app.main:app"),
+    "match": Service("match-service", "app.main:app"),
+    "team": Service("team-service", "app.main:app"),
+    "analytics": Service("analytics-service", "app.main:app"),
+    "gateway": Service("graphql-gateway", "gateway:app"),
+}
+GATEWAY_DOWNSTREAM = {"player", "match", "team"}
+
+# (label, service, method, path, json body)
+Request = Tuple[str, str, str, str, Optional[dict]]
+
+PLAYER_QUERY = """query Player($id: Int!) {
+  player(playerId: $id) { playerId playerNameStd position
+    history(limit: 5) { matchId goals xg match { matchDate homeTeam { teamNameStd } awayTeam { teamNameStd } } } }
+}"""
+MATCHES_QUERY = """query Matches($limit: Int) {
+  matches(limit: $limit) { matchId matchDate homeScore awayScore
+    stats { teamId possessionPct shotsTotal team { teamNameStd } } }
+}"""
+
+def scenarios(players: int, matches: int, teams: int) -> Dict[str, List[Tuple[Request, int]]]:
+    """Requests per scenario with their weights; ids spread over the whole seeded range."""
+    rng = random.Random(0)
+    player_ids = rng.sample(range(1, players + 1), min(players, 100))
+    match_ids = rng.sample(range(1, matches + 1), min(matches, 100))
+    team_ids = list(range(1, teams + 1))
+    catalogue: Dict[str, List[Tuple[Request, int]]] = {
+        "players": [(("GET /players", "player", "GET", "/players?limit=50", None), 3),
+                    (("GET /players?q=", "player", "GET", "/players?q=Player%2000&limit=20", None), 1)],
+        "match_stats": [(("GET /matches/{id}/stats", "match", "GET", f"/matches/{i}/stats", None), 1)
+                        for i in match_ids],
+        "predict": [(("GET /predict/player/{id}", "analytics", "GET", f"/predict/player/{i}", None), 1)
+                    for i in player_ids],
+        "graphql": [(("POST /graphql player", "gateway", "POST", "/graphql",
+                      {"query": PLAYER_QUERY, "variables": {"id": i}}), 1) for i in player_ids]
+                   + [(("POST /graphql matches", "gateway", "POST", "/graphql",
+                        {"query": MATCHES_QUERY, "variables": {"limit": limit}}), 5) for limit in (10, 20)],
+        "team_roster": [(("GET /teams/{id}/players", "team", "GET", f"/teams/{i}/players", None), 1)
+                        for i in team_ids],
+    }
+    # mixed traffic: roughly what the dashboards send
+    shares = {"players": 3, "match_stats": 3, "predict": 2, "graphql": 2}
+    catalogue["mixed"] = [(request, weight * share * 100 // sum(w for _, w in catalogue[name]))
+                          for name, share in shares.items() for request, weight in catalogue[name]]
+    return catalogue
+
+def serving(service: str) -> set:
+    """The processes a request to `service` runs in."""
+    return {service} | (GATEWAY_DOWNSTREAM if service == "gateway" else set())
+
+def schedule(requests: List[Tuple[Request, int]], seed: int) -> List[Request]:
+    """Weighted, shuffled request order, the same for every run with the same seed."""
+    order = [request for request, weight in requests for _ in range(max(weight, 1))]
+    random.Random(seed).shuffle(order)
+    return order
+
+def service_path() -> str:
+    """PYTHONPATH for a service process: Backend/ holds the shared `common` package."""
+    return os.pathsep.join(p for p in (BACKEND, os.environ.get("PYTHONPATH")) if p)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Resident and peak resident set size of a process, from /proc."""
+    values: Dict[str, Optional[float]] = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    values["rss_mb" if key == "VmRSS" else "peak_rss_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return values
+
+def reset_peak(pid: int) -> bool:
+    """Reset a process's VmHWM to its current RSS (Linux 4.0+, own processes only)."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+class Stack:
+    """Seeded warehouse, Redis and one uvicorn process per service."""
+
+    def __init__(self, workdir: str, database_url: Optional[str], redis_url: Optional[str]):
+        self.workdir = workdir
+        database_file = os.path.join(workdir, "warehouse.db")
+        self.database_url = database_url or f"sqlite:///{database_file}"
+        self.async_database_url = None if database_url else f"sqlite+aiosqlite:///{database_file}"
+        self.redis_url = redis_url
+        self.redis_server = None
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.urls: Dict[str, str] = {}
+
+    def seed(self, seasons: int, teams: int, squad: int, seed: int):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "app.synthetic", "--seasons", str(seasons), "--teams", str(teams),
+                        "--squad", str(squad), "--seed", str(seed), "--replace"],
+                       cwd=os.path.join(BACKEND, "etl"), env={**os.environ, "DATABASE_URL": self.database_url},
+                       check=True)
+        print(f"Seeded warehouse in {time.perf_counter() - started:.1f}s")
+
+    def start_redis(self):
+        if self.redis_url:
+            return
+        from fakeredis import TcpFakeServer
+        port = _free_port()
+        self.redis_server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+        threading.Thread(target=self.redis_server.serve_forever, daemon=True).start()
+        self.redis_url = f"redis://127.0.0.1:{port}/0"
+
+    def start(self, names: List[str]):
+        self.start_redis()
+        ports = {name: _free_port() for name in names}
+        self.urls = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+        env = {**os.environ, "DATABASE_URL": self.database_url, "REDIS_URL": self.redis_url,
+               "SCORING_INTERVAL_SECONDS": "0",
+               "PLAYER_SERVICE_URL": self.urls.get("player", ""), "MATCH_SERVICE_URL": self.urls.get("match", ""),
+               "TEAM_SERVICE_URL": self.urls.get("team", ""), "PYTHONPATH": service_path()}
+        if self.async_database_url:
+            env["ASYNC_DATABASE_URL"] = self.async_database_url
+        # one at a time: the services run create_all against the same database on startup
+        for name in names:
+            service = SERVICES[name]
+            log = open(os.path.join(self.workdir, f"{name}.log"), "w")
+            self.processes[name] = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", service.app, "--host", "127.0.0.1", "--port", str(ports[name]),
+                 "--log-level", "warning", "--no-access-log"],
+                cwd=os.path.join(BACKEND, service.directory), env=env, stdout=log, stderr=subprocess.STDOUT)
+            self._wait_ready(name)
+
+    def _wait_ready(self, name: str):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.processes[name].poll() is not None:
+                break
+            try:
+                if httpx.get(f"{self.urls[name]}/metrics", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        with open(os.path.join(self.workdir, f"{name}.log")) as f:
+            tail = f.read()[-2000:]
+        raise RuntimeError(f"{name} did not start:\n{tail}")
+
+    def memory(self, names) -> Dict[str, Optional[float]]:
+        """rss_mb and peak_rss_mb summed over the named processes (None when unreadable)."""
+        readings = [memory_mb(self.processes[name].pid) for name in names]
+        return {key: None if any(r[key] is None for r in readings) else round(sum(r[key] for r in readings), 1)
+                for key in ("rss_mb", "peak_rss_mb")}
+
+    def reset_peaks(self, names):
+        for name in names:
+            reset_peak(self.processes[name].pid)
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self.redis_server is not None:
+            self.redis_server.shutdown()
+            self.redis_server.server_close()
+
+async def _user(clients: Dict[str, httpx.AsyncClient], order: List[Request], offset: int, stop_at: float,
+                latencies: Dict[str, List[float]], errors: Dict[str, Dict[str, int]]):
+    i = offset
+    while time.perf_counter() < stop_at:
+        label, service, method, path, body = order[i % len(order)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            response = await clients[service].request(method, path, json=body)
+            failed = str(response.status_code) if response.status_code >= 400 else None
+            if failed is None and service == "gateway" and response.json().get("errors"):
+                failed = "graphql"
+        except httpx.HTTPError as e:
+            failed = type(e).__name__
+        if failed:
+            kinds = errors.setdefault(label, {})
+            kinds[failed] = kinds.get(failed, 0) + 1
+            continue
+        latencies.setdefault(label, []).append(time.perf_counter() - t0)
+
+async def run_scenario(urls: Dict[str, str], order: List[Request], concurrency: int, duration: float,
+                       warmup: float, token: str) -> Dict[str, Dict[str, object]]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+    clients = {service: httpx.AsyncClient(base_url=urls[service], headers=headers, limits=limits, timeout=30.0)
+               for service in {r[1] for r in order}}
+    step = max(len(order) // concurrency, 1)
+    try:
+        if warmup > 0:
+            await asyncio.gather(*[_user(clients, order, u * step, time.perf_counter() + warmup, {}, {})
+                                   for u in range(concurrency)])
+        latencies: Dict[str, List[float]] = {}
+        errors: Dict[str, Dict[str, int]] = {}
+        started = time.perf_counter()
+        await asyncio.gather(*[_user(clients, order, u * step, started + duration, latencies, errors)
+                               for u in range(concurrency)])
+        elapsed = time.perf_counter() - started
+    finally:
+        for client in clients.values():
+            await client.aclose()
+
+    results = {}
+    for label in sorted(set(latencies) | set(errors)):
+        values = sorted(latencies.get(label, []))
+        results[label] = {
+            "requests": len(values),
+            "errors": sum(errors.get(label, {}).values()),
+            "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(values, 50) * 1e3, 2),
+            "p95_ms": round(percentile(values, 95) * 1e3, 2),
+            "p99_ms": round(percentile(values, 99) * 1e3, 2),
+            "error_kinds": errors.get(label, {}),
+        }
+    return results
+
+async def endpoint_memory(stack: Stack, order: List[Request], concurrency: int, duration: float,
+                          token: str) -> Dict[str, Dict[str, Optional[float]]]:
+    """Per endpoint, its requests alone for `duration` seconds: memory of the processes serving it."""
+    results = {}
+    for label in dict.fromkeys(r[0] for r in order):
+        requests = [r for r in order if r[0] == label]
+        names = sorted(serving(requests[0][1]))
+        stack.reset_peaks(names)
+        before = stack.memory(names)
+        await run_scenario(stack.urls, requests, concurrency, duration, 0, token)
+        after = stack.memory(names)
+        growth = None if None in (before["rss_mb"], after["rss_mb"]) else round(after["rss_mb"] - before["rss_mb"], 1)
+        results[label] = {**after, "rss_growth_mb": growth}
+    return results
+
+def _mb(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+def print_scenario(name: str, result: dict):
+    header = (f"{'endpoint':<32}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'rss MB':>10}{'peak MB':>10}{'grew MB':>10}")
+    print(f"\n[{name}]")
+    print(header)
+    print("-" * len(header))
+    for label, r in result["endpoints"].items():
+        print(f"{label:<32}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{_mb(r.get('rss_mb')):>10}{_mb(r.get('peak_rss_mb')):>10}{_mb(r.get('rss_growth_mb')):>10}")
+        if r["error_kinds"]:
+            print(f"{'':<32}errors: {r['error_kinds']}")
+
+# metric -> True when a higher value is better
+COMPARED = {"rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "peak_rss_mb": False}
+# endpoints with fewer samples than this are printed but never counted as regressions
+MIN_SAMPLES = 100
+
+def compare(baseline: dict, current: dict, tolerance: float) -> List[str]:
+    """Print per-endpoint deltas against a baseline; returns the regressions."""
+    regressions = []
+    print(f"\nAgainst baseline from {baseline['environment'].get('created')} "
+          f"({baseline['environment'].get('commit') or 'unknown commit'}), tolerance {tolerance:.0%}")
+    recorded = tuple(baseline["environment"].get(k) for k in ("database", "redis"))
+    running = tuple(current["environment"].get(k) for k in ("database", "redis"))
+    if recorded != running:
+        print(f"WARNING: baseline recorded on {'/'.join(map(str, recorded))}, this run on "
+              f"{'/'.join(map(str, running))}: the numbers are not comparable")
+    for scenario, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(scenario)
+        if before is None:
+            continue
+        print(f"\n[{scenario}]")
+        rows = [(label, metric, before["endpoints"][label].get(metric), r.get(metric), higher,
+                 min(r["requests"], before["endpoints"][label]["requests"]) >= MIN_SAMPLES)
+                for label, r in result["endpoints"].items() if label in before["endpoints"]
+                for metric, higher in COMPARED.items()]
+        for label, metric, old, new, higher, enough in rows:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = enough and ((change < -tolerance) if higher else (change > tolerance))
+            flag = "  REGRESSION" if regressed else ("" if enough else "  (few samples)")
+            print(f"{label:<32}{metric:<12}{old:>10}{new:>10}{change:>+9.1%}{flag}")
+            if regressed:
+                regressions.append(f"{scenario} {label} {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+def environment(args, stack: Stack) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "database": stack.database_url.split(":", 1)[0],
+        "redis": "external" if args.redis_url else "fakeredis",
+        "dataset": {"seasons": args.seasons, "teams": args.teams, "squad": args.squad, "seed": args.seed},
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "memory_duration": args.memory_duration,
+    }
+
+async def run(args, stack: Stack, catalogue) -> dict:
+    token = demo_token()
+    results = {}
+    for name in args.scenario:
+        order = schedule(catalogue[name], args.seed)
+        endpoints = await run_scenario(stack.urls, order, args.concurrency, args.duration, args.warmup, token)
+        if args.memory_duration > 0:
+            memory = await endpoint_memory(stack, order, args.concurrency, args.memory_duration, token)
+            for label, values in memory.items():
+                if label in endpoints:
+                    endpoints[label].update(values)
+        results[name] = {"endpoints": endpoints}
+        print_scenario(name, results[name])
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append",
+                        choices=["players", "match_stats", "predict", "graphql", "team_roster", "mixed"],
+                        help="scenario to run; repeat for several (default: all)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--memory-duration", type=float, default=2.0,
+                        help="seconds each endpoint runs alone for its memory reading (0: skip)")
+    parser.add_argument("--seasons", type=int, default=2)
+    parser.add_argument("--teams", type=int, default=8)
+    parser.add_argument("--squad", type=int, default=25)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL (default: a SQLite file in the workdir)")
+    parser.add_argument("--redis-url", help="Redis to use (default: an in-process fakeredis server)")
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in --database-url")
+    parser.add_argument("--workdir", help="where the database and service logs go (default: a temp dir)")
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--compare", help="diff the results against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative change counted as a regression")
+    args = parser.parse_args()
+    args.scenario = args.scenario or ["players", "match_stats", "predict", "graphql", "team_roster", "mixed"]
+
+    catalogue = scenarios(args.teams * args.squad, args.seasons * args.teams * (args.teams - 1), args.teams)
+    needed = sorted({s for name in args.scenario for r in catalogue[name] for s in serving(r[0][1])})
+    # the gateway needs the downstream URLs, so it starts last
+    needed.sort(key=lambda name: name == "gateway")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench-")
+    os.makedirs(workdir, exist_ok=True)
+    stack = Stack(workdir, args.database_url, args.redis_url)
+    try:
+        if not args.no_seed:
+            stack.seed(args.seasons, args.teams, args.squad, args.seed)
+        stack.start(needed)
+        report = {"environment": environment(args, stack), "scenarios": asyncio.run(run(args, stack, catalogue))}
+    finally:
+        stack.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nSaved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
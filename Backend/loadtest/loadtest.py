@@ -0,0 +1,105 @@
+# loadtest/loadtest.py
+"""
+Closed-loop HTTP load generator for the FastAPI services.
+
+Runs N concurrent virtual users against one or more deployments of the same
+endpoint and prints throughput and latency percentiles side by side, e.g. to
+compare a service on the sync engine against the asyncpg one:
+
+    python loadtest.py --path /players/1 --concurrency 64 --duration 30 \
+        --target sync=http://localhost:8001 --target async=http://localhost:8011
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import jwt
+
+def demo_token(roles: Optional[List[str]] = None) -> str:
+    # the services decode tokens without verifying the signature in demo mode
+    claims = {"sub": "loadtest", "preferred_username": "loadtest",
+              "realm_access": {"roles": roles or ["analyst"]}}
+    return jwt.encode(claims, "loadtest", algorithm="HS256")
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+async def _user(client: httpx.AsyncClient, paths: List[str], stop_at: float,
+                latencies: List[float], errors: Dict[str, int]):
+    i = 0
+    while time.perf_counter() < stop_at:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 500:
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                continue
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        latencies.append(time.perf_counter() - t0)
+
+async def run_target(base_url: str, paths: List[str], concurrency: int, duration: float,
+                     warmup: float, token: str) -> Dict[str, object]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30.0) as client:
+        if warmup > 0:
+            await asyncio.gather(*[_user(client, paths, time.perf_counter() + warmup, [], {})
+                                   for _ in range(concurrency)])
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+        started = time.perf_counter()
+        await asyncio.gather(*[_user(client, paths, started + duration, latencies, errors)
+                               for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors.values()),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p95_ms": percentile(latencies, 95) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+        "error_kinds": errors,
+    }
+
+def print_report(results: Dict[str, Dict[str, object]]):
+    header = f"{'target':<12}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(f"{name:<12}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+        if r["error_kinds"]:
+            print(f"{'':<12}errors: {r['error_kinds']}")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True,
+                        help="name=base_url; repeat to compare deployments")
+    parser.add_argument("--path", action="append", required=True,
+                        help="request path; repeat to rotate through several paths")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    args = parser.parse_args()
+
+    token = demo_token()
+    results = {}
+    for target in args.target:
+        name, _, url = target.partition("=")
+        results[name] = await run_target(url or name, args.path, args.concurrency,
+                                         args.duration, args.warmup, token)
+    print_report(results)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,16 +1,53 @@
 # match-service/app/crud.py
-from sqlalchemy.orm import Session
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from common import cache
+from common.batch import id_in
+from common.pagination import EXPORT_CHUNK_SIZE
+from . import schemas
+from .db import async_engine
 from .models import DimMatch, FactWyscoutMatch
-from typing import List, Optional
+from datetime import date
+from typing import Dict, List, Optional, Tuple
 
-def list_matches(db: Session, competition_id: Optional[int] = None, limit: int = 50):
-    q = db.query(DimMatch)
+MATCH_EXPORT_COLUMNS = ["match_id", "match_date", "competition_id", "home_team_id", "away_team_id",
+                        "home_score", "away_score", "is_played"]
+
+async def list_matches(db: AsyncSession, competition_id: Optional[int] = None, limit: int = 50,
+                       after: Optional[Tuple[date, int]] = None):
+    """Newest first; `after` is the (match_date, match_id) of the last row of the previous page."""
+    q = select(DimMatch)
+    if competition_id:
+        q = q.where(DimMatch.competition_id == competition_id)
+    if after:
+        q = q.where(tuple_(DimMatch.match_date, DimMatch.match_id) < tuple_(*after))
+    result = await db.execute(q.order_by(DimMatch.match_date.desc(), DimMatch.match_id.desc()).limit(limit))
+    return result.scalars().all()
+
+async def stream_matches(db: AsyncSession, competition_id: Optional[int] = None,
+                         date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """Server-side cursor over matches, yielded in partitions of EXPORT_CHUNK_SIZE row mappings."""
+    q = select(*[getattr(DimMatch, c) for c in MATCH_EXPORT_COLUMNS])
     if competition_id:
-        q = q.filter(DimMatch.competition_id == competition_id)
-    return q.order_by(DimMatch.match_date.desc()).limit(limit).all()
+        q = q.where(DimMatch.competition_id == competition_id)
+    if date_from:
+        q = q.where(DimMatch.match_date >= date_from)
+    if date_to:
+        q = q.where(DimMatch.match_date <= date_to)
+    q = q.order_by(DimMatch.match_date, DimMatch.match_id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    result = await db.stream(q)
+    return result.mappings().partitions()
+
+@cache.cached("match", key=lambda match_id: match_id, serialize=cache.row(schemas.MatchRead))
+async def get_match(db: AsyncSession, match_id: int):
+    return await db.get(DimMatch, match_id)
 
-def get_match(db: Session, match_id: int):
-    return db.query(DimMatch).filter(DimMatch.match_id == match_id).first()
+@cache.cached_many("match", serialize=cache.row(schemas.MatchRead))
+async def get_matches(db: AsyncSession, match_ids: List[int]) -> Dict[int, DimMatch]:
+    result = await db.execute(select(DimMatch).where(id_in(DimMatch.match_id, match_ids, async_engine.dialect.name)))
+    return {m.match_id: m for m in result.scalars()}
 
-def get_match_stats(db: Session, match_id: int):
-    return db.query(FactWyscoutMatch).filter(FactWyscoutMatch.match_id == match_id).all()
+@cache.cached("match_stats", key=lambda match_id: match_id, serialize=cache.rows(schemas.MatchStats))
+async def get_match_stats(db: AsyncSession, match_id: int):
+    result = await db.execute(select(FactWyscoutMatch).where(FactWyscoutMatch.match_id == match_id))
+    return result.scalars().all()
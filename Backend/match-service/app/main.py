@@ -1,40 +1,84 @@
 # match-service/app/main.py
-from fastapi import FastAPI, Depends, HTTPException, Query
-from . import db, crud, schemas, auth
+from fastapi import FastAPI, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from . import db, crud, schemas
+from common import auth, cache, metrics, pagination
+from common.batch import batch_ids
+from datetime import date
 from typing import List, Optional
 import logging
 
 app = FastAPI(title="Match Service", version="0.1")
+metrics.instrument_app(app)
+metrics.instrument_engine(db.async_engine)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("match-service")
 
 @app.on_event("startup")
-def on_startup():
-    from .db import Base, engine
-    Base.metadata.create_all(bind=engine)
+async def on_startup():
+    from .db import Base, async_engine
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    cache.start_invalidation_listener()
+    auth.start_jwks_refresh()
     logger.info("Match service started and tables created (demo).")
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await db.async_engine.dispose()
+    await cache.close()
+    await auth.stop_jwks_refresh()
+
 @app.get("/healthz")
 def health():
     return {"status": "ok", "service": "match-service"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.snapshot()
+
 @app.get("/matches", response_model=List[schemas.MatchRead])
-def matches(competition_id: Optional[int] = Query(None), limit: int = 50,
-            token=Depends(auth.verify_token), db_session=Depends(db.get_db)):
+async def matches(response: Response, competition_id: Optional[int] = Query(None),
+                  limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                  token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    """Newest matches first; pass the X-Next-Cursor header of a page as `cursor` for the next one."""
+    after = pagination.decode_cursor(cursor)
+    try:
+        after_key = (date.fromisoformat(after["match_date"]), int(after["match_id"])) if after else None
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     try:
-        return crud.list_matches(db_session, competition_id=competition_id, limit=limit)
+        rows = await crud.list_matches(db_session, competition_id=competition_id, limit=limit, after=after_key)
     except Exception as e:
         logger.exception("Failed to list matches")
         raise HTTPException(status_code=500, detail="Internal error")
+    pagination.set_next_cursor(response, rows, limit, {"match_date": "match_date", "match_id": "match_id"})
+    return rows
+
+@app.get("/matches/export")
+async def export_matches(format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+                         competition_id: Optional[int] = None, date_from: Optional[date] = None,
+                         date_to: Optional[date] = None,
+                         token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    """Stream a season (or any date range) of matches in constant memory."""
+    partitions = await crud.stream_matches(db_session, competition_id, date_from, date_to)
+    body = pagination.stream_rows(partitions, crud.MATCH_EXPORT_COLUMNS, format)
+    return StreamingResponse(body, media_type=pagination.EXPORT_MEDIA_TYPES[format])
+
+@app.get("/matches/batch", response_model=schemas.MatchBatch)
+async def match_batch(ids: List[int] = Depends(batch_ids), token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    """Bulk read in one query; items follow the order of `ids`, null where not found."""
+    items = await crud.get_matches(db_session, ids)
+    return {"items": items, "missing": list(dict.fromkeys(i for i, item in zip(ids, items) if item is None))}
 
 @app.get("/matches/{match_id}", response_model=schemas.MatchRead)
-def match_detail(match_id: int, token=Depends(auth.verify_token), db_session=Depends(db.get_db)):
-    m = crud.get_match(db_session, match_id)
+async def match_detail(match_id: int, token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    m = await crud.get_match(db_session, match_id)
     if not m:
         raise HTTPException(status_code=404, detail="Match not found")
     return m
 
 @app.get("/matches/{match_id}/stats", response_model=List[schemas.MatchStats])
-def match_stats(match_id: int, token=Depends(auth.verify_token), db_session=Depends(db.get_db)):
-    stats = crud.get_match_stats(db_session, match_id)
+async def match_stats(match_id: int, token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    stats = await crud.get_match_stats(db_session, match_id)
     return stats
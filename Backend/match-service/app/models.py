@@ -1,14 +1,19 @@
 # match-service/app/models.py
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, Float, Index
 from sqlalchemy.orm import relationship
 from .db import Base
 
 class DimMatch(Base):
     __tablename__ = "dim_match"
+    # list_matches / stream_matches: filter by competition, order by (match_date, match_id)
+    __table_args__ = (
+        Index("ix_dim_match_competition_date", "competition_id", "match_date", "match_id"),
+        Index("ix_dim_match_date", "match_date", "match_id"),
+    )
 
     match_id = Column(Integer, primary_key=True, index=True)
     match_date = Column(Date, nullable=False)
-    competition_id = Column(Integer, index=True)
+    competition_id = Column(Integer)
     home_team_id = Column(Integer, index=True)
     away_team_id = Column(Integer, index=True)
     home_score = Column(Integer)
@@ -19,11 +24,16 @@ class DimMatch(Base):
 
 class FactWyscoutMatch(Base):
     __tablename__ = "fact_wyscout_match"
+    # get_match_stats reads a match's rows from the index alone on Postgres
+    __table_args__ = (
+        Index("ix_fact_wyscout_match_match", "match_id",
+              postgresql_include=["id", "team_id", "possession_pct", "shots_total", "shots_on_target", "xg"]),
+    )
     id = Column(Integer, primary_key=True, index=True)
     match_id = Column(Integer, ForeignKey("dim_match.match_id"))
     team_id = Column(Integer, index=True)
     possession_pct = Column(Integer)
     shots_total = Column(Integer)
     shots_on_target = Column(Integer)
-    xg = Column(Integer)
+    xg = Column(Float)
     # ... many more aggregated metrics
@@ -18,8 +18,15 @@ class MatchRead(MatchBase):
     class Config:
         orm_mode = True
 
+class MatchBatch(BaseModel):
+    items: List[Optional[MatchRead]]
+    missing: List[int]
+
 class MatchStats(BaseModel):
     match_id: int
     team_id: int
     possession_pct: Optional[int]
     shots_total: Optional[int]
+
+    class Config:
+        orm_mode = True
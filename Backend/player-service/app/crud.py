@@ -1,19 +1,39 @@
 # player-service/app/crud.py
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from common import cache
+from common.batch import id_in
+from common.pagination import EXPORT_CHUNK_SIZE
+from common.search import name_search
 from . import models, schemas
+from .db import async_engine
+import json
 from datetime import date
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-def get_player(db: Session, player_id: int) -> Optional[models.DimPlayer]:
-    return db.query(models.DimPlayer).filter(models.DimPlayer.player_id == player_id).first()
+@cache.cached("player", key=lambda player_id: player_id, serialize=cache.row(schemas.PlayerRead))
+async def get_player(db: AsyncSession, player_id: int) -> Optional[models.DimPlayer]:
+    # cached: callers receive the serialized PlayerRead dict
+    return await db.get(models.DimPlayer, player_id)
 
-def search_players(db: Session, q: Optional[str] = None, limit: int = 25) -> List[models.DimPlayer]:
-    query = db.query(models.DimPlayer)
-    if q:
-        query = query.filter(models.DimPlayer.player_name_std.ilike(f"%{q}%"))
-    return query.order_by(models.DimPlayer.player_name_std).limit(limit).all()
+@cache.cached_many("player", serialize=cache.row(schemas.PlayerRead))
+async def get_players(db: AsyncSession, player_ids: List[int]) -> Dict[int, models.DimPlayer]:
+    # cached: callers receive a PlayerRead dict or None per requested id, in order
+    result = await db.execute(select(models.DimPlayer)
+                              .where(id_in(models.DimPlayer.player_id, player_ids, async_engine.dialect.name)))
+    return {p.player_id: p for p in result.scalars()}
 
-def create_player(db: Session, player: schemas.PlayerCreate) -> models.DimPlayer:
+async def search_players(db: AsyncSession, q: Optional[str] = None, limit: int = 25) -> List[models.DimPlayer]:
+    query = select(models.DimPlayer)
+    if q and q.strip():
+        columns = [getattr(models.DimPlayer, c) for c in models.NAME_COLUMNS]
+        query = name_search(query, columns, q, models.DimPlayer.player_name_std, async_engine.dialect.name)
+    else:
+        query = query.order_by(models.DimPlayer.player_name_std)
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+async def create_player(db: AsyncSession, player: schemas.PlayerCreate) -> models.DimPlayer:
     obj = models.DimPlayer(
         player_name_std=player.player_name_std,
         player_name_gps=player.player_name_gps,
@@ -21,13 +41,45 @@ def create_player(db: Session, player: schemas.PlayerCreate) -> models.DimPlayer
         position=getattr(player, "position", None)
     )
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.flush()
+    # the change feed row commits with the player, so dashboards hear of it exactly when it exists
+    db.add(models.ChangeFeed(topic="player", payload=json.dumps({"player_ids": [obj.player_id]})))
+    await db.commit()
+    await db.refresh(obj)
+    # drop any "not found" entry cached for this id (the dispatcher does too, for other replicas)
+    await cache.invalidate("player", obj.player_id)
     return obj
 
-def get_player_match_history(db: Session, player_id: int, limit: int = 10):
-    return (db.query(models.FactPlayerWyscout)
-            .filter(models.FactPlayerWyscout.player_id == player_id)
-            .order_by(models.FactPlayerWyscout.id.desc())
-            .limit(limit)
-            .all())
+HISTORY_EXPORT_COLUMNS = ["id", "match_id", "minutes_played", "goals", "assists", "xg",
+                          "passes_total", "passes_precise"]
+
+async def get_player_match_history(db: AsyncSession, player_id: int, limit: int = 10,
+                                   after_id: Optional[int] = None):
+    """Most recent first; `after_id` is the id of the last row of the previous page."""
+    query = select(models.FactPlayerWyscout).where(models.FactPlayerWyscout.player_id == player_id)
+    if after_id is not None:
+        query = query.where(models.FactPlayerWyscout.id < after_id)
+    result = await db.execute(query.order_by(models.FactPlayerWyscout.id.desc()).limit(limit))
+    return result.scalars().all()
+
+async def stream_player_match_history(db: AsyncSession, player_id: int):
+    """Server-side cursor over a player's whole career, in partitions of EXPORT_CHUNK_SIZE row mappings."""
+    fact = models.FactPlayerWyscout
+    query = (select(*[getattr(fact, c) for c in HISTORY_EXPORT_COLUMNS])
+             .where(fact.player_id == player_id)
+             .order_by(fact.id)
+             .execution_options(yield_per=EXPORT_CHUNK_SIZE))
+    result = await db.stream(query)
+    return result.mappings().partitions()
+
+async def get_player_workload(db: AsyncSession, player_id: int, grain: str = "week", start: Optional[date] = None,
+                         end: Optional[date] = None) -> List[models.AggPlayerWorkload]:
+    """Pre-aggregated workload periods starting between start and end, oldest first (a primary-key range scan)."""
+    agg = models.AggPlayerWorkload
+    query = select(agg).where(agg.player_id == player_id, agg.grain == grain)
+    if start is not None:
+        query = query.where(agg.period_start >= start)
+    if end is not None:
+        query = query.where(agg.period_start <= end)
+    result = await db.execute(query.order_by(agg.period_start))
+    return result.scalars().all()
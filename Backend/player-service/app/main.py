@@ -1,58 +1,111 @@
 # player-service/app/main.py
-from fastapi import FastAPI, Depends, HTTPException, Query
-from . import db, crud, schemas, auth
+from fastapi import FastAPI, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from . import db, crud, schemas
+from common import auth, cache, metrics, pagination
+from common.batch import batch_ids
 from typing import List, Optional
+from datetime import date
 import logging
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
 app = FastAPI(title="Player Service", version="0.1")
+metrics.instrument_app(app)
+metrics.instrument_engine(db.async_engine)
 
 # configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("player-service")
 
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     # Create tables in demo if needed (in actual deployments migrations are used)
-    from .db import Base, engine
-    Base.metadata.create_all(bind=engine)
+    from .db import Base, async_engine
+    async with async_engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # trigram indexes for fuzzy name search
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(Base.metadata.create_all)
+    cache.start_invalidation_listener()
+    auth.start_jwks_refresh()
     logger.info("Player Service startup complete.")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await db.async_engine.dispose()
+    await cache.close()
+    await auth.stop_jwks_refresh()
+
 @app.get("/healthz")
 def health():
     return {"status": "ok", "service": "player-service"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.snapshot()
+
 @app.get("/players", response_model=List[schemas.PlayerRead])
-def list_players(q: Optional[str] = Query(None), limit: int = 25,
-                 token=Depends(auth.verify_jwt_token), db_session=Depends(db.get_db)):
+async def list_players(q: Optional[str] = Query(None), limit: int = 25,
+                       token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
     """
     Search or list players.
     Auth: token is validated but scope checks are done in business logic if needed.
     """
     try:
-        players = crud.search_players(db_session, q=q, limit=limit)
+        players = await crud.search_players(db_session, q=q, limit=limit)
         return players
     except SQLAlchemyError as e:
         logger.exception("DB error listing players")
         raise HTTPException(status_code=500, detail="Database error")
 
+@app.get("/players/batch", response_model=schemas.PlayerBatch)
+async def read_players(ids: List[int] = Depends(batch_ids), token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    """Bulk read in one query; items follow the order of `ids`, null where not found."""
+    items = await crud.get_players(db_session, ids)
+    return {"items": items, "missing": list(dict.fromkeys(i for i, item in zip(ids, items) if item is None))}
+
 @app.get("/players/{player_id}", response_model=schemas.PlayerRead)
-def read_player(player_id: int, token=Depends(auth.verify_jwt_token), db_session=Depends(db.get_db)):
-    player = crud.get_player(db_session, player_id)
+async def read_player(player_id: int, token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    player = await crud.get_player(db_session, player_id)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
     return player
 
 @app.post("/players", response_model=schemas.PlayerRead)
-def post_player(payload: schemas.PlayerCreate, token=Depends(auth.verify_jwt_token), db_session=Depends(db.get_db)):
+async def post_player(payload: schemas.PlayerCreate, token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
     # Example role check: only users with 'analyst' or 'coach' role can create
     roles = token.get("realm_access", {}).get("roles", [])
     if "analyst" not in roles and "coach" not in roles:
         raise HTTPException(status_code=403, detail="Insufficient permissions to create player")
-    obj = crud.create_player(db_session, payload)
+    obj = await crud.create_player(db_session, payload)
     return obj
 
 @app.get("/players/{player_id}/history", response_model=List[schemas.MatchStat])
-def player_history(player_id: int, token=Depends(auth.verify_jwt_token), db_session=Depends(db.get_db)):
-    stats = crud.get_player_match_history(db_session, player_id)
+async def player_history(player_id: int, response: Response, limit: int = Query(10, ge=1, le=500),
+                         cursor: Optional[str] = None,
+                         token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    """Most recent first; pass the X-Next-Cursor header of a page as `cursor` for the next one."""
+    after = pagination.decode_cursor(cursor)
+    try:
+        after_id = int(after["id"]) if after else None
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    stats = await crud.get_player_match_history(db_session, player_id, limit=limit, after_id=after_id)
+    pagination.set_next_cursor(response, stats, limit, {"id": "id"})
     return stats
+
+@app.get("/players/{player_id}/history/export")
+async def export_player_history(player_id: int, format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+                                token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    """Stream a player's full career in constant memory."""
+    partitions = await crud.stream_player_match_history(db_session, player_id)
+    body = pagination.stream_rows(partitions, crud.HISTORY_EXPORT_COLUMNS, format)
+    return StreamingResponse(body, media_type=pagination.EXPORT_MEDIA_TYPES[format])
+
+@app.get("/players/{player_id}/workload", response_model=List[schemas.WorkloadPeriod])
+async def player_workload(player_id: int, grain: str = Query("week", regex="^(week|month|quarter)$"),
+                          start: Optional[date] = None, end: Optional[date] = None,
+                          token=Depends(auth.verify_token), db_session=Depends(db.get_async_db)):
+    """Weekly, monthly or quarterly GPS workload totals, read from the ETL rollups."""
+    return await crud.get_player_workload(db_session, player_id, grain=grain, start=start, end=end)
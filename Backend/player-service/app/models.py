@@ -1,10 +1,19 @@
 # player-service/app/models.py
-from sqlalchemy import Column, Integer, String, Date, Boolean, Float, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Float, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from .db import Base
 
+NAME_COLUMNS = ("player_name_std", "player_name_gps", "player_name_wyscout")
+
 class DimPlayer(Base):
     __tablename__ = "dim_player"
+    # pg_trgm GIN indexes back fuzzy search across all three name variants
+    # and a btree on the standard name serves the unfiltered, name-ordered listing
+    __table_args__ = tuple(
+        Index(f"ix_dim_player_{col}_trgm", col, postgresql_using="gin", postgresql_ops={col: "gin_trgm_ops"})
+        for col in NAME_COLUMNS
+    ) + (Index("ix_dim_player_name_std", "player_name_std"),)
 
     player_id = Column(Integer, primary_key=True, index=True)
     player_name_std = Column(String(200), nullable=False)
@@ -23,9 +32,15 @@ class DimPlayer(Base):
 
 class FactPlayerWyscout(Base):
     __tablename__ = "fact_player_wyscout"
+    # match history pages by (player_id, id DESC); on Postgres the row comes from the index alone
+    __table_args__ = (
+        Index("ix_fact_player_wyscout_player_history", "player_id", "id",
+              postgresql_include=["match_id", "minutes_played", "goals", "assists", "xg",
+                                  "passes_total", "passes_precise"]),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    player_id = Column(Integer, ForeignKey("dim_player.player_id"), nullable=False, index=True)
+    player_id = Column(Integer, ForeignKey("dim_player.player_id"), nullable=False)
     match_id = Column(Integer, index=True)
     minutes_played = Column(Integer)
     goals = Column(Integer, default=0)
@@ -36,3 +51,41 @@ class FactPlayerWyscout(Base):
     # more metrics...
 
     player = relationship("DimPlayer", back_populates="matches")
+
+class AggPlayerWorkload(Base):
+    __tablename__ = "agg_player_workload"
+    # Written by the ETL (etl/app/rollups.py) after each load; read-only here
+
+    player_id = Column(Integer, primary_key=True, autoincrement=False)
+    grain = Column(String(10), primary_key=True)           # week / month / quarter
+    period_start = Column(Date, primary_key=True)
+    date_id = Column(Integer, nullable=False)              # dim_date row of period_start
+    year = Column(Integer)                                 # ISO year for weeks
+    period = Column(Integer)                               # week, month or quarter number
+    team_id = Column(Integer)
+    sessions = Column(Integer)
+    training_sessions = Column(Integer)
+    match_sessions = Column(Integer)
+    total_distance = Column(Float)
+    total_duration = Column(Float)  # minutes
+    total_player_load = Column(Float)
+    sprint_distance = Column(Float)
+    explosive_efforts = Column(Float)
+    accel_decel_efforts = Column(Float)
+    avg_heart_rate = Column(Float)
+    max_heart_rate = Column(Float)
+    hr_z1_minutes = Column(Float)
+    hr_z2_minutes = Column(Float)
+    hr_z3_minutes = Column(Float)
+    hr_z4_minutes = Column(Float)
+    hr_z5_minutes = Column(Float)
+    refreshed_at = Column(DateTime)
+
+class ChangeFeed(Base):
+    """Transactional outbox relayed by the ETL's change dispatcher (etl/app/changes.py)."""
+    __tablename__ = "change_feed"
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String(20), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
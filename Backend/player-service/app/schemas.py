@@ -23,6 +23,10 @@ class PlayerRead(PlayerBase):
     class Config:
         orm_mode = True
 
+class PlayerBatch(BaseModel):
+    items: List[Optional[PlayerRead]]
+    missing: List[int]
+
 class MatchStat(BaseModel):
     match_id: int
     minutes_played: Optional[int]
@@ -32,3 +36,29 @@ class MatchStat(BaseModel):
 
     class Config:
         orm_mode = True
+
+class WorkloadPeriod(BaseModel):
+    grain: str
+    period_start: date
+    year: int
+    period: int
+    team_id: Optional[int]
+    sessions: int
+    training_sessions: int
+    match_sessions: int
+    total_distance: Optional[float]
+    total_duration: Optional[float]
+    total_player_load: Optional[float]
+    sprint_distance: Optional[float]
+    explosive_efforts: Optional[float]
+    accel_decel_efforts: Optional[float]
+    avg_heart_rate: Optional[float]
+    max_heart_rate: Optional[float]
+    hr_z1_minutes: float
+    hr_z2_minutes: float
+    hr_z3_minutes: float
+    hr_z4_minutes: float
+    hr_z5_minutes: float
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,59 @@
+# team-service/app/crud.py
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from common import cache
+from common.batch import id_in
+from common.search import name_search
+from . import models, schemas
+from .db import async_engine
+import os
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+async def list_teams(db: AsyncSession, q: Optional[str] = None, limit: int = 50) -> List[models.DimTeam]:
+    query = select(models.DimTeam)
+    if q and q.strip():
+        columns = [getattr(models.DimTeam, c) for c in models.NAME_COLUMNS]
+        query = name_search(query, columns, q, models.DimTeam.team_name_std, async_engine.dialect.name)
+    else:
+        query = query.order_by(models.DimTeam.team_name_std)
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+@cache.cached("team", key=lambda team_id: team_id, serialize=cache.row(schemas.TeamRead))
+async def get_team(db: AsyncSession, team_id: int) -> Optional[models.DimTeam]:
+    # cached: callers receive the serialized TeamRead dict
+    return await db.get(models.DimTeam, team_id)
+
+@cache.cached_many("team", serialize=cache.row(schemas.TeamRead))
+async def get_teams(db: AsyncSession, team_ids: List[int]) -> Dict[int, models.DimTeam]:
+    # cached: callers receive a TeamRead dict or None per requested id, in order
+    result = await db.execute(select(models.DimTeam)
+                              .where(id_in(models.DimTeam.team_id, team_ids, async_engine.dialect.name)))
+    return {t.team_id: t for t in result.scalars()}
+
+async def get_team_workload(db: AsyncSession, team_id: int, grain: str = "week", start: Optional[date] = None,
+                         end: Optional[date] = None) -> List[models.AggTeamWorkload]:
+    """Pre-aggregated workload periods starting between start and end, oldest first (a primary-key range scan)."""
+    agg = models.AggTeamWorkload
+    query = select(agg).where(agg.team_id == team_id, agg.grain == grain)
+    if start is not None:
+        query = query.where(agg.period_start >= start)
+    if end is not None:
+        query = query.where(agg.period_start <= end)
+    result = await db.execute(query.order_by(agg.period_start))
+    return result.scalars().all()
+
+ROSTER_WINDOW_DAYS = int(os.getenv("ROSTER_WINDOW_DAYS", "90"))
+
+async def get_team_roster(db: AsyncSession, team_id: int, days: int = ROSTER_WINDOW_DAYS) -> List[int]:
+    """Players with a GPS session for the team in the `days` up to its latest session."""
+    gps = models.FactPlayerGps
+    latest = (await db.execute(select(func.max(gps.session_date)).where(gps.team_id == team_id))).scalar()
+    if latest is None:
+        return []
+    result = await db.execute(
+        select(gps.player_id).distinct()
+        .where(gps.team_id == team_id, gps.session_date > latest - timedelta(days=days))
+        .order_by(gps.player_id))
+    return list(result.scalars())
@@ -1,17 +1,22 @@
 # team-service/app/db.py
 import os
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from typing import Generator
+from typing import AsyncGenerator
+
+from common.db import async_database_url, engine_options
+from common.search import SEARCH_SETTINGS
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://user:password@db:5432/analytics_db")
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+# Async engine (asyncpg) used by the request handlers and the startup DDL
+async_engine = create_async_engine(ASYNC_DATABASE_URL,
+                                   **engine_options(ASYNC_DATABASE_URL, is_async=True, settings=SEARCH_SETTINGS))
+AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db() -> Generator:
-    db = SessionLocal()
-    try:
+async def get_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,43 +1,70 @@
 # team-service/app/main.py
 from fastapi import FastAPI, Depends, HTTPException, Query
-from . import db, models
-from .db import engine
+from . import db, models, schemas, crud
+from common import auth, cache, metrics
+from common.batch import batch_ids
+from .db import async_engine
 from typing import List, Optional
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from datetime import date
 import logging
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("team-service")
 app = FastAPI(title="Team Service")
+metrics.instrument_app(app)
+metrics.instrument_engine(async_engine)
 
 # create tables for demo
 @app.on_event("startup")
-def startup():
+async def startup():
     models.Base = db.Base
-    models.Base.metadata.create_all(bind=engine)
+    async with async_engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # trigram indexes for fuzzy name search
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(models.Base.metadata.create_all)
+    cache.start_invalidation_listener()
+    auth.start_jwks_refresh()
     logger.info("Team service started.")
 
-security = HTTPBearer()
-
-def fake_verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    # Demo token decode, production should verify with Keycloak JWKS
-    token = credentials.credentials
-    # Do not implement real verification in demo
-    return {"realm_access": {"roles": ["analyst"]}}
-
-@app.get("/teams", response_model=List[models.__dict__.get('DimTeam', None)])
-def list_teams(q: Optional[str] = Query(None), limit: int = 50, token: dict = Depends(fake_verify_token), db_session: Session = Depends(db.get_db)):
-    # For brevity, we return a raw query result; in production map to Pydantic models
-    query = db_session.query(models.DimTeam)
-    if q:
-        query = query.filter(models.DimTeam.team_name_std.ilike(f"%{q}%"))
-    teams = query.limit(limit).all()
-    return teams
-
-@app.get("/teams/{team_id}")
-def get_team(team_id: int, token: dict = Depends(fake_verify_token), db_session: Session = Depends(db.get_db)):
-    t = db_session.query(models.DimTeam).filter(models.DimTeam.team_id == team_id).first()
+@app.on_event("shutdown")
+async def shutdown():
+    await async_engine.dispose()
+    await cache.close()
+    await auth.stop_jwks_refresh()
+
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.snapshot()
+
+@app.get("/teams", response_model=List[schemas.TeamRead])
+async def list_teams(q: Optional[str] = Query(None), limit: int = 50, token: dict = Depends(auth.verify_token), db_session: AsyncSession = Depends(db.get_async_db)):
+    return await crud.list_teams(db_session, q=q, limit=limit)
+
+@app.get("/teams/batch", response_model=schemas.TeamBatch)
+async def get_teams(ids: List[int] = Depends(batch_ids), token: dict = Depends(auth.verify_token), db_session: AsyncSession = Depends(db.get_async_db)):
+    """Bulk read in one query; items follow the order of `ids`, null where not found."""
+    items = await crud.get_teams(db_session, ids)
+    return {"items": items, "missing": list(dict.fromkeys(i for i, item in zip(ids, items) if item is None))}
+
+@app.get("/teams/{team_id}", response_model=schemas.TeamRead)
+async def get_team(team_id: int, token: dict = Depends(auth.verify_token), db_session: AsyncSession = Depends(db.get_async_db)):
+    t = await crud.get_team(db_session, team_id)
     if not t:
         raise HTTPException(status_code=404, detail="Team not found")
     return t
+
+@app.get("/teams/{team_id}/players", response_model=List[int])
+async def team_roster(team_id: int, days: int = Query(crud.ROSTER_WINDOW_DAYS, ge=1, le=3650),
+                      token: dict = Depends(auth.verify_token), db_session: AsyncSession = Depends(db.get_async_db)):
+    """Ids of the players who trained or played for the team recently (GPS sessions)."""
+    return await crud.get_team_roster(db_session, team_id, days=days)
+
+@app.get("/teams/{team_id}/workload", response_model=List[schemas.WorkloadPeriod])
+async def team_workload(team_id: int, grain: str = Query("week", regex="^(week|month|quarter)$"),
+                        start: Optional[date] = None, end: Optional[date] = None,
+                        token: dict = Depends(auth.verify_token), db_session: AsyncSession = Depends(db.get_async_db)):
+    """Weekly, monthly or quarterly squad workload totals, read from the ETL rollups."""
+    return await crud.get_team_workload(db_session, team_id, grain=grain, start=start, end=end)
@@ -1,10 +1,18 @@
 # team-service/app/models.py
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Float, Index
 from sqlalchemy.orm import relationship
 from .db import Base
 
+NAME_COLUMNS = ("team_name_std", "team_name_gps", "team_name_wyscout")
+
 class DimTeam(Base):
     __tablename__ = "dim_team"
+    # pg_trgm GIN indexes back fuzzy search across all three name variants
+    # and a btree on the standard name serves the unfiltered, name-ordered listing
+    __table_args__ = tuple(
+        Index(f"ix_dim_team_{col}_trgm", col, postgresql_using="gin", postgresql_ops={col: "gin_trgm_ops"})
+        for col in NAME_COLUMNS
+    ) + (Index("ix_dim_team_name_std", "team_name_std"),)
     team_id = Column(Integer, primary_key=True, index=True)
     team_name_std = Column(String(200), nullable=False)
     team_name_gps = Column(String(200))
@@ -15,3 +23,54 @@ class DimTeam(Base):
     has_wyscout = Column(Boolean, default=False)
 
     # roster relationship could be added via foreign key on players
+
+class FactPlayerGps(Base):
+    """GPS sessions; read here only to derive rosters (dim_player has no team)."""
+    __tablename__ = "fact_player_gps"
+
+    id = Column(Integer, primary_key=True, index=True)
+    player_id = Column(Integer, nullable=False)
+    team_id = Column(Integer)
+    session_date = Column(Date, nullable=False)
+    session_type = Column(String(50))
+    session_no = Column(Integer, nullable=False, server_default="1")
+    total_distance = Column(Float)
+    total_duration = Column(Float)
+    total_player_load = Column(Float)
+    sprint_distance = Column(Float)
+    explosive_efforts = Column(Float)
+    accel_decel_efforts = Column(Float)
+    avg_heart_rate = Column(Float)
+    max_heart_rate = Column(Float)
+
+    # get_team_roster: latest session and distinct players of a team, both from this index alone
+    __table_args__ = (Index("ix_fact_player_gps_team_date_player", "team_id", "session_date", "player_id"),)
+
+class AggTeamWorkload(Base):
+    __tablename__ = "agg_team_workload"
+    # Written by the ETL (etl/app/rollups.py) after each load; read-only here
+
+    team_id = Column(Integer, primary_key=True, autoincrement=False)
+    grain = Column(String(10), primary_key=True)           # week / month / quarter
+    period_start = Column(Date, primary_key=True)
+    date_id = Column(Integer, nullable=False)              # dim_date row of period_start
+    year = Column(Integer)                                 # ISO year for weeks
+    period = Column(Integer)                               # week, month or quarter number
+    players = Column(Integer)
+    sessions = Column(Integer)
+    training_sessions = Column(Integer)
+    match_sessions = Column(Integer)
+    total_distance = Column(Float)
+    total_duration = Column(Float)  # minutes
+    total_player_load = Column(Float)
+    sprint_distance = Column(Float)
+    explosive_efforts = Column(Float)
+    accel_decel_efforts = Column(Float)
+    avg_heart_rate = Column(Float)
+    max_heart_rate = Column(Float)
+    hr_z1_minutes = Column(Float)
+    hr_z2_minutes = Column(Float)
+    hr_z3_minutes = Column(Float)
+    hr_z4_minutes = Column(Float)
+    hr_z5_minutes = Column(Float)
+    refreshed_at = Column(DateTime)
@@ -1,6 +1,7 @@
 # team-service/app/schemas.py
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+from datetime import date
 
 class TeamBase(BaseModel):
     team_name_std: str
@@ -13,3 +14,33 @@ class TeamRead(TeamBase):
 
     class Config:
         orm_mode = True
+
+class TeamBatch(BaseModel):
+    items: List[Optional[TeamRead]]
+    missing: List[int]
+
+class WorkloadPeriod(BaseModel):
+    grain: str
+    period_start: date
+    year: int
+    period: int
+    players: int
+    sessions: int
+    training_sessions: int
+    match_sessions: int
+    total_distance: Optional[float]
+    total_duration: Optional[float]
+    total_player_load: Optional[float]
+    sprint_distance: Optional[float]
+    explosive_efforts: Optional[float]
+    accel_decel_efforts: Optional[float]
+    avg_heart_rate: Optional[float]
+    max_heart_rate: Optional[float]
+    hr_z1_minutes: float
+    hr_z2_minutes: float
+    hr_z3_minutes: float
+    hr_z4_minutes: float
+    hr_z5_minutes: float
+
+    class Config:
+        orm_mode = True